@@ -0,0 +1,194 @@
+from backend.attendance import get_attendance_adjustments
+from backend.columnar import (compute_insights, dashboard_stats, get_snapshot_backend, read_snapshot, students_below,
+                              top_students)
+from backend.config import (ATTENDANCE_BUCKETS, ATTENTION_ATTENDANCE_BELOW, ATTENTION_MARKS_BELOW,
+                            MARKS_BUCKETS, TOP_PERFORMERS_COUNT)
+
+
+def get_dashboard_stats(conn):
+    """
+    The four dashboard numbers, from one query over class_stats (one row
+    per class) instead of loading every student. With the 'file' snapshot
+    backend they are computed from the mapped snapshot file instead.
+    """
+    if get_snapshot_backend() == 'file':
+        return read_snapshot(conn, dashboard_stats)
+
+    row = conn.execute('''
+        SELECT
+            COUNT(*) as class_count,
+            COALESCE(SUM(cs.student_count), 0) as total_students,
+            COALESCE(SUM(cs.sum_marks), 0) as sum_marks,
+            COALESCE(SUM(cs.sum_attendance), 0) as sum_attendance
+        FROM classes c
+        LEFT JOIN class_stats cs ON cs.class_id = c.id
+    ''').fetchone()
+
+    total = row['total_students']
+    return {
+        'total_students': total,
+        'class_count': row['class_count'],
+        'avg_marks': row['sum_marks'] / total if total else 0,
+        'avg_attendance': row['sum_attendance'] / total if total else 0,
+    }
+
+
+def _count_buckets(histogram, buckets):
+    counts = {}
+    for label, low, high in buckets:
+        counts[label] = sum(count for value, count in histogram.items()
+                            if (low is None or value >= low) and (high is None or value <= high))
+    return counts
+
+
+def get_summary(conn, marks_buckets=MARKS_BUCKETS, attendance_buckets=ATTENDANCE_BUCKETS):
+    """
+    Counts, averages and both distributions. Everything except the
+    attention count is read from the class_stats tables (the attendance
+    distribution corrected by the attendance rollups), so the cost depends
+    on the number of classes, not students.
+    """
+    totals = conn.execute('''
+        SELECT
+            COALESCE(SUM(cs.student_count), 0) as total,
+            COALESCE(SUM(cs.sum_marks), 0) as sum_marks,
+            COALESCE(SUM(cs.sum_attendance), 0) as sum_attendance
+        FROM class_stats cs
+        JOIN classes c ON cs.class_id = c.id
+    ''').fetchone()
+
+    histograms = {'marks': {}, 'attendance': {}}
+    for row in conn.execute('''
+        SELECT h.metric, h.value, SUM(h.student_count) as student_count
+        FROM class_stats_histogram h
+        JOIN classes c ON h.class_id = c.id
+        GROUP BY h.metric, h.value
+    '''):
+        histograms[row['metric']][row['value']] = row['student_count']
+    # Students with recorded days are counted by those instead of the
+    # typed-in attendance column
+    for value, delta in get_attendance_adjustments(conn).items():
+        histograms['attendance'][value] = histograms['attendance'].get(value, 0) + delta
+
+    # Needs both columns of the same student, so it can't come from the
+    # per-column histograms. It only reads the covering idx_students_class_marks.
+    attention_count = conn.execute('''
+        SELECT COUNT(*)
+        FROM students s
+        JOIN classes c ON s.class_id = c.id
+        WHERE s.marks < ? OR s.attendance < ?
+    ''', (ATTENTION_MARKS_BELOW, ATTENTION_ATTENDANCE_BELOW)).fetchone()[0]
+
+    total = totals['total']
+    return {
+        'total': total,
+        'avg_marks': totals['sum_marks'] / total if total else 0,
+        'avg_attendance': totals['sum_attendance'] / total if total else 0,
+        'attention_count': attention_count,
+        'performance_ranges': _count_buckets(histograms['marks'], marks_buckets),
+        'attendance_ranges': _count_buckets(histograms['attendance'], attendance_buckets),
+    }
+
+
+def iter_class_stats(conn):
+    """
+    Per-class statistics read from class_stats, one row at a time from the
+    cursor. Same columns as aggregating students per class.
+    """
+    return conn.execute('''
+        SELECT
+            c.name,
+            COALESCE(cs.student_count, 0) as student_count,
+            CASE WHEN cs.student_count > 0 THEN cs.sum_marks * 1.0 / cs.student_count END as avg_marks,
+            CASE WHEN cs.student_count > 0 THEN cs.sum_attendance * 1.0 / cs.student_count END as avg_attendance,
+            cs.min_marks as min_marks,
+            cs.max_marks as max_marks
+        FROM classes c
+        LEFT JOIN class_stats cs ON cs.class_id = c.id
+        ORDER BY c.name
+    ''')
+
+
+def get_class_stats(conn):
+    return [dict(row) for row in iter_class_stats(conn)]
+
+
+def get_subject_stats(conn):
+    """
+    Per-subject student count and averages, read through the
+    student_subjects link table instead of splitting subjects strings.
+    """
+    rows = conn.execute('''
+        SELECT
+            sub.id,
+            sub.name,
+            COUNT(*) as student_count,
+            AVG(s.marks) as avg_marks,
+            AVG(s.attendance) as avg_attendance,
+            MIN(s.marks) as min_marks,
+            MAX(s.marks) as max_marks
+        FROM subjects sub
+        JOIN student_subjects ss ON ss.subject_id = sub.id
+        JOIN students s ON s.id = ss.student_id
+        GROUP BY sub.id
+        ORDER BY student_count DESC, sub.name
+    ''').fetchall()
+    return [dict(row) for row in rows]
+
+
+def get_top_performers(conn, limit=TOP_PERFORMERS_COUNT):
+    # Reads the first rows of idx_students_marks instead of sorting everyone
+    rows = conn.execute('''
+        SELECT s.*, c.name as class_name
+        FROM students s
+        JOIN classes c ON s.class_id = c.id
+        ORDER BY s.marks DESC
+        LIMIT ?
+    ''', (limit,)).fetchall()
+    return [dict(row) for row in rows]
+
+
+def get_students_needing_attention(conn):
+    rows = conn.execute('''
+        SELECT s.*, c.name as class_name
+        FROM students s
+        JOIN classes c ON s.class_id = c.id
+        WHERE s.marks < ? OR s.attendance < ?
+        ORDER BY s.marks DESC
+    ''', (ATTENTION_MARKS_BELOW, ATTENTION_ATTENDANCE_BELOW)).fetchall()
+    return [dict(row) for row in rows]
+
+
+def compute_analytics(conn, marks_buckets=MARKS_BUCKETS, attendance_buckets=ATTENDANCE_BUCKETS):
+    """
+    Everything the analytics page shows, from a handful of SQL queries.
+    Rows are returned as dicts so the result can be cached. With the
+    'file' snapshot backend the two student lists come from the mapped file.
+    """
+    if get_snapshot_backend() == 'file':
+        top_performers, students_attention = read_snapshot(conn, lambda snapshot: (
+            [snapshot.student(i) for i in top_students(snapshot)],
+            [snapshot.student(i) for i in students_below(snapshot)],
+        ))
+    else:
+        top_performers = get_top_performers(conn)
+        students_attention = get_students_needing_attention(conn)
+    return {
+        'summary': get_summary(conn, marks_buckets, attendance_buckets),
+        'classes_stats': get_class_stats(conn),
+        'subject_stats': get_subject_stats(conn),
+        'top_performers': top_performers,
+        'students_attention': students_attention,
+    }
+
+
+def get_insights(conn):
+    """
+    Correlation, histograms, class spread and at-risk cohorts, computed
+    from the columnar student snapshot (see backend/columnar.py).
+    """
+    insights, names = read_snapshot(conn, lambda snapshot: (compute_insights(snapshot), dict(snapshot.class_names)))
+    insights['class_spread'] = sorted(
+        (dict(stats, class_id=class_id, name=names.get(class_id, '')) for class_id, stats in insights['class_spread'].items()),
+        key=lambda stats: stats['name'])
+    return insights
@@ -0,0 +1,213 @@
+import hashlib
+
+from flask import Response, jsonify, request, url_for
+
+from backend.analytics import compute_analytics
+from backend.attendance import mark_class, parse_day, record_events
+from backend.auth import token_required
+from backend.cache import cached
+from backend.classes import class_query
+from backend.config import LEADERBOARD_SIZE
+from backend.db import get_data_generation, get_db_connection
+from backend.jobs import cancel_job, get_job, submit_job
+from backend.pagination import fetch_page, get_page_size
+from backend.rankings import get_leaderboard
+from backend.reports import get_report_connection
+from backend.students import student_query
+from backend.writer import submit_write
+
+API_PREFIX = '/api/v1'
+
+STUDENT_FIELDS = ['id', 'name', 'roll_no', 'class_id', 'class_name', 'subjects', 'marks', 'attendance']
+CLASS_FIELDS = ['id', 'name', 'description', 'created_at', 'student_count']
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def _selected_fields(allowed):
+    """Reads `?fields=name,marks`; all fields when the parameter is missing."""
+    value = request.args.get('fields', '')
+    if not value:
+        return allowed
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ApiError(f"Unknown field(s): {', '.join(unknown)}")
+    return fields
+
+
+def _etag_response(conn, build):
+    """
+    Returns build() as JSON with a strong ETag made from the data
+    generation and the request URL. If the client already has that version
+    (If-None-Match), a 304 is sent and build() is never called, so none of
+    the resource queries run.
+    """
+    version = f'{get_data_generation(conn)}:{request.full_path}'
+    etag = hashlib.sha256(version.encode('utf-8')).hexdigest()[:32]
+
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag)
+    # Clients may keep the response but must check the ETag before using it
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _page_json(page, fields):
+    return {
+        'data': [{field: row[field] for field in fields} for row in page['rows']],
+        'next_cursor': page['next_cursor'],
+        'prev_cursor': page['prev_cursor'],
+    }
+
+
+def register_api(app):
+    @app.errorhandler(ApiError)
+    def api_error(error):
+        return jsonify({'error': error.message}), error.status
+
+    @app.route(f'{API_PREFIX}/students')
+    @token_required
+    def api_students():
+        conn = get_db_connection()
+
+        def build():
+            fields = _selected_fields(STUDENT_FIELDS)
+            try:
+                # Same search, class filter and sort as view_students
+                q = student_query(conn, request.args)
+            except ValueError:
+                raise ApiError('class must be a class id')
+            query = f'''
+                SELECT s.*, c.name as class_name, {q['sort_column']} as sort_value
+                FROM {q['join']}
+                WHERE 1=1 {q['filters']}
+            '''
+            page = fetch_page(conn, query, q['params'], q['sort_column'], 's.id', q['sort_by'], q['sort_order'],
+                              after=request.args.get('after'),
+                              before=request.args.get('before'),
+                              per_page=get_page_size(request.args.get('per_page')))
+            result = _page_json(page, fields)
+            result['total'] = conn.execute(f'''
+                SELECT COUNT(*) FROM {q['join']} WHERE 1=1 {q['filters']}
+            ''', q['params']).fetchone()[0]
+            return result
+
+        return _etag_response(conn, build)
+
+    @app.route(f'{API_PREFIX}/students/<int:id>')
+    @token_required
+    def api_student(id):
+        conn = get_db_connection()
+
+        def build():
+            fields = _selected_fields(STUDENT_FIELDS)
+            student = conn.execute('''
+                SELECT s.*, c.name as class_name
+                FROM students s JOIN classes c ON s.class_id = c.id
+                WHERE s.id = ?
+            ''', (id,)).fetchone()
+            if student is None:
+                raise ApiError('Student not found', 404)
+            return {field: student[field] for field in fields}
+
+        return _etag_response(conn, build)
+
+    @app.route(f'{API_PREFIX}/classes')
+    @token_required
+    def api_classes():
+        conn = get_db_connection()
+
+        def build():
+            fields = _selected_fields(CLASS_FIELDS)
+            # Same search and sort as view_classes
+            q = class_query(conn, request.args)
+            page = fetch_page(conn, q['query'], q['params'], q['sort_column'], 'id', q['sort_by'], q['sort_order'],
+                              after=request.args.get('after'),
+                              before=request.args.get('before'),
+                              per_page=get_page_size(request.args.get('per_page')))
+            return _page_json(page, fields)
+
+        return _etag_response(conn, build)
+
+    @app.route(f'{API_PREFIX}/classes/<int:id>/leaderboard')
+    @token_required
+    def api_class_leaderboard(id):
+        conn = get_report_connection()
+
+        def build():
+            # The class itself is looked up live, like the leaderboard page
+            if get_db_connection().execute('SELECT 1 FROM classes WHERE id = ?', (id,)).fetchone() is None:
+                raise ApiError('Class not found', 404)
+            limit = get_page_size(request.args.get('limit', LEADERBOARD_SIZE))
+            return {'data': get_leaderboard(conn, id, limit)}
+
+        return _etag_response(conn, build)
+
+    @app.route(f'{API_PREFIX}/analytics')
+    @token_required
+    def api_analytics():
+        conn = get_report_connection()
+        return _etag_response(conn, lambda: cached(conn, 'analytics', lambda: compute_analytics(conn)))
+
+    @app.route(f'{API_PREFIX}/attendance', methods=['POST'])
+    @token_required
+    def api_record_attendance():
+        # Either {"class_id", "day", "absent": [student ids]} to mark a whole
+        # class, or {"events": [{"student_id", "day", "present"}, ...]}
+        body = request.get_json(silent=True) or {}
+        try:
+            if 'class_id' in body:
+                class_id = int(body['class_id'])
+                day = parse_day(body.get('day'))
+                absent = [int(student_id) for student_id in body.get('absent') or []]
+                recorded = submit_write(lambda conn: mark_class(conn, class_id, day, absent))
+            else:
+                events = [(int(event['student_id']), parse_day(event.get('day')), bool(event.get('present', True)))
+                          for event in body.get('events') or []]
+                if not events:
+                    raise ApiError('Send class_id or a list of events')
+                recorded = submit_write(lambda conn: record_events(conn, events))
+        except (KeyError, TypeError, ValueError):
+            raise ApiError('Invalid attendance: student and class ids must be numbers, days YYYY-MM-DD')
+        response = jsonify({'recorded': recorded})
+        response.status_code = 201
+        return response
+
+    @app.route(f'{API_PREFIX}/jobs', methods=['POST'])
+    @token_required
+    def api_submit_job():
+        body = request.get_json(silent=True) or {}
+        try:
+            job_id = submit_job(body.get('kind', ''), body.get('params') or {})
+        except ValueError as e:
+            raise ApiError(str(e))
+        response = jsonify(get_job(get_db_connection(), job_id))
+        response.status_code = 202
+        response.headers['Location'] = url_for('api_job', id=job_id)
+        return response
+
+    @app.route(f'{API_PREFIX}/jobs/<int:id>')
+    @token_required
+    def api_job(id):
+        job = get_job(get_db_connection(), id)
+        if job is None:
+            raise ApiError('Job not found', 404)
+        return jsonify(job)
+
+    @app.route(f'{API_PREFIX}/jobs/<int:id>/cancel', methods=['POST'])
+    @token_required
+    def api_cancel_job(id):
+        if get_job(get_db_connection(), id) is None:
+            raise ApiError('Job not found', 404)
+        if not cancel_job(id):
+            raise ApiError('Job has already finished', 409)
+        return jsonify(get_job(get_db_connection(), id))
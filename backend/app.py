@@ -2,15 +2,31 @@ import os
 
 from flask import Flask
 
+from backend.api import register_api
+from backend.commands import register_commands
 from backend.config import TEMPLATES_DIR
-from backend.db import get_db_connection, init_db, set_database_path
+from backend.db import get_db_connection, init_app, init_db, set_database_path
+from backend.metrics import register_metrics
+from backend.profiling import register_profiling
+from backend.reports import register_reports
 from backend.routes import register_routes
+from backend.templating import register_templates
+from backend.writer import register_writer
 
 
 app = Flask(__name__, template_folder=TEMPLATES_DIR)
 app.secret_key = os.urandom(24)
 
+init_app(app)
+register_reports(app)
+register_templates(app)
+register_metrics(app)
+register_writer(app)
 register_routes(app)
+register_api(app)
+register_commands(app)
+# Wraps the views registered above, so it comes last
+register_profiling(app)
 
 if __name__ == '__main__':
     init_db()
@@ -0,0 +1,207 @@
+# Daily attendance. Every mark is appended to attendance_events and never
+# changed. The triggers created in backend/db.py keep the rollups up to
+# date as events are inserted:
+#
+# attendance_days holds the latest mark per student and day, so marking a
+# day again replaces the earlier mark instead of counting it twice.
+# attendance_students holds days recorded and days present per student.
+# attendance_class_days holds students recorded and present per class and day.
+# attendance_adjustments turns the class_stats attendance histogram of
+# typed-in values into one by recorded days, for the analytics buckets:
+# per value, +1 for every student with recorded days at their percentage
+# and -1 at their typed-in attendance.
+#
+# students.attendance stays a plain column; the recompute-attendance job
+# copies the percentages from attendance_students into it.
+import datetime
+
+from backend.config import ATTENDANCE_HISTORY_DAYS, ATTENDANCE_RECOMPUTE_BATCH
+
+_PERCENT = 'CAST(ROUND(100.0 * days_present / days_recorded) AS INTEGER)'
+
+
+def parse_day(value):
+    """Returns value as a 'YYYY-MM-DD' string, or today's date if empty. Raises ValueError."""
+    if not value:
+        return datetime.date.today().isoformat()
+    return datetime.date.fromisoformat(value).isoformat()
+
+
+def mark_class(conn, class_id, day, absent_ids=(), present_ids=None):
+    """
+    Marks every student of a class for one day: present unless their id is
+    in absent_ids or, when present_ids is given, only if it is in there. A
+    student who joined the class after the form was shown is then absent,
+    not silently present. One INSERT ... SELECT, however big the class.
+    Returns the number of students marked.
+    """
+    if present_ids is not None:
+        present, ids = 'id IN', present_ids
+    else:
+        present, ids = 'id NOT IN', absent_ids
+    return conn.execute(f'''
+        INSERT INTO attendance_events (student_id, class_id, day, present)
+        SELECT id, class_id, ?, {present} (SELECT value FROM json_each(?))
+        FROM students
+        WHERE class_id = ?
+        ORDER BY id
+    ''', (day, '[' + ','.join(str(int(i)) for i in ids) + ']', class_id)).rowcount
+
+
+def record_events(conn, events):
+    """
+    Appends (student_id, day, present) marks, taking the class from the
+    student. Marks for unknown students are skipped. Returns the number of
+    marks recorded.
+    """
+    return conn.executemany('''
+        INSERT INTO attendance_events (student_id, class_id, day, present)
+        SELECT id, class_id, ?, ? FROM students WHERE id = ?
+    ''', ((day, int(bool(present)), student_id) for student_id, day, present in events)).rowcount
+
+
+def get_class_day(conn, class_id, day):
+    """The students of a class with their mark for day (None when not marked yet)."""
+    return conn.execute('''
+        SELECT s.id, s.name, s.roll_no, d.present
+        FROM students s
+        LEFT JOIN attendance_days d ON d.student_id = s.id AND d.day = ?
+        WHERE s.class_id = ?
+        ORDER BY s.roll_no
+    ''', (day, class_id)).fetchall()
+
+
+def get_class_days(conn, class_id, limit=ATTENDANCE_HISTORY_DAYS):
+    """The latest days marked for a class, newest first, with their totals."""
+    return conn.execute('''
+        SELECT day, students_recorded, students_present,
+               students_present * 100.0 / students_recorded as percent_present
+        FROM attendance_class_days
+        WHERE class_id = ? AND students_recorded > 0
+        ORDER BY day DESC
+        LIMIT ?
+    ''', (class_id, limit)).fetchall()
+
+
+def get_attendance_adjustments(conn):
+    """{value: change in student count} to add to the typed-in attendance histogram."""
+    return {row[0]: row[1] for row in conn.execute('SELECT value, delta FROM attendance_adjustments WHERE delta != 0')}
+
+
+def _adjustments_query(totals):
+    # totals: a table or subquery with student_id, days_recorded, days_present
+    return f'''
+        SELECT value, SUM(delta) as delta
+        FROM (SELECT {_PERCENT} as value, 1 as delta
+              FROM {totals} t JOIN students s ON s.id = t.student_id
+              WHERE days_recorded > 0
+              UNION ALL
+              SELECT s.attendance, -1
+              FROM {totals} t JOIN students s ON s.id = t.student_id
+              WHERE days_recorded > 0)
+        GROUP BY value
+        HAVING SUM(delta) != 0
+    '''
+
+
+def update_student_attendance(conn, after_id=0, limit=ATTENDANCE_RECOMPUTE_BATCH):
+    """
+    Copies the percentage from attendance_students into students.attendance
+    for the next limit students with an id above after_id. Only reads the
+    rollups, never the events. Returns (last student id, students read,
+    rows changed), or None when there are no students left.
+    """
+    row = conn.execute('''
+        SELECT MIN(student_id), MAX(student_id), COUNT(*)
+        FROM (SELECT student_id FROM attendance_students
+              WHERE student_id > ? AND days_recorded > 0
+              ORDER BY student_id LIMIT ?)
+    ''', (after_id, limit)).fetchone()
+    if row[0] is None:
+        return None
+    changed = conn.execute(f'''
+        UPDATE students SET attendance = r.percent
+        FROM (SELECT student_id, {_PERCENT} as percent
+              FROM attendance_students
+              WHERE student_id BETWEEN ? AND ? AND days_recorded > 0) as r
+        WHERE students.id = r.student_id AND students.attendance != r.percent
+    ''', (row[0], row[1])).rowcount
+    return row[1], row[2], changed
+
+
+def _compute_rollups(conn):
+    # The latest event per student and day wins, as in the insert trigger
+    conn.execute('DROP TABLE IF EXISTS temp.attendance_latest')
+    conn.execute('''
+        CREATE TEMP TABLE attendance_latest AS
+        SELECT e.student_id, e.day, e.class_id, e.present
+        FROM attendance_events e
+        JOIN (SELECT MAX(id) as id FROM attendance_events GROUP BY student_id, day) latest ON latest.id = e.id
+    ''')
+    students = {row[0]: (row[1], row[2]) for row in conn.execute('''
+        SELECT l.student_id, COUNT(*), SUM(l.present)
+        FROM temp.attendance_latest l
+        JOIN students s ON s.id = l.student_id
+        GROUP BY l.student_id
+    ''')}
+    adjustments = {row[0]: row[1] for row in conn.execute(_adjustments_query('''
+        (SELECT student_id, COUNT(*) as days_recorded, SUM(present) as days_present
+         FROM temp.attendance_latest GROUP BY student_id)
+    '''))}
+    class_days = {(row[0], row[1]): (row[2], row[3]) for row in conn.execute('''
+        SELECT class_id, day, COUNT(*), SUM(present) FROM temp.attendance_latest GROUP BY class_id, day
+    ''')}
+    return students, class_days, adjustments
+
+
+def find_attendance_drift(conn):
+    """
+    Recomputes the per-student and per-class-and-day totals from the events
+    and compares them with the stored ones. Returns a list of differences
+    (empty if none).
+    """
+    expected_students, expected_class_days, expected = _compute_rollups(conn)
+    conn.execute('DROP TABLE temp.attendance_latest')
+    drift = []
+
+    stored = {row[0]: (row[1], row[2]) for row in conn.execute(
+        'SELECT student_id, days_recorded, days_present FROM attendance_students WHERE days_recorded != 0')}
+    for student_id in sorted(set(expected_students) | set(stored)):
+        if expected_students.get(student_id) != stored.get(student_id):
+            drift.append({'table': 'attendance_students', 'key': student_id,
+                          'expected': expected_students.get(student_id), 'stored': stored.get(student_id)})
+
+    stored = {(row[0], row[1]): (row[2], row[3]) for row in conn.execute('''
+        SELECT class_id, day, students_recorded, students_present
+        FROM attendance_class_days WHERE students_recorded != 0
+    ''')}
+    for key in sorted(set(expected_class_days) | set(stored)):
+        if expected_class_days.get(key) != stored.get(key):
+            drift.append({'table': 'attendance_class_days', 'key': f'class {key[0]} {key[1]}',
+                          'expected': expected_class_days.get(key), 'stored': stored.get(key)})
+
+    stored = get_attendance_adjustments(conn)
+    for value in sorted(set(expected) | set(stored)):
+        if expected.get(value) != stored.get(value):
+            drift.append({'table': 'attendance_adjustments', 'key': f'{value}%',
+                          'expected': expected.get(value), 'stored': stored.get(value)})
+
+    return drift
+
+
+def rebuild_attendance_rollups(conn):
+    """
+    Recomputes all rollup tables from attendance_events, for when they have
+    drifted. Reads every event, unlike the triggers. Does not commit;
+    callers outside a transaction must commit.
+    """
+    _compute_rollups(conn)
+    for table in ('attendance_days', 'attendance_students', 'attendance_class_days',
+                  'attendance_adjustments'):
+        conn.execute(f'DELETE FROM {table}')
+    # The triggers on attendance_days fill the other tables again
+    conn.execute('INSERT INTO attendance_days (student_id, day, class_id, present) '
+                 'SELECT student_id, day, class_id, present FROM temp.attendance_latest')
+    conn.execute('DROP TABLE temp.attendance_latest')
+    # Deleted students keep their days, but not their totals
+    conn.execute('DELETE FROM attendance_students WHERE student_id NOT IN (SELECT id FROM students)')
@@ -1,6 +1,10 @@
+import hashlib
+import secrets
 from functools import wraps
 
-from flask import redirect, session, url_for
+from flask import jsonify, redirect, request, session, url_for
+
+from backend.db import get_db_connection
 
 
 def login_required(f):
@@ -11,3 +15,35 @@ def login_required(f):
         return f(*args, **kwargs)
 
     return decorated_function
+
+
+def _hash_token(token):
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+def create_api_token(conn, name):
+    """Creates a new API token and returns it. Only its hash is stored."""
+    token = secrets.token_urlsafe(32)
+    conn.execute('INSERT INTO api_tokens (name, token_hash) VALUES (?, ?)', (name, _hash_token(token)))
+    conn.commit()
+    return token
+
+
+def check_api_token(conn, token):
+    row = conn.execute('SELECT 1 FROM api_tokens WHERE token_hash = ?', (_hash_token(token),)).fetchone()
+    return row is not None
+
+
+def token_required(f):
+    """
+    Like login_required for the JSON API: the request must send
+    `Authorization: Bearer <token>` with a token from create_api_token.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+        if scheme.lower() != 'bearer' or not token or not check_api_token(get_db_connection(), token.strip()):
+            return jsonify({'error': 'Missing or invalid API token'}), 401, {'WWW-Authenticate': 'Bearer'}
+        return f(*args, **kwargs)
+
+    return decorated_function
@@ -0,0 +1,164 @@
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from backend import db
+from backend.config import CACHE_BACKEND, CACHE_MAX_ENTRIES, CACHE_PATH, CACHE_TTL
+
+
+class MemoryCache:
+    """
+    Least-recently-used cache with a time-to-live, local to one process.
+    """
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class DiskCache:
+    """
+    Cache stored in a separate SQLite file, so every worker process on the
+    machine shares the results. Values are pickled.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = NORMAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    expires REAL NOT NULL,
+                    used REAL NOT NULL
+                )
+            ''')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        conn = self._connect()
+        row = conn.execute('SELECT value, expires FROM cache_entries WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return False, None
+        now = time.time()
+        if row[1] < now:
+            conn.execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+            return False, None
+        conn.execute('UPDATE cache_entries SET used = ? WHERE key = ?', (now, key))
+        return True, pickle.loads(row[0])
+
+    def set(self, key, value):
+        conn = self._connect()
+        now = time.time()
+        conn.execute('INSERT OR REPLACE INTO cache_entries (key, value, expires, used) VALUES (?, ?, ?, ?)',
+                     (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), now + self.ttl, now))
+        # Drop expired entries, then the least recently used ones over the limit
+        conn.execute('DELETE FROM cache_entries WHERE expires < ?', (now,))
+        conn.execute('''
+            DELETE FROM cache_entries WHERE key IN (
+                SELECT key FROM cache_entries ORDER BY used DESC LIMIT -1 OFFSET ?
+            )
+        ''', (self.max_entries,))
+
+    def clear(self):
+        self._connect().execute('DELETE FROM cache_entries')
+
+
+BACKENDS = {
+    'memory': MemoryCache,
+    'disk': DiskCache,
+}
+
+_backend = BACKENDS[CACHE_BACKEND]()
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'recompute_count': 0, 'recompute_seconds': 0.0, 'recompute_max_seconds': 0.0}
+
+
+def configure_cache(backend=None, **options):
+    """
+    Switches the cache backend, e.g. configure_cache('disk', path='/tmp/c.db').
+    Accepts a backend name from BACKENDS or any object with get/set/clear.
+    """
+    global _backend
+    if isinstance(backend, str):
+        backend = BACKENDS[backend](**options)
+    _backend = backend or BACKENDS[CACHE_BACKEND](**options)
+
+
+def get_cache_backend():
+    return _backend
+
+
+def cached(conn, name, compute):
+    """
+    Returns compute() for the current data generation. The result is reused
+    until students or classes change (or the entry expires).
+    """
+    # The database path is part of the key so databases never share entries
+    key = f'{db.DATABASE}:{name}:{db.get_data_generation(conn)}'
+
+    hit, value = _backend.get(key)
+    if hit:
+        with _stats_lock:
+            _stats['hits'] += 1
+        return value
+
+    start = time.perf_counter()
+    value = compute()
+    elapsed = time.perf_counter() - start
+    _backend.set(key, value)
+
+    with _stats_lock:
+        _stats['misses'] += 1
+        _stats['recompute_count'] += 1
+        _stats['recompute_seconds'] += elapsed
+        _stats['recompute_max_seconds'] = max(_stats['recompute_max_seconds'], elapsed)
+    return value
+
+
+def get_cache_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = stats['hits'] / lookups if lookups else 0.0
+    stats['recompute_avg_seconds'] = (stats['recompute_seconds'] / stats['recompute_count']
+                                      if stats['recompute_count'] else 0.0)
+    stats['backend'] = type(_backend).__name__
+    return stats
@@ -0,0 +1,93 @@
+# Per-class summary tables kept up to date by the triggers created in
+# backend/db.py, so class lists and analytics don't have to aggregate the
+# whole students table on every request.
+#
+# class_stats holds count, sums, min and max per class.
+# class_stats_histogram holds how many students of a class have each
+# marks/attendance value (0-100), so the counts for any bucket boundaries
+# are a sum over at most 101 rows per class.
+
+STATS_COLUMNS = ['student_count', 'sum_marks', 'sum_attendance',
+                 'min_marks', 'max_marks', 'min_attendance', 'max_attendance']
+
+
+def _compute_stats(conn):
+    rows = conn.execute('''
+        SELECT
+            class_id,
+            COUNT(*) as student_count,
+            SUM(marks) as sum_marks,
+            SUM(attendance) as sum_attendance,
+            MIN(marks) as min_marks,
+            MAX(marks) as max_marks,
+            MIN(attendance) as min_attendance,
+            MAX(attendance) as max_attendance
+        FROM students
+        GROUP BY class_id
+    ''').fetchall()
+    return {row['class_id']: tuple(row[column] for column in STATS_COLUMNS) for row in rows}
+
+
+def _compute_histogram(conn):
+    rows = conn.execute('''
+        SELECT class_id, 'marks', marks, COUNT(*) FROM students GROUP BY class_id, marks
+        UNION ALL
+        SELECT class_id, 'attendance', attendance, COUNT(*) FROM students GROUP BY class_id, attendance
+    ''').fetchall()
+    return {(row[0], row[1], row[2]): row[3] for row in rows}
+
+
+def find_drift(conn):
+    """
+    Recomputes the statistics from the students table and compares them
+    with the stored ones. Returns a list of differences (empty if none).
+    """
+    drift = []
+
+    expected = _compute_stats(conn)
+    stored = {}
+    for row in conn.execute('SELECT * FROM class_stats'):
+        values = tuple(row[column] for column in STATS_COLUMNS)
+        # A class whose students were all removed keeps a row of zeros
+        if values[0] != 0:
+            stored[row['class_id']] = values
+
+    for class_id in sorted(set(expected) | set(stored)):
+        if expected.get(class_id) != stored.get(class_id):
+            drift.append({'table': 'class_stats', 'class_id': class_id,
+                          'expected': expected.get(class_id), 'stored': stored.get(class_id)})
+
+    expected = _compute_histogram(conn)
+    stored = {(row[0], row[1], row[2]): row[3] for row in conn.execute(
+        'SELECT class_id, metric, value, student_count FROM class_stats_histogram WHERE student_count != 0')}
+
+    for key in sorted(set(expected) | set(stored)):
+        if expected.get(key) != stored.get(key):
+            class_id, metric, value = key
+            drift.append({'table': 'class_stats_histogram', 'class_id': class_id, 'metric': metric,
+                          'value': value, 'expected': expected.get(key), 'stored': stored.get(key)})
+
+    return drift
+
+
+def rebuild_class_stats(conn):
+    """
+    Recomputes both tables from scratch. Does not commit, so it can run
+    inside a migration; callers outside a transaction must commit.
+    """
+    conn.execute('DELETE FROM class_stats')
+    conn.execute('DELETE FROM class_stats_histogram')
+    conn.execute('''
+        INSERT INTO class_stats (class_id, student_count, sum_marks, sum_attendance,
+                                 min_marks, max_marks, min_attendance, max_attendance)
+        SELECT class_id, COUNT(*), SUM(marks), SUM(attendance),
+               MIN(marks), MAX(marks), MIN(attendance), MAX(attendance)
+        FROM students
+        GROUP BY class_id
+    ''')
+    conn.execute('''
+        INSERT INTO class_stats_histogram (class_id, metric, value, student_count)
+        SELECT class_id, 'marks', marks, COUNT(*) FROM students GROUP BY class_id, marks
+        UNION ALL
+        SELECT class_id, 'attendance', attendance, COUNT(*) FROM students GROUP BY class_id, attendance
+    ''')
@@ -0,0 +1,55 @@
+from backend.search import class_search
+
+
+def class_query(conn, args):
+    """
+    Builds the classes list query from the request arguments (search,
+    sort_by, sort_order), ready for fetch_page. Used by view_classes and
+    the API.
+    """
+    sort_by = args.get('sort_by', 'name')  # Default sort by name
+    sort_order = args.get('sort_order', 'asc')  # Default ascending
+    search_term = args.get('search', '')  # Search by class name
+
+    valid_sort_columns = {
+        'name': 'name',
+        'students': 'student_count',
+        'created': 'created_at'
+    }
+
+    if sort_by not in valid_sort_columns:
+        sort_by = 'name'
+    sort_column = valid_sort_columns[sort_by]
+    sort_order = 'ASC' if sort_order.lower() == 'asc' else 'DESC'
+
+    filters = ''
+    params = []
+
+    # Add search filter
+    if search_term:
+        condition, search_params = class_search(conn, search_term)
+        filters += f' AND {condition}'
+        params.extend(search_params)
+
+    # Student counts come from the trigger-maintained class_stats table.
+    # The inner query is wrapped so that student_count can be used in the
+    # page condition like any column.
+    query = f'''
+        SELECT *, {sort_column} as sort_value
+        FROM (
+            SELECT c.*, COALESCE(cs.student_count, 0) as student_count
+            FROM classes c
+            LEFT JOIN class_stats cs ON cs.class_id = c.id
+            WHERE 1=1 {filters}
+        )
+        WHERE 1=1
+    '''
+
+    return {
+        'query': query,
+        'params': params,
+        'sort_by': sort_by,
+        'sort_column': sort_column,
+        'sort_order': sort_order,
+        'search_term': search_term,
+    }
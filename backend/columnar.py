@@ -0,0 +1,395 @@
+import bisect
+import heapq
+import math
+import threading
+from array import array
+from collections import Counter
+
+try:
+    import numpy
+except ImportError:
+    # The array module fallback gives the same results, only slower
+    numpy = None
+
+from backend import db
+from backend.config import (ATTENTION_ATTENDANCE_BELOW, ATTENTION_MARKS_BELOW, AT_RISK_Z_SCORE, INSIGHT_HISTOGRAM_BINS,
+                            SNAPSHOT_BACKEND, TOP_PERFORMERS_COUNT)
+from backend.snapshot_file import get_mapped_snapshot, get_snapshot_file_stats
+from backend.writer import after_commit
+
+COLUMNS = ('class_ids', 'marks', 'attendance')
+
+
+class StudentSnapshot:
+    """
+    class_id, marks and attendance of every student as compact columns
+    ordered by student id: 8 + 8 + 1 + 1 bytes per student instead of a
+    sqlite3.Row, and the class names. It reflects one data generation.
+    """
+
+    def __init__(self, database_path, epoch, generation):
+        self.database_path = database_path
+        self.epoch = epoch
+        self.generation = generation
+        self.ids = array('q')
+        self.class_ids = array('q')
+        # Marks and attendance are 0-100 (see validate_student)
+        self.marks = array('B')
+        self.attendance = array('B')
+        self.class_names = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def append(self, student_id, class_id, marks, attendance):
+        self.ids.append(student_id)
+        self.class_ids.append(class_id)
+        self.marks.append(marks)
+        self.attendance.append(attendance)
+
+    def apply(self, student_id, values):
+        """
+        Inserts or updates one student with values (class_id, marks,
+        attendance), or removes it when values is None.
+        """
+        position = bisect.bisect_left(self.ids, student_id)
+        found = position < len(self.ids) and self.ids[position] == student_id
+        if values is None:
+            if found:
+                for column in ('ids',) + COLUMNS:
+                    del getattr(self, column)[position]
+        elif found:
+            self.class_ids[position], self.marks[position], self.attendance[position] = values
+        else:
+            # New ids are the largest (AUTOINCREMENT), so this is an append
+            for column, value in zip(('ids',) + COLUMNS, (student_id,) + tuple(values)):
+                getattr(self, column).insert(position, value)
+
+
+_backend = SNAPSHOT_BACKEND
+_snapshot = None
+_lock = threading.Lock()
+_stats = {'loads': 0, 'patches': 0, 'skipped_patches': 0}
+
+
+def configure_snapshot(backend=SNAPSHOT_BACKEND):
+    """
+    Switches between 'memory' (a snapshot per process, patched after each
+    edit) and 'file' (a memory-mapped file shared by all worker processes,
+    see backend/snapshot_file.py).
+    """
+    global _backend, _snapshot
+    if backend not in ('memory', 'file'):
+        raise ValueError(f'Unknown snapshot backend: {backend}')
+    with _lock:
+        _backend = backend
+        _snapshot = None
+
+
+def get_snapshot_backend():
+    return _backend
+
+
+def _generation(conn):
+    row = conn.execute('SELECT epoch, generation FROM data_generation WHERE id = 1').fetchone()
+    return row[0], row[1]
+
+
+def load_snapshot(conn):
+    """Reads the columns of every student in one read transaction."""
+    started = not conn.in_transaction
+    if started:
+        # The generation and the rows must come from the same snapshot
+        conn.execute('BEGIN')
+    try:
+        epoch, generation = _generation(conn)
+        snapshot = StudentSnapshot(db.DATABASE, epoch, generation)
+        for row in conn.execute('SELECT id, class_id, marks, attendance FROM students ORDER BY id'):
+            snapshot.append(*row)
+        snapshot.class_names = {row[0]: row[1] for row in conn.execute('SELECT id, name FROM classes')}
+    finally:
+        if started:
+            conn.commit()
+    return snapshot
+
+
+def read_snapshot(conn, compute):
+    """
+    Returns compute(snapshot) for the current data generation. The
+    snapshot is loaded only when it is missing or behind; after edits made
+    through the routes it has usually been patched already. compute runs
+    under the snapshot lock, so it must not keep references to the columns.
+    A newer snapshot is fine too, e.g. for a report connection that reads
+    an older copy. With the 'file' backend, the mapped file is used instead.
+    """
+    global _snapshot
+    if _backend == 'file':
+        return compute(get_mapped_snapshot(conn))
+
+    epoch, generation = _generation(conn)
+    with _lock:
+        snapshot = _snapshot
+        if (snapshot is not None and snapshot.database_path == db.DATABASE
+                and snapshot.epoch == epoch and snapshot.generation >= generation):
+            return compute(snapshot)
+
+    # Loaded without the lock, so the writer thread is not held up. A
+    # patch that arrives meanwhile is skipped and the next read reloads.
+    snapshot = load_snapshot(conn)
+    with _lock:
+        _snapshot = snapshot
+        _stats['loads'] += 1
+        return compute(snapshot)
+
+
+def _patch(database_path, epoch, generation, student_id, values):
+    with _lock:
+        snapshot = _snapshot
+        if snapshot is None or snapshot.database_path != database_path:
+            return
+        if snapshot.epoch == epoch and snapshot.generation == generation - 1:
+            snapshot.apply(student_id, values)
+            snapshot.generation = generation
+            _stats['patches'] += 1
+        else:
+            # Something else changed the data as well; the next read reloads
+            _stats['skipped_patches'] += 1
+
+
+def record_student_change(conn, student_id):
+    """
+    Call inside a writer mutation, right after inserting, updating or
+    deleting one student. Once the change is committed, the snapshot is
+    patched in place instead of being loaded again on the next read.
+    """
+    if _backend != 'memory':
+        return
+    row = conn.execute('SELECT class_id, marks, attendance FROM students WHERE id = ?', (student_id,)).fetchone()
+    values = tuple(row) if row is not None else None
+    # The change itself moved the generation forward by one
+    epoch, generation = _generation(conn)
+    database_path = db.DATABASE
+    after_commit(lambda: _patch(database_path, epoch, generation, student_id, values))
+
+
+def get_snapshot_stats():
+    if _backend == 'file':
+        stats = get_snapshot_file_stats()
+    else:
+        with _lock:
+            stats = dict(_stats)
+            stats['students'] = len(_snapshot) if _snapshot is not None else 0
+    stats['backend'] = _backend
+    stats['engine'] = engine_name()
+    return stats
+
+
+def engine_name():
+    return 'numpy' if numpy is not None else 'array'
+
+
+# The functions below are called with the snapshot lock held (see
+# read_snapshot). Each has a NumPy version and a plain Python version.
+
+def _numpy_columns(snapshot):
+    # frombuffer shares the memory of the arrays instead of copying it
+    return (numpy.frombuffer(snapshot.class_ids, dtype=numpy.int64),
+            numpy.frombuffer(snapshot.marks, dtype=numpy.uint8).astype(numpy.float64),
+            numpy.frombuffer(snapshot.attendance, dtype=numpy.uint8).astype(numpy.float64))
+
+
+def histogram(snapshot, column, edges):
+    """
+    Counts per bin for any increasing bin edges. Bins include their lower
+    edge; the last one also includes its upper edge (like numpy.histogram).
+    """
+    values = getattr(snapshot, column)
+    if numpy is not None:
+        counts, _ = numpy.histogram(numpy.frombuffer(values, dtype=numpy.uint8), bins=edges)
+        return [int(count) for count in counts]
+
+    counts = [0] * (len(edges) - 1)
+    # Only 101 distinct values, so count them once and bin the counts
+    for value, count in Counter(values).items():
+        index = bisect.bisect_right(edges, value) - 1
+        if index == len(counts) and value == edges[-1]:
+            index -= 1
+        if 0 <= index < len(counts):
+            counts[index] += count
+    return counts
+
+
+def class_spread(snapshot):
+    """Per class: student count, mean and standard deviation of marks and attendance."""
+    if numpy is not None:
+        class_ids, marks, attendance = _numpy_columns(snapshot)
+        classes, inverse = numpy.unique(class_ids, return_inverse=True)
+        counts = numpy.bincount(inverse)
+        spread = {}
+        for name, values in (('marks', marks), ('attendance', attendance)):
+            means = numpy.bincount(inverse, weights=values) / counts
+            squares = numpy.bincount(inverse, weights=values * values) / counts
+            spread[name] = (means, numpy.sqrt(numpy.maximum(squares - means * means, 0)))
+        return {
+            int(class_id): {
+                'count': int(counts[i]),
+                'mean_marks': float(spread['marks'][0][i]),
+                'std_marks': float(spread['marks'][1][i]),
+                'mean_attendance': float(spread['attendance'][0][i]),
+                'std_attendance': float(spread['attendance'][1][i]),
+            }
+            for i, class_id in enumerate(classes)
+        }
+
+    sums = {}
+    for class_id, marks, attendance in zip(snapshot.class_ids, snapshot.marks, snapshot.attendance):
+        totals = sums.get(class_id)
+        if totals is None:
+            totals = sums[class_id] = [0, 0, 0, 0, 0]
+        totals[0] += 1
+        totals[1] += marks
+        totals[2] += marks * marks
+        totals[3] += attendance
+        totals[4] += attendance * attendance
+
+    result = {}
+    for class_id, (count, marks, marks_squared, attendance, attendance_squared) in sums.items():
+        mean_marks = marks / count
+        mean_attendance = attendance / count
+        result[class_id] = {
+            'count': count,
+            'mean_marks': mean_marks,
+            'std_marks': math.sqrt(max(marks_squared / count - mean_marks * mean_marks, 0)),
+            'mean_attendance': mean_attendance,
+            'std_attendance': math.sqrt(max(attendance_squared / count - mean_attendance * mean_attendance, 0)),
+        }
+    return result
+
+
+def z_scores(snapshot, spread=None):
+    """
+    Each student's marks as standard deviations from their class mean, in
+    student id order (same order as snapshot.ids). 0 when a class has no spread.
+    """
+    spread = spread or class_spread(snapshot)
+    if numpy is not None:
+        class_ids, marks, _ = _numpy_columns(snapshot)
+        classes = sorted(spread)
+        # Position of each student's class in `classes`
+        index = numpy.searchsorted(numpy.array(classes, dtype=numpy.int64), class_ids)
+        means = numpy.array([spread[c]['mean_marks'] for c in classes], dtype=numpy.float64)[index]
+        stds = numpy.array([spread[c]['std_marks'] for c in classes], dtype=numpy.float64)[index]
+        return numpy.divide(marks - means, stds, out=numpy.zeros_like(marks), where=stds > 0)
+
+    scores = array('d')
+    for class_id, marks in zip(snapshot.class_ids, snapshot.marks):
+        stats = spread[class_id]
+        scores.append((marks - stats['mean_marks']) / stats['std_marks'] if stats['std_marks'] else 0.0)
+    return scores
+
+
+def correlation(snapshot):
+    """Pearson correlation of marks and attendance, None without any spread."""
+    n = len(snapshot)
+    if n < 2:
+        return None
+    if numpy is not None:
+        _, marks, attendance = _numpy_columns(snapshot)
+        if marks.std() == 0 or attendance.std() == 0:
+            return None
+        return float(numpy.corrcoef(marks, attendance)[0, 1])
+
+    sum_m = sum(snapshot.marks)
+    sum_a = sum(snapshot.attendance)
+    sum_mm = sum(m * m for m in snapshot.marks)
+    sum_aa = sum(a * a for a in snapshot.attendance)
+    sum_ma = sum(m * a for m, a in zip(snapshot.marks, snapshot.attendance))
+    covariance = n * sum_ma - sum_m * sum_a
+    variance = (n * sum_mm - sum_m * sum_m) * (n * sum_aa - sum_a * sum_a)
+    if variance <= 0:
+        return None
+    return covariance / math.sqrt(variance)
+
+
+def at_risk_cohorts(snapshot, spread=None, marks_below=ATTENTION_MARKS_BELOW,
+                    attendance_below=ATTENTION_ATTENDANCE_BELOW, z_below=AT_RISK_Z_SCORE):
+    """
+    Student counts of the at-risk groups: low marks, low attendance, both,
+    far below their class average (z-score), and any of these.
+    """
+    scores = z_scores(snapshot, spread)
+    if numpy is not None:
+        _, marks, attendance = _numpy_columns(snapshot)
+        low_marks = marks < marks_below
+        low_attendance = attendance < attendance_below
+        below_class = scores < z_below
+        return {
+            'low_marks': int(low_marks.sum()),
+            'low_attendance': int(low_attendance.sum()),
+            'both': int((low_marks & low_attendance).sum()),
+            'below_class': int(below_class.sum()),
+            'any': int((low_marks | low_attendance | below_class).sum()),
+        }
+
+    cohorts = {'low_marks': 0, 'low_attendance': 0, 'both': 0, 'below_class': 0, 'any': 0}
+    for marks, attendance, score in zip(snapshot.marks, snapshot.attendance, scores):
+        low_marks = marks < marks_below
+        low_attendance = attendance < attendance_below
+        below_class = score < z_below
+        cohorts['low_marks'] += low_marks
+        cohorts['low_attendance'] += low_attendance
+        cohorts['both'] += low_marks and low_attendance
+        cohorts['below_class'] += below_class
+        cohorts['any'] += low_marks or low_attendance or below_class
+    return cohorts
+
+
+def compute_insights(snapshot, bins=INSIGHT_HISTOGRAM_BINS):
+    """Everything the insights section shows, as plain Python values."""
+    spread = class_spread(snapshot)
+    labels = [f'{low}-{high}' for low, high in zip(bins, bins[1:])]
+    return {
+        'engine': engine_name(),
+        'students': len(snapshot),
+        'correlation': correlation(snapshot),
+        'marks_histogram': list(zip(labels, histogram(snapshot, 'marks', bins))),
+        'attendance_histogram': list(zip(labels, histogram(snapshot, 'attendance', bins))),
+        'class_spread': spread,
+        'cohorts': at_risk_cohorts(snapshot, spread),
+    }
+
+
+def dashboard_stats(snapshot):
+    """The four dashboard numbers (see analytics.get_dashboard_stats)."""
+    total = len(snapshot)
+    if numpy is not None and total:
+        _, marks, attendance = _numpy_columns(snapshot)
+        sum_marks, sum_attendance = float(marks.sum()), float(attendance.sum())
+    else:
+        sum_marks, sum_attendance = sum(snapshot.marks), sum(snapshot.attendance)
+    return {
+        'total_students': total,
+        'class_count': len(snapshot.class_names),
+        'avg_marks': sum_marks / total if total else 0,
+        'avg_attendance': sum_attendance / total if total else 0,
+    }
+
+
+def top_students(snapshot, limit=TOP_PERFORMERS_COUNT):
+    """Positions (in id order) of the limit students with the highest marks."""
+    if numpy is not None:
+        _, marks, _ = _numpy_columns(snapshot)
+        # Stable, so equal marks keep id order
+        return [int(i) for i in numpy.argsort(-marks, kind='stable')[:limit]]
+    return heapq.nsmallest(limit, range(len(snapshot)), key=lambda i: (-snapshot.marks[i], i))
+
+
+def students_below(snapshot, marks_below=ATTENTION_MARKS_BELOW, attendance_below=ATTENTION_ATTENDANCE_BELOW):
+    """Positions of the students below either limit, highest marks first."""
+    if numpy is not None:
+        _, marks, attendance = _numpy_columns(snapshot)
+        positions = numpy.flatnonzero((marks < marks_below) | (attendance < attendance_below))
+        return [int(i) for i in positions[numpy.argsort(-marks[positions], kind='stable')]]
+    positions = [i for i, (marks, attendance) in enumerate(zip(snapshot.marks, snapshot.attendance))
+                 if marks < marks_below or attendance < attendance_below]
+    return sorted(positions, key=lambda i: -snapshot.marks[i])
@@ -0,0 +1,107 @@
+import sqlite3
+
+import click
+
+from backend.attendance import find_attendance_drift, rebuild_attendance_rollups
+from backend.auth import create_api_token
+from backend.class_stats import find_drift, rebuild_class_stats
+from backend.db import get_db_connection
+from backend.importer import IMPORT_BATCH_SIZE, import_students
+from backend.snapshot_file import export_snapshot, snapshot_path
+
+
+def _print_drift(drift):
+    for item in drift:
+        where = f"class {item['class_id']}"
+        if 'metric' in item:
+            where += f" {item['metric']}={item['value']}"
+        click.echo(f"  {item['table']} {where}: stored {item['stored']}, expected {item['expected']}")
+
+
+def register_commands(app):
+    @app.cli.command('verify-class-stats')
+    def verify_class_stats():
+        """Compare class_stats with the students table and report drift."""
+        conn = get_db_connection()
+        drift = find_drift(conn)
+
+        if not drift:
+            click.echo('class_stats is up to date')
+            return
+        click.echo(f'Found {len(drift)} difference(s):')
+        _print_drift(drift)
+        raise SystemExit(1)
+
+    @app.cli.command('rebuild-class-stats')
+    def rebuild_class_stats_command():
+        """Recompute class_stats from scratch."""
+        conn = get_db_connection()
+        drift = find_drift(conn)
+        rebuild_class_stats(conn)
+        conn.commit()
+
+        if drift:
+            click.echo(f'Fixed {len(drift)} difference(s):')
+            _print_drift(drift)
+        click.echo('class_stats rebuilt')
+
+    @app.cli.command('rebuild-attendance-rollups')
+    def rebuild_attendance_rollups_command():
+        """Recompute the attendance rollups from the attendance events."""
+        conn = get_db_connection()
+        drift = find_attendance_drift(conn)
+        rebuild_attendance_rollups(conn)
+        conn.commit()
+
+        if drift:
+            click.echo(f'Fixed {len(drift)} difference(s):')
+            for item in drift:
+                click.echo(f"  {item['table']} {item['key']}: stored {item['stored']}, expected {item['expected']}")
+        click.echo('attendance rollups rebuilt')
+
+    @app.cli.command('export-snapshot')
+    def export_snapshot_command():
+        """Write the memory-mapped snapshot file for the current data."""
+        conn = get_db_connection()
+        path = snapshot_path()
+        snapshot = export_snapshot(conn, path)
+        click.echo(f'{len(snapshot)} students written to {path} (generation {snapshot.epoch}-{snapshot.generation})')
+
+    @app.cli.command('import-students')
+    @click.argument('csv_file', type=click.File('r', encoding='utf-8-sig'))
+    @click.option('--dry-run', is_flag=True, help='Check the file without saving anything.')
+    @click.option('--batch-size', default=IMPORT_BATCH_SIZE, show_default=True,
+                  help='Rows inserted per transaction.')
+    def import_students_command(csv_file, dry_run, batch_size):
+        """Import students from a CSV file (name, roll_no, class, subjects, marks, attendance)."""
+        conn = get_db_connection()
+        report = import_students(conn, csv_file, batch_size=batch_size, dry_run=dry_run)
+
+        for error in report['errors']:
+            click.echo(f"  line {error['line']}: {error['message']}" + (f" ({error['roll_no']})" if error['roll_no'] else ''))
+        action = 'would be inserted' if dry_run else 'inserted'
+        count = report['valid'] if dry_run else report['inserted']
+        click.echo(f"{report['rows']} rows read, {count} {action}, {report['error_count']} errors "
+                   f"in {report['seconds']:.2f}s ({report['rows_per_second']:.0f} rows/sec)")
+
+    @app.cli.command('create-api-token')
+    @click.argument('name')
+    def create_api_token_command(name):
+        """Create a token for the JSON API. The token is only shown once."""
+        conn = get_db_connection()
+        try:
+            token = create_api_token(conn, name)
+        except sqlite3.IntegrityError:
+            raise click.ClickException(f"A token named '{name}' already exists")
+        click.echo(token)
+
+    @app.cli.command('revoke-api-token')
+    @click.argument('name')
+    def revoke_api_token_command(name):
+        """Delete an API token by name."""
+        conn = get_db_connection()
+        deleted = conn.execute('DELETE FROM api_tokens WHERE name = ?', (name,)).rowcount
+        conn.commit()
+        if not deleted:
+            raise click.ClickException(f"No token named '{name}'")
+        click.echo(f"Token '{name}' revoked")
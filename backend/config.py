@@ -4,3 +4,138 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, os.pardir))
 TEMPLATES_DIR = os.path.join(PROJECT_ROOT, 'frontend', 'templates')
 DEFAULT_DATABASE_PATH = os.path.join(PROJECT_ROOT, 'database.db')
+
+# Connection pool settings
+DB_POOL_SIZE = 8  # Idle connections kept open between requests
+DB_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,  # milliseconds
+    'mmap_size': 268435456,  # 256 MB
+    'cache_size': -20000,  # negative means KiB, so about 20 MB
+}
+
+# Pagination settings for list pages
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Analytics distribution buckets: (label, lowest value, highest value).
+# A missing bound (None) means the bucket is open on that side.
+MARKS_BUCKETS = [
+    ('90-100', 90, None),
+    ('80-89', 80, 89),
+    ('70-79', 70, 79),
+    ('60-69', 60, 69),
+    ('50-59', 50, 59),
+    ('Below 50', None, 49),
+]
+ATTENDANCE_BUCKETS = [
+    ('90-100', 90, None),
+    ('80-89', 80, 89),
+    ('70-79', 70, 79),
+    ('60-69', 60, 69),
+    ('Below 60', None, 59),
+]
+
+# Students below either limit are listed as needing attention
+ATTENTION_MARKS_BELOW = 50
+ATTENTION_ATTENDANCE_BELOW = 60
+TOP_PERFORMERS_COUNT = 5
+# Students shown on a class leaderboard unless ?limit= says otherwise
+LEADERBOARD_SIZE = 10
+
+# Result cache for analytics and dashboard data: 'memory' (per process) or
+# 'disk' (a SQLite file shared by all worker processes)
+CACHE_BACKEND = 'memory'
+CACHE_TTL = 300  # seconds
+CACHE_MAX_ENTRIES = 64
+CACHE_PATH = os.path.join(PROJECT_ROOT, 'cache.db')
+
+# Exports are sent in chunks of this many rows
+EXPORT_CHUNK_ROWS = 1000
+
+# Per-request SQL/template timing, the Server-Timing header and /metrics.
+# When off, each query only checks a flag.
+METRICS_ENABLED = False
+# Upper bounds (seconds) of the request duration histogram buckets
+METRICS_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+
+# Slow-query log, off by default like the metrics. When on, statements
+# slower than SLOW_QUERY_THRESHOLD_MS are logged with their query plan to
+# a separate SQLite file. The newest SLOW_QUERY_MAX_ROWS records are kept.
+SLOW_QUERY_LOG_ENABLED = False
+SLOW_QUERY_THRESHOLD_MS = 100
+SLOW_QUERY_LOG_PATH = os.path.join(PROJECT_ROOT, 'slow_queries.db')
+SLOW_QUERY_MAX_ROWS = 10000
+
+# Request profiling for logged-in admins, off by default. When on, a
+# request is profiled if it sends the PROFILE_HEADER ('cpu' or 'memory')
+# or is picked by PROFILE_SAMPLE_RATE (0.01 = 1% of requests).
+PROFILING_ENABLED = False
+PROFILE_SAMPLE_RATE = 0.0
+PROFILE_HEADER = 'X-Profile'
+PROFILE_DIR = os.path.join(PROJECT_ROOT, 'profiles')
+PROFILE_MAX_FILES = 100
+
+# All writes from the routes go through one writer thread. Up to
+# WRITER_BATCH_SIZE queued changes are committed together; when
+# WRITER_QUEUE_SIZE changes are waiting, new ones wait up to
+# WRITER_SUBMIT_TIMEOUT seconds for room and then fail. A route gives up
+# on a queued change after WRITER_COMMIT_TIMEOUT seconds.
+WRITER_QUEUE_SIZE = 256
+WRITER_BATCH_SIZE = 64
+WRITER_SUBMIT_TIMEOUT = 5
+WRITER_COMMIT_TIMEOUT = 60
+
+# Compiled templates are stored here, so new worker processes do not have
+# to compile them again (None keeps them in memory only)
+TEMPLATE_CACHE_DIR = os.path.join(PROJECT_ROOT, '.template_cache')
+# Rendered {% cache %} blocks kept per process, per data generation
+FRAGMENT_CACHE_ENABLED = True
+FRAGMENT_CACHE_MAX_ENTRIES = 5000
+
+# Streamed pages (/view-students?all=1) are sent in chunks of this many
+# template output pieces; about one per table row
+STREAM_BUFFER_SIZE = 50
+
+# Statistical insights on the analytics page, computed from a columnar
+# copy of marks, attendance and class_id (NumPy when installed)
+INSIGHT_HISTOGRAM_BINS = [0, 10, 20, 30, 40, 50, 60, 70, 80, 90, 100]
+# Students this many standard deviations below their class mean are at risk
+AT_RISK_Z_SCORE = -1.0
+
+# Where that columnar copy lives: 'memory' (one per process, patched after
+# each edit) or 'file' (a memory-mapped file next to the database, shared
+# by all worker processes). With 'file', the dashboard and the analytics
+# student lists are read from the file as well.
+SNAPSHOT_BACKEND = 'memory'
+SNAPSHOT_FILE_SUFFIX = '.snapshot'
+
+# Analytics, exports and leaderboards read through a separate read-only
+# connection. 'wal' reads the live database in one read transaction;
+# 'backup' reads a copy made with the SQLite backup API (next to the
+# database, with REPORT_COPY_SUFFIX), made again once it is older than
+# REPORT_MAX_STALENESS seconds. The pages show how old their data is.
+REPORT_SOURCE = 'wal'
+REPORT_MAX_STALENESS = 60
+REPORT_COPY_SUFFIX = '.report'
+
+# Background jobs (/jobs): up to JOB_WORKERS run at the same time in each
+# process. Progress is saved, and cancellation checked, at most every
+# JOB_PROGRESS_INTERVAL seconds. Files uploaded for a job are kept next to
+# the database (with JOB_UPLOAD_SUFFIX) until the job has finished.
+# A process marks its running jobs alive every JOB_HEARTBEAT_INTERVAL
+# seconds; a running job not marked for JOB_HEARTBEAT_TIMEOUT seconds
+# counts as interrupted.
+JOB_WORKERS = 2
+JOB_PROGRESS_INTERVAL = 0.5
+JOB_HEARTBEAT_INTERVAL = 10
+JOB_HEARTBEAT_TIMEOUT = 60
+JOB_LIST_SIZE = 50
+JOB_UPLOAD_SUFFIX = '.uploads'
+
+# Daily attendance (/classes/<id>/attendance). A class page lists the last
+# ATTENDANCE_HISTORY_DAYS days marked; the recompute-attendance job updates
+# students.attendance ATTENDANCE_RECOMPUTE_BATCH students per transaction.
+ATTENDANCE_HISTORY_DAYS = 14
+ATTENDANCE_RECOMPUTE_BATCH = 5000
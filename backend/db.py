@@ -1,23 +1,628 @@
+import secrets
 import sqlite3
+import threading
 
+from flask import g, has_app_context
 from werkzeug.security import generate_password_hash
 
-from backend.config import DEFAULT_DATABASE_PATH
+from backend.class_stats import rebuild_class_stats
+from backend.config import DB_POOL_SIZE, DB_PRAGMAS, DEFAULT_DATABASE_PATH
+from backend.metrics import InstrumentedConnection
+from backend.subjects import rebuild_student_subjects
 
 DATABASE = DEFAULT_DATABASE_PATH
 
+# Connection pool: idle connections are kept here between requests
+POOL_SIZE = DB_POOL_SIZE
+PRAGMAS = dict(DB_PRAGMAS)
+
+_pool = []
+_pool_lock = threading.Lock()
+_pool_stats = {'hits': 0, 'misses': 0, 'discarded': 0}
+
 
 def set_database_path(database_path: str):
     global DATABASE
     DATABASE = database_path
+    close_pool()
 
 
-def get_db_connection():
-    conn = sqlite3.connect(DATABASE)
+def configure_pool(size=None, pragmas=None):
+    """
+    Changes the pool size and/or PRAGMAs. Idle connections are closed so
+    that new settings apply to every connection handed out afterwards.
+    """
+    global POOL_SIZE
+    if size is not None:
+        POOL_SIZE = size
+    if pragmas is not None:
+        PRAGMAS.update(pragmas)
+    close_pool()
+
+
+def _connect(database_path=None):
+    # check_same_thread is off because pooled connections move between
+    # request threads (only one request uses a connection at a time)
+    conn = sqlite3.connect(database_path or DATABASE, check_same_thread=False, factory=InstrumentedConnection)
     conn.row_factory = sqlite3.Row
+    for name, value in PRAGMAS.items():
+        conn.execute(f'PRAGMA {name} = {value}')
     return conn
 
 
+def open_connection(database_path=None):
+    """A new connection with the pool's settings that is not part of the pool."""
+    return _connect(database_path)
+
+
+def _acquire():
+    with _pool_lock:
+        if _pool:
+            _pool_stats['hits'] += 1
+            return _pool.pop()
+        _pool_stats['misses'] += 1
+    return _connect()
+
+
+def _release(conn, database_path):
+    try:
+        # Never hand a connection with an open transaction to the next request
+        conn.rollback()
+    except sqlite3.ProgrammingError:
+        # Connection was closed by the caller, nothing to return
+        with _pool_lock:
+            _pool_stats['discarded'] += 1
+        return
+
+    with _pool_lock:
+        if database_path == DATABASE and len(_pool) < POOL_SIZE:
+            _pool.append(conn)
+            return
+        _pool_stats['discarded'] += 1
+    conn.close()
+
+
+def get_db_connection():
+    """
+    Returns the connection for the current request. Inside a request the
+    connection is taken from the pool, stored on flask.g and returned to the
+    pool on teardown. Outside a request a new connection is returned and the
+    caller must close it.
+    """
+    if not has_app_context():
+        return _connect()
+
+    if 'db' not in g:
+        g.db = _acquire()
+        g.db_path = DATABASE
+    return g.db
+
+
+def close_db_connection(exception=None):
+    conn = g.pop('db', None)
+    database_path = g.pop('db_path', None)
+    if conn is not None:
+        _release(conn, database_path)
+
+
+def close_pool():
+    with _pool_lock:
+        idle = list(_pool)
+        _pool.clear()
+    for conn in idle:
+        conn.close()
+
+
+def get_pool_stats():
+    with _pool_lock:
+        stats = dict(_pool_stats)
+        stats['idle'] = len(_pool)
+        stats['size'] = POOL_SIZE
+    return stats
+
+
+def init_app(app):
+    app.teardown_appcontext(close_db_connection)
+
+
+def _add_query_indexes(conn):
+    # Joins on class_id, the student count in delete_class and the class
+    # name sort (students of a class come out in id order)
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_students_class ON students (class_id)')
+
+    # Covering index for the per-class AVG/MIN/MAX in analytics and the
+    # marks sort inside a class
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_students_class_marks ON students (class_id, marks, attendance)')
+
+    # Sort keys of view_students. SQLite adds the rowid to every index, so
+    # these also serve the (column, id) order used by keyset pagination.
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_students_name ON students (name)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_students_marks ON students (marks)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_students_attendance ON students (attendance)')
+
+
+def fts5_available(conn):
+    try:
+        conn.execute('CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)')
+    except sqlite3.OperationalError:
+        return False
+    conn.execute('DROP TABLE temp.fts5_probe')
+    return True
+
+
+def _add_search_index(conn):
+    # Without FTS5 the search falls back to LIKE (see backend/search.py)
+    if not fts5_available(conn):
+        return
+
+    # External content tables: the text stays in students/classes and the
+    # triggers keep the full-text index in sync with every change
+    conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS students_fts USING fts5(
+            name, roll_no, content='students', content_rowid='id', prefix='2 3'
+        )
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS students_fts_insert AFTER INSERT ON students BEGIN
+            INSERT INTO students_fts (rowid, name, roll_no) VALUES (new.id, new.name, new.roll_no);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS students_fts_delete AFTER DELETE ON students BEGIN
+            INSERT INTO students_fts (students_fts, rowid, name, roll_no) VALUES ('delete', old.id, old.name, old.roll_no);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS students_fts_update AFTER UPDATE OF name, roll_no ON students BEGIN
+            INSERT INTO students_fts (students_fts, rowid, name, roll_no) VALUES ('delete', old.id, old.name, old.roll_no);
+            INSERT INTO students_fts (rowid, name, roll_no) VALUES (new.id, new.name, new.roll_no);
+        END
+    ''')
+
+    conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS classes_fts USING fts5(
+            name, content='classes', content_rowid='id', prefix='2 3'
+        )
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS classes_fts_insert AFTER INSERT ON classes BEGIN
+            INSERT INTO classes_fts (rowid, name) VALUES (new.id, new.name);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS classes_fts_delete AFTER DELETE ON classes BEGIN
+            INSERT INTO classes_fts (classes_fts, rowid, name) VALUES ('delete', old.id, old.name);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS classes_fts_update AFTER UPDATE OF name ON classes BEGIN
+            INSERT INTO classes_fts (classes_fts, rowid, name) VALUES ('delete', old.id, old.name);
+            INSERT INTO classes_fts (rowid, name) VALUES (new.id, new.name);
+        END
+    ''')
+
+    # Index the rows that existed before the migration
+    conn.execute("INSERT INTO students_fts (students_fts) VALUES ('rebuild')")
+    conn.execute("INSERT INTO classes_fts (classes_fts) VALUES ('rebuild')")
+
+
+# Trigger statements that add/remove one student ({row} is new or old) to
+# the class statistics. Min and max are read back from the histogram after
+# a removal, since they can't be undone incrementally.
+_CLASS_STATS_ADD = '''
+    INSERT INTO class_stats (class_id, student_count, sum_marks, sum_attendance,
+                             min_marks, max_marks, min_attendance, max_attendance)
+    VALUES ({row}.class_id, 1, {row}.marks, {row}.attendance,
+            {row}.marks, {row}.marks, {row}.attendance, {row}.attendance)
+    ON CONFLICT (class_id) DO UPDATE SET
+        student_count = student_count + 1,
+        sum_marks = sum_marks + excluded.sum_marks,
+        sum_attendance = sum_attendance + excluded.sum_attendance,
+        min_marks = MIN(COALESCE(min_marks, excluded.min_marks), excluded.min_marks),
+        max_marks = MAX(COALESCE(max_marks, excluded.max_marks), excluded.max_marks),
+        min_attendance = MIN(COALESCE(min_attendance, excluded.min_attendance), excluded.min_attendance),
+        max_attendance = MAX(COALESCE(max_attendance, excluded.max_attendance), excluded.max_attendance);
+    INSERT INTO class_stats_histogram (class_id, metric, value, student_count)
+    VALUES ({row}.class_id, 'marks', {row}.marks, 1)
+    ON CONFLICT (class_id, metric, value) DO UPDATE SET student_count = student_count + 1;
+    INSERT INTO class_stats_histogram (class_id, metric, value, student_count)
+    VALUES ({row}.class_id, 'attendance', {row}.attendance, 1)
+    ON CONFLICT (class_id, metric, value) DO UPDATE SET student_count = student_count + 1;
+'''
+
+_CLASS_STATS_REMOVE = '''
+    UPDATE class_stats_histogram SET student_count = student_count - 1
+    WHERE class_id = {row}.class_id AND metric = 'marks' AND value = {row}.marks;
+    UPDATE class_stats_histogram SET student_count = student_count - 1
+    WHERE class_id = {row}.class_id AND metric = 'attendance' AND value = {row}.attendance;
+    DELETE FROM class_stats_histogram
+    WHERE class_id = {row}.class_id AND metric = 'marks' AND value = {row}.marks AND student_count <= 0;
+    DELETE FROM class_stats_histogram
+    WHERE class_id = {row}.class_id AND metric = 'attendance' AND value = {row}.attendance AND student_count <= 0;
+    UPDATE class_stats SET
+        student_count = student_count - 1,
+        sum_marks = sum_marks - {row}.marks,
+        sum_attendance = sum_attendance - {row}.attendance,
+        min_marks = (SELECT MIN(value) FROM class_stats_histogram WHERE class_id = {row}.class_id AND metric = 'marks'),
+        max_marks = (SELECT MAX(value) FROM class_stats_histogram WHERE class_id = {row}.class_id AND metric = 'marks'),
+        min_attendance = (SELECT MIN(value) FROM class_stats_histogram WHERE class_id = {row}.class_id AND metric = 'attendance'),
+        max_attendance = (SELECT MAX(value) FROM class_stats_histogram WHERE class_id = {row}.class_id AND metric = 'attendance')
+    WHERE class_id = {row}.class_id;
+'''
+
+
+def _add_class_stats(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS class_stats (
+            class_id INTEGER PRIMARY KEY,
+            student_count INTEGER NOT NULL DEFAULT 0,
+            sum_marks INTEGER NOT NULL DEFAULT 0,
+            sum_attendance INTEGER NOT NULL DEFAULT 0,
+            min_marks INTEGER,
+            max_marks INTEGER,
+            min_attendance INTEGER,
+            max_attendance INTEGER
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS class_stats_histogram (
+            class_id INTEGER NOT NULL,
+            metric TEXT NOT NULL,
+            value INTEGER NOT NULL,
+            student_count INTEGER NOT NULL,
+            PRIMARY KEY (class_id, metric, value)
+        ) WITHOUT ROWID
+    ''')
+
+    add_new = _CLASS_STATS_ADD.format(row='new')
+    remove_old = _CLASS_STATS_REMOVE.format(row='old')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS class_stats_insert AFTER INSERT ON students BEGIN
+            {add_new}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS class_stats_delete AFTER DELETE ON students BEGIN
+            {remove_old}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS class_stats_update AFTER UPDATE OF class_id, marks, attendance ON students BEGIN
+            {remove_old}
+            {add_new}
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS class_stats_class_delete AFTER DELETE ON classes BEGIN
+            DELETE FROM class_stats WHERE class_id = old.id;
+            DELETE FROM class_stats_histogram WHERE class_id = old.id;
+        END
+    ''')
+
+    rebuild_class_stats(conn)
+
+
+def _add_data_generation(conn):
+    # A single row counting changes to students and classes. The epoch is
+    # random per database, so a recreated database never reuses a number.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS data_generation (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            epoch TEXT NOT NULL,
+            generation INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('INSERT OR IGNORE INTO data_generation (id, epoch, generation) VALUES (1, ?, 0)',
+                 (secrets.token_hex(8),))
+
+    # Bumped inside the writing transaction, so every route, import or
+    # other process that changes data moves the generation forward
+    for table in ('students', 'classes'):
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_generation_{event.lower()} AFTER {event} ON {table} BEGIN
+                    UPDATE data_generation SET generation = generation + 1 WHERE id = 1;
+                END
+            ''')
+
+
+def get_data_generation(conn):
+    """
+    Returns a string that changes whenever students, classes or the
+    attendance rollups change.
+    Used as the version of cached results.
+    """
+    row = conn.execute('SELECT epoch, generation FROM data_generation WHERE id = 1').fetchone()
+    return f"{row['epoch']}-{row['generation']}"
+
+
+def _add_api_tokens(conn):
+    # Only a SHA-256 hash of each token is stored; the token itself is
+    # shown once when it is created
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS api_tokens (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            token_hash TEXT UNIQUE NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def _add_subjects(conn):
+    # students.subjects stays as typed; these tables hold the same subjects
+    # one row per student and subject, so they can be filtered and grouped
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS subjects (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL COLLATE NOCASE
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS student_subjects (
+            student_id INTEGER NOT NULL,
+            subject_id INTEGER NOT NULL,
+            PRIMARY KEY (student_id, subject_id),
+            FOREIGN KEY (student_id) REFERENCES students (id),
+            FOREIGN KEY (subject_id) REFERENCES subjects (id)
+        ) WITHOUT ROWID
+    ''')
+    # The primary key finds a student's subjects, this index a subject's students
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_student_subjects_subject ON student_subjects(subject_id, student_id)')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS student_subjects_student_delete AFTER DELETE ON students BEGIN
+            DELETE FROM student_subjects WHERE student_id = old.id;
+        END
+    ''')
+    rebuild_student_subjects(conn)
+
+
+def _add_jobs(conn):
+    # Background jobs (backend/jobs.py). params and result are JSON. owner
+    # (host:pid) and boot_id identify the process running the job, and it
+    # sets heartbeat_at while the job runs, so a restart can tell which
+    # running jobs were interrupted, even when the pid was reused or the
+    # job ran on a host that is gone.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            params TEXT NOT NULL DEFAULT '{}',
+            status TEXT NOT NULL DEFAULT 'queued'
+                CHECK (status IN ('queued', 'running', 'done', 'failed', 'cancelled')),
+            progress REAL NOT NULL DEFAULT 0,
+            message TEXT,
+            result TEXT,
+            error TEXT,
+            cancel_requested INTEGER NOT NULL DEFAULT 0,
+            owner TEXT,
+            boot_id TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            heartbeat_at TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status)')
+
+
+# Trigger statements that add/remove one attendance_days row ({row} is new
+# or old) to the per-student and per-class-and-day totals
+_ATTENDANCE_ADD = '''
+    INSERT INTO attendance_students (student_id, days_recorded, days_present)
+    VALUES ({row}.student_id, 1, {row}.present)
+    ON CONFLICT (student_id) DO UPDATE SET
+        days_recorded = days_recorded + 1,
+        days_present = days_present + excluded.days_present;
+    INSERT INTO attendance_class_days (class_id, day, students_recorded, students_present)
+    VALUES ({row}.class_id, {row}.day, 1, {row}.present)
+    ON CONFLICT (class_id, day) DO UPDATE SET
+        students_recorded = students_recorded + 1,
+        students_present = students_present + excluded.students_present;
+'''
+
+_ATTENDANCE_REMOVE = '''
+    UPDATE attendance_students SET
+        days_recorded = days_recorded - 1,
+        days_present = days_present - {row}.present
+    WHERE student_id = {row}.student_id;
+    UPDATE attendance_class_days SET
+        students_recorded = students_recorded - 1,
+        students_present = students_present - {row}.present
+    WHERE class_id = {row}.class_id AND day = {row}.day;
+'''
+
+# Attendance percentage of an attendance_students row
+_ATTENDANCE_PERCENT = 'CAST(ROUND(100.0 * {row}.days_present / {row}.days_recorded) AS INTEGER)'
+
+
+def _adjust_attendance(value, delta, condition):
+    # One UPSERT into attendance_adjustments, for use in a trigger body
+    return f'''
+        INSERT INTO attendance_adjustments (value, delta) SELECT {value}, {delta} WHERE {condition}
+        ON CONFLICT (value) DO UPDATE SET delta = delta + excluded.delta;
+    '''
+
+
+def _add_attendance(conn):
+    # Append-only log of attendance marks. No indexes besides the rowid,
+    # so a whole class (or a batch from the API) is one cheap run of appends.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS attendance_events (
+            id INTEGER PRIMARY KEY,
+            student_id INTEGER NOT NULL,
+            class_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            present INTEGER NOT NULL CHECK (present IN (0, 1)),
+            recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    # The rollups. attendance_days holds the latest mark per student and
+    # day, so marking a day again corrects it instead of counting twice.
+    # The other tables are totals over attendance_days.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS attendance_days (
+            student_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            class_id INTEGER NOT NULL,
+            present INTEGER NOT NULL,
+            PRIMARY KEY (student_id, day)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS attendance_students (
+            student_id INTEGER PRIMARY KEY,
+            days_recorded INTEGER NOT NULL,
+            days_present INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS attendance_class_days (
+            class_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            students_recorded INTEGER NOT NULL,
+            students_present INTEGER NOT NULL,
+            PRIMARY KEY (class_id, day)
+        ) WITHOUT ROWID
+    ''')
+    # Per attendance value, +1 for every student with recorded days at
+    # their recorded percentage and -1 at their typed-in attendance. Added
+    # to the class_stats attendance histogram it counts every student once,
+    # for the analytics buckets: by recorded days where there are any,
+    # otherwise by students.attendance.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS attendance_adjustments (
+            value INTEGER PRIMARY KEY,
+            delta INTEGER NOT NULL
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS attendance_events_insert AFTER INSERT ON attendance_events BEGIN
+            INSERT INTO attendance_days (student_id, day, class_id, present)
+            VALUES (new.student_id, new.day, new.class_id, new.present)
+            ON CONFLICT (student_id, day) DO UPDATE SET
+                class_id = excluded.class_id,
+                present = excluded.present
+            WHERE class_id != excluded.class_id OR present != excluded.present;
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS attendance_days_insert AFTER INSERT ON attendance_days BEGIN
+            {_ATTENDANCE_ADD.format(row='new')}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS attendance_days_update AFTER UPDATE ON attendance_days BEGIN
+            {_ATTENDANCE_REMOVE.format(row='old')}
+            {_ATTENDANCE_ADD.format(row='new')}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS attendance_days_delete AFTER DELETE ON attendance_days BEGIN
+            {_ATTENDANCE_REMOVE.format(row='old')}
+            DELETE FROM attendance_students WHERE student_id = old.student_id AND days_recorded <= 0;
+            DELETE FROM attendance_class_days WHERE class_id = old.class_id AND day = old.day AND students_recorded <= 0;
+        END
+    ''')
+
+    # Keeps attendance_adjustments in step with attendance_students. A row
+    # counts while it has recorded days. The typed-in value is read from
+    # students; once the student is deleted, attendance_student_delete has
+    # undone it already. A change here also moves the data generation, so
+    # cached analytics are recomputed.
+    def typed(row):
+        return f'(SELECT attendance FROM students WHERE id = {row}.student_id)'
+
+    def add(row):
+        return (_adjust_attendance(_ATTENDANCE_PERCENT.format(row=row), 1, f'{row}.days_recorded > 0')
+                + _adjust_attendance(typed(row), -1, f'{row}.days_recorded > 0 AND {typed(row)} IS NOT NULL'))
+
+    def remove(row):
+        return (_adjust_attendance(_ATTENDANCE_PERCENT.format(row=row), -1, f'{row}.days_recorded > 0')
+                + _adjust_attendance(typed(row), 1, f'{row}.days_recorded > 0 AND {typed(row)} IS NOT NULL'))
+
+    cleanup = 'DELETE FROM attendance_adjustments WHERE delta = 0;'
+    bump = 'UPDATE data_generation SET generation = generation + 1 WHERE id = 1;'
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS attendance_students_insert AFTER INSERT ON attendance_students BEGIN
+            {add('new')} {cleanup} {bump}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS attendance_students_update AFTER UPDATE ON attendance_students BEGIN
+            {remove('old')} {add('new')} {cleanup} {bump}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS attendance_students_delete AFTER DELETE ON attendance_students BEGIN
+            {remove('old')} {cleanup} {bump}
+        END
+    ''')
+
+    covered = 'EXISTS (SELECT 1 FROM attendance_students WHERE student_id = {id} AND days_recorded > 0)'
+    # The typed-in value of a student with recorded days moves (e.g. the
+    # recompute-attendance job), or goes away with the student. A deleted
+    # student also leaves the per-student totals; the marks stay in the
+    # log and in the class history.
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS attendance_student_update AFTER UPDATE OF attendance ON students
+        WHEN old.attendance != new.attendance BEGIN
+            {_adjust_attendance('old.attendance', 1, covered.format(id='new.id'))}
+            {_adjust_attendance('new.attendance', -1, covered.format(id='new.id'))}
+            {cleanup}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS attendance_student_delete AFTER DELETE ON students BEGIN
+            {_adjust_attendance('old.attendance', 1, covered.format(id='old.id'))}
+            DELETE FROM attendance_students WHERE student_id = old.id;
+        END
+    ''')
+
+
+# Schema migrations in the order they must run. A migration's position in
+# this list (starting at 1) is the schema version stored in
+# PRAGMA user_version. Only ever append to this list.
+MIGRATIONS = [
+    _add_query_indexes,
+    _add_search_index,
+    _add_class_stats,
+    _add_data_generation,
+    _add_api_tokens,
+    _add_subjects,
+    _add_jobs,
+    _add_attendance,
+]
+
+
+def get_schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn):
+    """
+    Applies the migrations the database has not seen yet, each one in its
+    own transaction together with the user_version update.
+    """
+    for version, migration in enumerate(MIGRATIONS, start=1):
+        if get_schema_version(conn) >= version:
+            continue
+
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Another process may have applied it while we waited for the lock
+            if get_schema_version(conn) < version:
+                migration(conn)
+                conn.execute(f'PRAGMA user_version = {version}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    return get_schema_version(conn)
+
+
 def init_db():
     conn = get_db_connection()
 
@@ -54,6 +659,9 @@ def init_db():
         )
     ''')
 
+    conn.commit()
+    migrate(conn)
+
     # Check if admin exists, if not create default admin
     admin = conn.execute('SELECT * FROM admin WHERE username = ?', ('admin',)).fetchone()
     if not admin:
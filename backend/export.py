@@ -0,0 +1,82 @@
+import csv
+import io
+import json
+import zlib
+
+from flask import Response, stream_with_context
+
+from backend.config import EXPORT_CHUNK_ROWS
+
+STUDENT_EXPORT_COLUMNS = ['id', 'name', 'roll_no', 'class_name', 'subjects', 'marks', 'attendance']
+CLASS_STATS_EXPORT_COLUMNS = ['name', 'student_count', 'avg_marks', 'avg_attendance', 'min_marks', 'max_marks']
+
+EXPORT_MIMETYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def csv_chunks(rows, columns, chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    Yields CSV text for `rows` (any iterable, e.g. a cursor), a header line
+    first and then `chunk_rows` rows at a time.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    count = 0
+    for row in rows:
+        writer.writerow([row[column] for column in columns])
+        count += 1
+        if count % chunk_rows == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def ndjson_chunks(rows, columns, chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    Yields one JSON object per line for `rows`, `chunk_rows` lines at a time.
+    """
+    lines = []
+    for row in rows:
+        lines.append(json.dumps({column: row[column] for column in columns}))
+        if len(lines) >= chunk_rows:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def gzip_chunks(chunks):
+    """Compresses text chunks into a gzip stream as they are produced."""
+    # wbits 16 + 15 writes a gzip header and trailer instead of raw zlib
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_response(rows, columns, fmt, filename, gzip=False):
+    """
+    Streams `rows` as a CSV or NDJSON download. Rows are read from the
+    cursor while the response is sent, so memory use does not depend on
+    the number of rows.
+    """
+    if fmt == 'csv':
+        chunks = csv_chunks(rows, columns)
+    else:
+        chunks = ndjson_chunks(rows, columns)
+
+    headers = {'Content-Disposition': f'attachment; filename={filename}.{fmt}'}
+    if gzip:
+        chunks = gzip_chunks(chunks)
+        headers['Content-Encoding'] = 'gzip'
+    headers['Vary'] = 'Accept-Encoding'
+
+    # The request context (and its pooled connection) stays open until the
+    # last chunk has been sent
+    return Response(stream_with_context(chunks), mimetype=EXPORT_MIMETYPES[fmt], headers=headers)
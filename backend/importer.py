@@ -0,0 +1,172 @@
+import csv
+import io
+import sqlite3
+import time
+
+from backend.subjects import sync_student_subjects
+from backend.validation import validate_student
+from backend.writer import submit_write
+
+IMPORT_COLUMNS = ['name', 'roll_no', 'class', 'subjects', 'marks', 'attendance']
+IMPORT_BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 1000
+
+# SQLite limits the number of ? placeholders in one statement
+_LOOKUP_CHUNK = 500
+
+
+def _existing_roll_numbers(conn, roll_numbers):
+    existing = set()
+    for i in range(0, len(roll_numbers), _LOOKUP_CHUNK):
+        chunk = roll_numbers[i:i + _LOOKUP_CHUNK]
+        placeholders = ', '.join('?' * len(chunk))
+        rows = conn.execute(f'SELECT roll_no FROM students WHERE roll_no IN ({placeholders})', chunk)
+        existing.update(row[0] for row in rows)
+    return existing
+
+
+def _sync_subjects(conn, roll_numbers):
+    # executemany gives no row ids, so the new students are looked up again
+    for i in range(0, len(roll_numbers), _LOOKUP_CHUNK):
+        chunk = roll_numbers[i:i + _LOOKUP_CHUNK]
+        placeholders = ', '.join('?' * len(chunk))
+        rows = conn.execute(f'SELECT id, subjects FROM students WHERE roll_no IN ({placeholders})', chunk).fetchall()
+        sync_student_subjects(conn, rows)
+
+
+def _insert_batch(batch, report):
+    """
+    Inserts one batch of (line number, student) as a single mutation on the
+    writer thread, so imports queue up with form edits instead of fighting
+    them for the write lock. If another writer added one of the roll
+    numbers in the meantime, the batch is retried row by row so only the
+    duplicates are rejected.
+    """
+    rows = [(s['name'], s['roll_no'], s['class_id'], s['subjects'], s['marks'], s['attendance'])
+            for line, s in batch]
+    sql = 'INSERT INTO students (name, roll_no, class_id, subjects, marks, attendance) VALUES (?, ?, ?, ?, ?, ?)'
+
+    def insert_all(writer_conn):
+        writer_conn.executemany(sql, rows)
+        _sync_subjects(writer_conn, [row[1] for row in rows])
+
+    try:
+        submit_write(insert_all)
+        report['inserted'] += len(rows)
+        return
+    except sqlite3.IntegrityError:
+        pass
+
+    def insert_one(row, subjects):
+        def mutation(writer_conn):
+            cursor = writer_conn.execute(sql, row)
+            sync_student_subjects(writer_conn, [(cursor.lastrowid, subjects)])
+        return mutation
+
+    for (line, student), row in zip(batch, rows):
+        try:
+            submit_write(insert_one(row, student['subjects']))
+            report['inserted'] += 1
+        except sqlite3.IntegrityError:
+            _add_error(report, line, student['roll_no'], 'Roll number already exists')
+
+
+def _add_error(report, line, roll_no, message):
+    report['error_count'] += 1
+    if len(report['errors']) < MAX_REPORTED_ERRORS:
+        report['errors'].append({'line': line, 'roll_no': roll_no, 'message': message})
+
+
+def _flush(conn, batch, report, dry_run):
+    roll_numbers = [student['roll_no'] for line, student in batch]
+    existing = _existing_roll_numbers(conn, roll_numbers)
+
+    new_rows = []
+    for line, student in batch:
+        if student['roll_no'] in existing:
+            _add_error(report, line, student['roll_no'], 'Roll number already exists')
+        else:
+            new_rows.append((line, student))
+
+    if dry_run:
+        report['valid'] += len(new_rows)
+    elif new_rows:
+        report['valid'] += len(new_rows)
+        _insert_batch(new_rows, report)
+
+
+def import_students(conn, lines, batch_size=IMPORT_BATCH_SIZE, dry_run=False, progress=None):
+    """
+    Imports students from CSV text. `lines` can be any iterable of lines,
+    e.g. an open file, so the file is read row by row and never held in
+    memory. The header must contain the IMPORT_COLUMNS; `class` is the
+    class name.
+
+    Rows are checked with the same rules as the add student form and
+    inserted in batches, one transaction per batch. Bad rows are reported
+    and skipped without stopping the import. With dry_run nothing is
+    written. progress(report) is called after each batch.
+    """
+    start = time.perf_counter()
+    report = {'rows': 0, 'valid': 0, 'inserted': 0, 'error_count': 0, 'errors': [], 'dry_run': dry_run}
+
+    reader = csv.DictReader(lines)
+    missing = [column for column in IMPORT_COLUMNS if column not in (reader.fieldnames or [])]
+    if missing:
+        _add_error(report, 1, None, f"Missing column(s): {', '.join(missing)}")
+        return _finish(report, start)
+
+    class_ids = {row['name']: row['id'] for row in conn.execute('SELECT id, name FROM classes')}
+    seen_roll_numbers = set()
+    batch = []
+
+    for row in reader:
+        report['rows'] += 1
+        line = reader.line_num
+        values = {column: (row.get(column) or '').strip() for column in IMPORT_COLUMNS}
+
+        class_id = class_ids.get(values['class'])
+        if values['class'] and class_id is None:
+            _add_error(report, line, values['roll_no'], f"Unknown class '{values['class']}'")
+            continue
+
+        student, error = validate_student(values['name'], values['roll_no'], class_id,
+                                          values['subjects'], values['marks'], values['attendance'])
+        if error:
+            _add_error(report, line, values['roll_no'], error)
+            continue
+
+        if student['roll_no'] in seen_roll_numbers:
+            _add_error(report, line, student['roll_no'], 'Duplicate roll number in file')
+            continue
+        seen_roll_numbers.add(student['roll_no'])
+
+        batch.append((line, student))
+        if len(batch) >= batch_size:
+            _flush(conn, batch, report, dry_run)
+            batch = []
+            if progress is not None:
+                progress(report)
+
+    if batch:
+        _flush(conn, batch, report, dry_run)
+
+    return _finish(report, start)
+
+
+def _finish(report, start):
+    report['seconds'] = time.perf_counter() - start
+    report['rows_per_second'] = report['rows'] / report['seconds'] if report['seconds'] else 0
+    return report
+
+
+def import_students_file(conn, binary_file, **options):
+    """
+    Same as import_students for a binary file object such as an upload.
+    """
+    text = io.TextIOWrapper(binary_file, encoding='utf-8-sig', newline='')
+    try:
+        return import_students(conn, text, **options)
+    finally:
+        # Leave the underlying file open for its owner
+        text.detach()
@@ -0,0 +1,374 @@
+import json
+import logging
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from backend import db
+from backend.analytics import compute_analytics, get_insights
+from backend.attendance import update_student_attendance
+from backend.config import (JOB_HEARTBEAT_INTERVAL, JOB_HEARTBEAT_TIMEOUT, JOB_LIST_SIZE, JOB_PROGRESS_INTERVAL,
+                            JOB_UPLOAD_SUFFIX, JOB_WORKERS)
+from backend.importer import import_students_file
+from backend.reports import open_report_connection
+from backend.writer import submit_write
+
+JOB_FIELDS = ['id', 'kind', 'status', 'progress', 'message', 'result', 'error', 'cancel_requested',
+              'created_at', 'started_at', 'finished_at']
+ACTIVE_STATES = ('queued', 'running')
+
+_executor = None
+_executor_lock = threading.Lock()
+_recovered = set()
+_recovered_lock = threading.Lock()
+_swept_at = 0.0
+# Jobs running in this process: id -> database path, kept alive by _heartbeat
+_running = {}
+_running_lock = threading.Lock()
+_heartbeat_thread = None
+
+# Differs between runs even when a restarted process gets the same pid
+# (pid 1 in a container) and host name
+_BOOT_ID = uuid.uuid4().hex[:12]
+
+logger = logging.getLogger(__name__)
+
+
+class JobCancelled(Exception):
+    """Raised inside a job by progress() once the job has been cancelled."""
+
+
+class _Progress:
+    """
+    Passed to a job as progress(fraction, message=None). The progress is
+    saved at most every JOB_PROGRESS_INTERVAL seconds; at the same time it
+    checks whether the job was cancelled and raises JobCancelled if so.
+    """
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self._saved_at = None
+
+    def __call__(self, fraction, message=None):
+        now = time.monotonic()
+        if self._saved_at is not None and now - self._saved_at < JOB_PROGRESS_INTERVAL:
+            return
+        self._saved_at = now
+
+        def save(conn):
+            conn.execute('UPDATE jobs SET progress = ?, message = ?, heartbeat_at = CURRENT_TIMESTAMP WHERE id = ?',
+                         (min(max(fraction, 0.0), 1.0), message, self.job_id))
+            return conn.execute('SELECT cancel_requested FROM jobs WHERE id = ?', (self.job_id,)).fetchone()[0]
+
+        if submit_write(save):
+            raise JobCancelled()
+
+
+def upload_dir(database_path=None):
+    """Where files uploaded for jobs wait: next to the database, with JOB_UPLOAD_SUFFIX."""
+    return (database_path or db.DATABASE) + JOB_UPLOAD_SUFFIX
+
+
+def save_upload(binary_file):
+    """Stores an uploaded file for a job and returns its name for the job's params."""
+    directory = upload_dir()
+    os.makedirs(directory, exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=directory, suffix='.csv')
+    with os.fdopen(fd, 'wb') as f:
+        shutil.copyfileobj(binary_file, f)
+    return os.path.basename(path)
+
+
+def _discard_upload(params):
+    if params.get('upload'):
+        try:
+            # basename: params never point outside the upload directory
+            os.remove(os.path.join(upload_dir(), os.path.basename(params['upload'])))
+        except FileNotFoundError:
+            pass
+
+
+def _analytics_job(conn, params, progress):
+    # Read like the analytics page, so editing goes on while it runs
+    report, freshness = open_report_connection()
+    try:
+        progress(0.1, 'Aggregating')
+        result = compute_analytics(report)
+        progress(0.6, 'Computing insights')
+        result['insights'] = get_insights(report)
+    finally:
+        report.close()
+    result['as_of'] = freshness['as_of']
+    return result
+
+
+def _import_students_job(conn, params, progress):
+    path = os.path.join(upload_dir(), os.path.basename(params['upload']))
+    size = os.path.getsize(path) or 1
+    try:
+        with open(path, 'rb') as f:
+            # Batches already inserted stay when the import is cancelled
+            return import_students_file(conn, f, dry_run=bool(params.get('dry_run')),
+                                        progress=lambda report: progress(f.tell() / size,
+                                                                         f"{report['rows']} rows read"))
+    finally:
+        _discard_upload(params)
+
+
+def _recompute_attendance_job(conn, params, progress):
+    total = conn.execute('SELECT COUNT(*) FROM attendance_students WHERE days_recorded > 0').fetchone()[0] or 1
+    last_id = students = updated = 0
+    while True:
+        # One short write per batch, so edits are not held up behind the job
+        batch = submit_write(lambda conn: update_student_attendance(conn, last_id))
+        if batch is None:
+            return {'students': students, 'updated': updated}
+        last_id, count, changed = batch
+        students += count
+        updated += changed
+        progress(students / total, f'{students} students')
+
+
+# Job kinds: kind -> (function(conn, params, progress) returning a
+# JSON-serializable result, whether it reads an uploaded file)
+JOB_TYPES = {
+    'analytics': (_analytics_job, False),
+    # Only the import page, which saves the upload, submits it
+    'import-students': (_import_students_job, True),
+    'recompute-attendance': (_recompute_attendance_job, False),
+}
+
+
+def _owner():
+    # Read per call: worker processes may be forked after this module is imported
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def _parse_owner(owner):
+    """(host, pid) of an owner; pid may be None."""
+    host, _, pid = (owner or '').rpartition(':')
+    if pid.isdigit():
+        return host, int(pid)
+    return owner, None
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _send_heartbeats():
+    """Marks the jobs running in this process alive."""
+    with _running_lock:
+        job_ids = [job_id for job_id, path in _running.items() if path == db.DATABASE]
+    if job_ids:
+        owner = _owner()
+        submit_write(lambda conn: conn.executemany(
+            'UPDATE jobs SET heartbeat_at = CURRENT_TIMESTAMP WHERE id = ? AND owner = ? AND boot_id = ?',
+            [(job_id, owner, _BOOT_ID) for job_id in job_ids]))
+
+
+def _heartbeat():
+    while True:
+        time.sleep(JOB_HEARTBEAT_INTERVAL)
+        try:
+            _send_heartbeats()
+        except Exception:
+            logger.exception('Job heartbeat failed')
+
+
+def _start(job_id, database_path):
+    global _executor, _heartbeat_thread
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='job')
+        if _heartbeat_thread is None or not _heartbeat_thread.is_alive():
+            _heartbeat_thread = threading.Thread(target=_heartbeat, name='job-heartbeat', daemon=True)
+            _heartbeat_thread.start()
+    _executor.submit(_run, job_id, database_path)
+
+
+def _finish(job_id, status, result=None, error=None):
+    def mutation(conn):
+        conn.execute('''
+            UPDATE jobs
+            SET status = ?, result = ?, error = ?, finished_at = CURRENT_TIMESTAMP,
+                progress = CASE WHEN ? = 'done' THEN 1 ELSE progress END
+            WHERE id = ?
+        ''', (status, json.dumps(result) if result is not None else None, error, status, job_id))
+
+    submit_write(mutation)
+
+
+def _run(job_id, database_path):
+    if database_path != db.DATABASE:
+        # The app moved to another database; the job stays queued in its own
+        return
+
+    def claim(conn):
+        # Only one thread or process gets to run a queued job
+        row = conn.execute("SELECT kind, params FROM jobs WHERE id = ? AND status = 'queued'", (job_id,)).fetchone()
+        if row is None:
+            return None
+        conn.execute('''
+            UPDATE jobs SET status = 'running', owner = ?, boot_id = ?, started_at = CURRENT_TIMESTAMP,
+                            heartbeat_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (_owner(), _BOOT_ID, job_id))
+        return row[0], json.loads(row[1])
+
+    try:
+        claimed = submit_write(claim)
+        if claimed is None:
+            return
+        kind, params = claimed
+        with _running_lock:
+            _running[job_id] = database_path
+        conn = db.open_connection(database_path)
+        try:
+            result = JOB_TYPES[kind][0](conn, params, _Progress(job_id))
+        finally:
+            conn.close()
+            with _running_lock:
+                _running.pop(job_id, None)
+    except JobCancelled:
+        _finish(job_id, 'cancelled')
+    except Exception as e:
+        logger.exception('Job %s failed', job_id)
+        _finish(job_id, 'failed', error=str(e) or type(e).__name__)
+    else:
+        _finish(job_id, 'done', result=result)
+
+
+def _mark_interrupted(conn):
+    """
+    Marks running jobs failed whose process is gone: on this host, its pid
+    is dead or now belongs to another run (a different boot id); on any
+    host, it has not sent a heartbeat for JOB_HEARTBEAT_TIMEOUT seconds.
+    Returns [(job id, params)] of the jobs marked.
+    """
+    host = socket.gethostname()
+    me = _owner()
+    interrupted = []
+    for row in conn.execute('''
+        SELECT id, owner, boot_id, params, COALESCE(heartbeat_at, started_at) < datetime('now', ?) as stale
+        FROM jobs WHERE status = 'running'
+    ''', (f'-{JOB_HEARTBEAT_TIMEOUT} seconds',)).fetchall():
+        if row[1] == me and row[2] == _BOOT_ID:
+            continue
+        owner_host, pid = _parse_owner(row[1])
+        local = owner_host == host and pid is not None
+        if row[4] or (local and (pid == os.getpid() or not _process_alive(pid))):
+            interrupted.append((row[0], json.loads(row[3])))
+    conn.executemany('''
+        UPDATE jobs SET status = 'failed', error = 'Interrupted by a restart', finished_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+    ''', [(job_id,) for job_id, _ in interrupted])
+    return interrupted
+
+
+def recover_jobs():
+    """
+    Runs once per database in each process, before its jobs are first
+    used. Running jobs whose process is gone were interrupted and are
+    marked failed (see _mark_interrupted); queued jobs are handed to the
+    pool again.
+    """
+    def mutation(conn):
+        interrupted = _mark_interrupted(conn)
+        queued = [row[0] for row in conn.execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY id")]
+        return interrupted, queued
+
+    interrupted, queued = submit_write(mutation)
+    for _, params in interrupted:
+        _discard_upload(params)
+    for job_id in queued:
+        _start(job_id, db.DATABASE)
+    return {'interrupted': len(interrupted), 'resumed': len(queued)}
+
+
+def _recover_once():
+    # Recovers the database on first use. After that, jobs whose heartbeat
+    # stopped (e.g. in a container that was replaced) are looked for at
+    # most every JOB_HEARTBEAT_INTERVAL seconds.
+    global _swept_at
+    with _recovered_lock:
+        first = db.DATABASE not in _recovered
+        _recovered.add(db.DATABASE)
+        now = time.monotonic()
+        sweep = not first and now - _swept_at >= JOB_HEARTBEAT_INTERVAL
+        if first or sweep:
+            _swept_at = now
+    if first:
+        recover_jobs()
+    elif sweep:
+        for _, params in submit_write(_mark_interrupted):
+            _discard_upload(params)
+
+
+def submit_job(kind, params=None, allow_uploads=False):
+    """
+    Stores a queued job and hands it to the pool; returns its id. Raises
+    ValueError for an unknown kind, or one that reads an uploaded file
+    unless allow_uploads is set.
+    """
+    if kind not in JOB_TYPES or (JOB_TYPES[kind][1] and not allow_uploads):
+        raise ValueError(f'Unknown job type: {kind}')
+    _recover_once()
+    job_id = submit_write(lambda conn: conn.execute('INSERT INTO jobs (kind, params) VALUES (?, ?)',
+                                                    (kind, json.dumps(params or {}))).lastrowid)
+    _start(job_id, db.DATABASE)
+    return job_id
+
+
+def cancel_job(job_id):
+    """
+    Cancels a job: a queued one right away, a running one at its next
+    progress report. Returns False if it does not exist or has finished.
+    """
+    _recover_once()
+
+    def mutation(conn):
+        if conn.execute('''
+            UPDATE jobs SET status = 'cancelled', finished_at = CURRENT_TIMESTAMP WHERE id = ? AND status = 'queued'
+        ''', (job_id,)).rowcount:
+            return True
+        return conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'",
+                            (job_id,)).rowcount > 0
+
+    return submit_write(mutation)
+
+
+def _job_dict(row):
+    job = {field: row[field] for field in JOB_FIELDS}
+    job['result'] = json.loads(job['result']) if job['result'] is not None else None
+    job['cancel_requested'] = bool(job['cancel_requested'])
+    return job
+
+
+def get_job(conn, job_id):
+    _recover_once()
+    row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+    return _job_dict(row) if row is not None else None
+
+
+def list_jobs(conn, limit=JOB_LIST_SIZE):
+    """The newest jobs, without their results (see get_job)."""
+    _recover_once()
+    rows = conn.execute('SELECT * FROM jobs ORDER BY id DESC LIMIT ?', (limit,)).fetchall()
+    jobs = []
+    for row in rows:
+        job = _job_dict(row)
+        job['has_result'] = job.pop('result') is not None
+        jobs.append(job)
+    return jobs
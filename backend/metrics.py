@@ -0,0 +1,197 @@
+import logging
+import sqlite3
+import threading
+import time
+
+from flask import before_render_template, g, has_request_context, request, template_rendered
+
+from backend import slow_queries
+from backend.config import METRICS_BUCKETS, METRICS_ENABLED
+
+logger = logging.getLogger(__name__)
+
+_enabled = METRICS_ENABLED
+_lock = threading.Lock()
+_endpoints = {}  # endpoint -> aggregated numbers, see _endpoint_metrics
+
+
+def configure_metrics(enabled):
+    global _enabled
+    _enabled = enabled
+
+
+def metrics_enabled():
+    return _enabled
+
+
+def reset_metrics():
+    with _lock:
+        _endpoints.clear()
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """
+    Connection class used for every database connection. When metrics or
+    the slow-query log are enabled, execute() and executemany() are timed:
+    the time is added to the current request's numbers and slow statements
+    are logged. When both are off they only check two flags.
+
+    Only the execute call itself is timed; rows read later by iterating
+    the cursor are not.
+    """
+
+    def execute(self, sql, parameters=()):
+        if not (_enabled or slow_queries.threshold is not None):
+            return super().execute(sql, parameters)
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _after_query(self, sql, parameters, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        if not (_enabled or slow_queries.threshold is not None):
+            return super().executemany(sql, seq_of_parameters)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _after_query(self, sql, None, time.perf_counter() - start)
+
+
+def _after_query(conn, sql, parameters, seconds):
+    if _enabled:
+        record_query(sql, parameters, seconds)
+    if slow_queries.threshold is not None and seconds >= slow_queries.threshold:
+        slow_queries.log_slow_query(conn, sql, parameters, seconds)
+
+
+def record_query(sql, parameters, seconds):
+    """Adds one statement to the numbers of the current request."""
+    if not has_request_context():
+        return
+    stats = g.get('sql_stats')
+    if stats is None:
+        stats = g.sql_stats = {'count': 0, 'seconds': 0.0, 'slowest_seconds': 0.0, 'slowest_sql': None}
+    stats['count'] += 1
+    stats['seconds'] += seconds
+    if seconds > stats['slowest_seconds']:
+        # Normalized, so no values from the request are kept
+        stats['slowest_seconds'] = seconds
+        stats['slowest_sql'] = slow_queries.normalize_sql(sql)
+
+
+def _endpoint_metrics(endpoint):
+    metrics = _endpoints.get(endpoint)
+    if metrics is None:
+        metrics = _endpoints[endpoint] = {
+            'buckets': [0] * len(METRICS_BUCKETS),
+            'count': 0,
+            'seconds': 0.0,
+            'sql_count': 0,
+            'sql_seconds': 0.0,
+            'template_seconds': 0.0,
+            'slowest_sql_seconds': 0.0,
+            'slowest_sql': None,
+        }
+    return metrics
+
+
+def _observe(endpoint, seconds, sql_stats, template_seconds):
+    with _lock:
+        metrics = _endpoint_metrics(endpoint)
+        for i, bound in enumerate(METRICS_BUCKETS):
+            if seconds <= bound:
+                metrics['buckets'][i] += 1
+        metrics['count'] += 1
+        metrics['seconds'] += seconds
+        metrics['sql_count'] += sql_stats['count']
+        metrics['sql_seconds'] += sql_stats['seconds']
+        metrics['template_seconds'] += template_seconds
+        if sql_stats['slowest_seconds'] > metrics['slowest_sql_seconds']:
+            metrics['slowest_sql_seconds'] = sql_stats['slowest_seconds']
+            metrics['slowest_sql'] = sql_stats['slowest_sql']
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_metrics():
+    """All endpoint numbers in the Prometheus text format."""
+    with _lock:
+        endpoints = {name: dict(metrics, buckets=list(metrics['buckets'])) for name, metrics in _endpoints.items()}
+
+    lines = [
+        '# HELP intellitrack_request_duration_seconds Request duration by endpoint.',
+        '# TYPE intellitrack_request_duration_seconds histogram',
+    ]
+    for name, metrics in sorted(endpoints.items()):
+        endpoint = _label(name)
+        for bound, count in zip(METRICS_BUCKETS, metrics['buckets']):
+            lines.append(f'intellitrack_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {count}')
+        lines.append(f'intellitrack_request_duration_seconds_bucket{{endpoint="{endpoint}",le="+Inf"}} {metrics["count"]}')
+        lines.append(f'intellitrack_request_duration_seconds_sum{{endpoint="{endpoint}"}} {metrics["seconds"]:.6f}')
+        lines.append(f'intellitrack_request_duration_seconds_count{{endpoint="{endpoint}"}} {metrics["count"]}')
+
+    counters = [
+        ('intellitrack_sql_queries_total', 'SQL statements executed by endpoint.', 'sql_count', '{}'),
+        ('intellitrack_sql_seconds_total', 'Time spent in SQL statements by endpoint.', 'sql_seconds', '{:.6f}'),
+        ('intellitrack_template_seconds_total', 'Time spent rendering templates by endpoint.', 'template_seconds', '{:.6f}'),
+    ]
+    for metric, description, key, number in counters:
+        lines.append(f'# HELP {metric} {description}')
+        lines.append(f'# TYPE {metric} counter')
+        for name, metrics in sorted(endpoints.items()):
+            lines.append(f'{metric}{{endpoint="{_label(name)}"}} {number.format(metrics[key])}')
+
+    # The statement is only shown here and in the debug log, never in the
+    # Server-Timing header that every client sees
+    lines.append('# HELP intellitrack_sql_slowest_seconds Slowest SQL statement seen by endpoint.')
+    lines.append('# TYPE intellitrack_sql_slowest_seconds gauge')
+    for name, metrics in sorted(endpoints.items()):
+        if metrics['slowest_sql'] is not None:
+            lines.append(f'intellitrack_sql_slowest_seconds{{endpoint="{_label(name)}",'
+                         f'statement="{_label(metrics["slowest_sql"])}"}} {metrics["slowest_sql_seconds"]:.6f}')
+
+    return '\n'.join(lines) + '\n'
+
+
+def register_metrics(app):
+    @app.before_request
+    def start_timer():
+        if _enabled:
+            g.request_start = time.perf_counter()
+
+    @before_render_template.connect_via(app)
+    def start_template_timer(sender, template, context, **extra):
+        if _enabled and has_request_context():
+            g.template_start = time.perf_counter()
+
+    @template_rendered.connect_via(app)
+    def stop_template_timer(sender, template, context, **extra):
+        if _enabled and has_request_context() and 'template_start' in g:
+            g.template_seconds = g.get('template_seconds', 0.0) + time.perf_counter() - g.pop('template_start')
+
+    @app.after_request
+    def add_server_timing(response):
+        if not _enabled or 'request_start' not in g:
+            return response
+
+        total = time.perf_counter() - g.request_start
+        sql_stats = g.get('sql_stats') or {'count': 0, 'seconds': 0.0, 'slowest_seconds': 0.0, 'slowest_sql': None}
+        template_seconds = g.get('template_seconds', 0.0)
+        _observe(request.endpoint or 'unknown', total, sql_stats, template_seconds)
+        if sql_stats['slowest_sql'] is not None:
+            logger.debug('%s: slowest statement took %.2f ms: %s', request.endpoint,
+                         sql_stats['slowest_seconds'] * 1000, sql_stats['slowest_sql'])
+
+        # Durations in milliseconds, shown in the browser's network panel
+        response.headers['Server-Timing'] = ', '.join([
+            f'db;dur={sql_stats["seconds"] * 1000:.2f};desc="{sql_stats["count"]} queries"',
+            f'db-slowest;dur={sql_stats["slowest_seconds"] * 1000:.2f}',
+            f'tpl;dur={template_seconds * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ])
+        return response
+
@@ -0,0 +1,92 @@
+import base64
+import json
+
+from backend.config import MAX_PAGE_SIZE, PAGE_SIZE
+
+
+def encode_cursor(sort_by, sort_order, value, row_id):
+    data = json.dumps([sort_by, sort_order, value, row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, sort_by, sort_order):
+    """
+    Returns (value, id) from a cursor, or None if the cursor is invalid or
+    was made for a different sort column or order.
+    """
+    if not cursor:
+        return None
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(cursor + padding))
+        cursor_sort, cursor_order, value, row_id = data
+    except (ValueError, TypeError):
+        return None
+
+    if cursor_sort != sort_by or cursor_order != sort_order or not isinstance(row_id, int):
+        return None
+    return value, row_id
+
+
+def get_page_size(value):
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return PAGE_SIZE
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def fetch_page(conn, query, params, sort_column, id_column, sort_by, sort_order,
+               after=None, before=None, per_page=PAGE_SIZE):
+    """
+    Keyset pagination: instead of OFFSET, each page starts right after the
+    (sort value, id) of the last row of the previous page, so every page
+    costs the same no matter how deep it is.
+
+    `query` must end in a WHERE clause (so more conditions can be added)
+    and select the sort column as `sort_value` and the row id as `id`.
+    """
+    ascending = sort_order == 'ASC'
+    after_key = decode_cursor(after, sort_by, sort_order)
+    before_key = None if after_key else decode_cursor(before, sort_by, sort_order)
+
+    params = list(params)
+    backwards = before_key is not None
+    key = before_key or after_key
+
+    # Going backwards means reading in the opposite order and flipping the rows
+    forward = ascending != backwards
+    if key is not None:
+        operator = '>' if forward else '<'
+        query += f' AND ({sort_column}, {id_column}) {operator} (?, ?)'
+        params.extend(key)
+
+    direction = 'ASC' if forward else 'DESC'
+    query += f' ORDER BY {sort_column} {direction}, {id_column} {direction} LIMIT ?'
+    params.append(per_page + 1)
+
+    rows = conn.execute(query, params).fetchall()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    if backwards:
+        has_next, has_prev = True, has_more
+    else:
+        has_next, has_prev = has_more, after_key is not None
+
+    next_cursor = None
+    prev_cursor = None
+    if rows and has_next:
+        last = rows[-1]
+        next_cursor = encode_cursor(sort_by, sort_order, last['sort_value'], last['id'])
+    if rows and has_prev:
+        first = rows[0]
+        prev_cursor = encode_cursor(sort_by, sort_order, first['sort_value'], first['id'])
+
+    return {
+        'rows': rows,
+        'next_cursor': next_cursor,
+        'prev_cursor': prev_cursor,
+    }
@@ -0,0 +1,185 @@
+import cProfile
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from functools import wraps
+
+from flask import request, session
+
+from backend.config import PROFILE_DIR, PROFILE_HEADER, PROFILE_MAX_FILES, PROFILE_SAMPLE_RATE, PROFILING_ENABLED
+
+PROFILE_KINDS = {'cpu': 'pstats', 'memory': 'tracemalloc'}
+
+_enabled = PROFILING_ENABLED
+_sample_rate = PROFILE_SAMPLE_RATE
+_directory = PROFILE_DIR
+# tracemalloc traces the whole process, so one memory profile at a time
+_memory_lock = threading.Lock()
+
+# <date>-<time>-<microseconds>-<endpoint>-<duration>ms.<pstats|tracemalloc>
+_FILE_NAME = re.compile(r'^(\d{8})-(\d{6})-(\d+)-([\w.]+)-(\d+)ms\.(pstats|tracemalloc)$')
+
+
+def configure_profiling(enabled=PROFILING_ENABLED, sample_rate=PROFILE_SAMPLE_RATE, directory=PROFILE_DIR):
+    global _enabled, _sample_rate, _directory
+    _enabled = enabled
+    _sample_rate = sample_rate
+    _directory = directory
+
+
+def profiling_enabled():
+    return _enabled
+
+
+def _profile_kind():
+    """
+    'cpu', 'memory' or None for the current request. Only logged-in admins
+    are profiled: on request with the X-Profile header (cpu or memory),
+    otherwise for a random PROFILE_SAMPLE_RATE share of their requests.
+    """
+    if 'logged_in' not in session:
+        return None
+    kind = request.headers.get(PROFILE_HEADER)
+    if kind in PROFILE_KINDS:
+        return kind
+    if _sample_rate and random.random() < _sample_rate:
+        return 'cpu'
+    return None
+
+
+def _file_path(endpoint, kind, seconds):
+    now = datetime.now()
+    name = f'{now:%Y%m%d-%H%M%S}-{now.microsecond:06d}-{endpoint}-{round(seconds * 1000)}ms.{PROFILE_KINDS[kind]}'
+    return os.path.join(_directory, name)
+
+
+def _remove_old_profiles():
+    names = sorted(name for name in os.listdir(_directory) if _FILE_NAME.match(name))
+    for name in names[:-PROFILE_MAX_FILES]:
+        os.remove(os.path.join(_directory, name))
+
+
+def _run_profiled(kind, endpoint, view, args, kwargs):
+    if kind == 'memory' and not _memory_lock.acquire(blocking=False):
+        # Another request is being memory profiled; its snapshot would
+        # include this one's allocations, so this one runs unprofiled
+        return view(*args, **kwargs)
+    try:
+        return _write_profile(kind, endpoint, view, args, kwargs)
+    finally:
+        if kind == 'memory':
+            _memory_lock.release()
+
+
+def _write_profile(kind, endpoint, view, args, kwargs):
+    os.makedirs(_directory, exist_ok=True)
+    start = time.perf_counter()
+
+    if kind == 'cpu':
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            response = view(*args, **kwargs)
+        finally:
+            profiler.disable()
+        profiler.dump_stats(_file_path(endpoint, kind, time.perf_counter() - start))
+    else:
+        already_tracing = tracemalloc.is_tracing()
+        if not already_tracing:
+            tracemalloc.start(25)
+        try:
+            response = view(*args, **kwargs)
+            snapshot = tracemalloc.take_snapshot()
+        finally:
+            if not already_tracing:
+                tracemalloc.stop()
+        snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+        snapshot.dump(_file_path(endpoint, kind, time.perf_counter() - start))
+
+    _remove_old_profiles()
+    return response
+
+
+def _profiled_view(endpoint, view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        # The only work when profiling is off
+        if not _enabled:
+            return view(*args, **kwargs)
+        kind = _profile_kind()
+        if kind is None:
+            return view(*args, **kwargs)
+        return _run_profiled(kind, endpoint, view, args, kwargs)
+
+    return wrapper
+
+
+def register_profiling(app):
+    """
+    Wraps every view function registered so far, so call this after
+    register_routes and register_api.
+    """
+    for endpoint, view in list(app.view_functions.items()):
+        if endpoint != 'static':
+            app.view_functions[endpoint] = _profiled_view(endpoint, view)
+
+
+def list_profiles():
+    """Saved profiles, newest first."""
+    if not os.path.isdir(_directory):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(_directory), reverse=True):
+        match = _FILE_NAME.match(name)
+        if match:
+            date, clock, _, endpoint, duration, extension = match.groups()
+            profiles.append({
+                'name': name,
+                'created': datetime.strptime(date + clock, '%Y%m%d%H%M%S'),
+                'endpoint': endpoint,
+                'duration_ms': int(duration),
+                'kind': 'cpu' if extension == 'pstats' else 'memory',
+            })
+    return profiles
+
+
+def profile_path(name):
+    """Full path of a saved profile, or None for names that are not profiles."""
+    if not _FILE_NAME.match(name):
+        return None
+    path = os.path.join(_directory, name)
+    return path if os.path.isfile(path) else None
+
+
+def summarize_cpu_profile(path, limit=30):
+    """The functions with the most cumulative time in a pstats file."""
+    stats = pstats.Stats(path)
+    rows = []
+    for (filename, line, function), (_, calls, own_time, cumulative_time, _) in stats.stats.items():
+        rows.append({
+            'function': f'{function} ({os.path.basename(filename)}:{line})' if line else function,
+            'calls': calls,
+            'own_ms': own_time * 1000,
+            'cumulative_ms': cumulative_time * 1000,
+        })
+    rows.sort(key=lambda row: row['cumulative_ms'], reverse=True)
+    return {'total_ms': stats.total_tt * 1000, 'rows': rows[:limit]}
+
+
+def summarize_memory_profile(path, limit=30):
+    """The source lines that allocated the most memory in a snapshot file."""
+    statistics = tracemalloc.Snapshot.load(path).statistics('lineno')
+    rows = []
+    for stat in statistics[:limit]:
+        frame = stat.traceback[0]
+        rows.append({
+            'location': f'{os.path.basename(frame.filename)}:{frame.lineno}',
+            'size_kib': stat.size / 1024,
+            'count': stat.count,
+        })
+    return {'total_kib': sum(stat.size for stat in statistics) / 1024, 'rows': rows}
@@ -0,0 +1,94 @@
+from backend.cache import cached
+from backend.config import LEADERBOARD_SIZE
+
+
+def _percentile(below, size):
+    # Share of the other students with lower marks, like PERCENT_RANK()
+    return round(100 * below / (size - 1)) if size > 1 else 100
+
+
+def compute_rankings(conn):
+    """
+    Rank, dense rank and percentile by marks within the class and across
+    the school, for every (class_id, marks) pair that occurs.
+
+    Students with the same marks in the same class share all six values,
+    so the window functions run over the marks distribution instead of
+    every student. The GROUP BY reads idx_students_class_marks in order,
+    and the windows only see one row per class and distinct mark, so no
+    student row is ever sorted.
+    """
+    rows = conn.execute('''
+        WITH scores AS (
+            SELECT class_id, marks, COUNT(*) as tied
+            FROM students
+            GROUP BY class_id, marks
+        )
+        SELECT
+            class_id,
+            marks,
+            tied,
+            SUM(tied) OVER (PARTITION BY class_id) as class_size,
+            SUM(tied) OVER (PARTITION BY class_id ORDER BY marks DESC
+                            RANGE UNBOUNDED PRECEDING EXCLUDE GROUP) as class_above,
+            DENSE_RANK() OVER (PARTITION BY class_id ORDER BY marks DESC) as class_dense_rank,
+            SUM(tied) OVER () as school_size,
+            SUM(tied) OVER (PARTITION BY marks) as school_tied,
+            SUM(tied) OVER (ORDER BY marks DESC
+                            RANGE UNBOUNDED PRECEDING EXCLUDE GROUP) as school_above,
+            DENSE_RANK() OVER (ORDER BY marks DESC) as school_dense_rank
+        FROM scores
+    ''')
+
+    rankings = {}
+    for row in rows:
+        class_above = row['class_above'] or 0
+        school_above = row['school_above'] or 0
+        rankings[(row['class_id'], row['marks'])] = {
+            'class_rank': class_above + 1,
+            'class_dense_rank': row['class_dense_rank'],
+            'class_percentile': _percentile(row['class_size'] - class_above - row['tied'], row['class_size']),
+            'class_size': row['class_size'],
+            'school_rank': school_above + 1,
+            'school_dense_rank': row['school_dense_rank'],
+            'school_percentile': _percentile(row['school_size'] - school_above - row['school_tied'],
+                                             row['school_size']),
+            'school_size': row['school_size'],
+        }
+    return rankings
+
+
+def get_rankings(conn):
+    """compute_rankings for the current data generation, from the result cache."""
+    return cached(conn, 'rankings', lambda: compute_rankings(conn))
+
+
+def student_ranking(rankings, student):
+    """The ranking of one student row, or None if it is not ranked yet."""
+    return rankings.get((student['class_id'], student['marks']))
+
+
+def get_leaderboard(conn, class_id, limit=LEADERBOARD_SIZE):
+    """
+    The top `limit` students of a class with their rank and dense rank.
+
+    The inner query walks idx_students_class_marks backwards from the
+    highest marks and stops after `limit` rows, so the class is never
+    sorted. Ranking only those rows is enough: a student's rank depends
+    on the students above them, and those are all in the top rows.
+    """
+    rows = conn.execute('''
+        SELECT
+            id, name, roll_no, marks, attendance,
+            RANK() OVER (ORDER BY marks DESC) as class_rank,
+            DENSE_RANK() OVER (ORDER BY marks DESC) as class_dense_rank
+        FROM (
+            SELECT id, name, roll_no, marks, attendance
+            FROM students
+            WHERE class_id = ?
+            ORDER BY marks DESC, attendance DESC
+            LIMIT ?
+        )
+        ORDER BY marks DESC, attendance DESC
+    ''', (class_id, limit)).fetchall()
+    return [dict(row) for row in rows]
@@ -0,0 +1,178 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from urllib.parse import quote
+
+from flask import g, has_app_context
+
+from backend import db
+from backend.config import REPORT_COPY_SUFFIX, REPORT_MAX_STALENESS, REPORT_SOURCE
+from backend.metrics import InstrumentedConnection
+
+REPORT_SOURCES = ('wal', 'backup')
+
+_source = REPORT_SOURCE
+_max_staleness = REPORT_MAX_STALENESS
+_refresh_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {'connections': 0, 'refreshes': 0, 'refresh_seconds': 0.0}
+
+
+def configure_reports(source=REPORT_SOURCE, max_staleness=REPORT_MAX_STALENESS):
+    """Switches the report source ('wal' or 'backup') and the staleness limit of the copy."""
+    global _source, _max_staleness
+    if source not in REPORT_SOURCES:
+        raise ValueError(f'Unknown report source: {source}')
+    _source = source
+    _max_staleness = max_staleness
+
+
+def report_copy_path(database_path=None):
+    """The backup copy of a database: next to it, with REPORT_COPY_SUFFIX."""
+    return (database_path or db.DATABASE) + REPORT_COPY_SUFFIX
+
+
+def refresh_report_copy(database_path=None):
+    """
+    Copies the database to its report copy with the online backup API.
+    The copy is written under a temporary name and renamed over the old
+    one, so open report connections keep reading the copy they started on.
+    """
+    database_path = database_path or db.DATABASE
+    path = report_copy_path(database_path)
+    directory, filename = os.path.split(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=filename + '.', suffix='.tmp')
+    os.close(fd)
+
+    started = time.perf_counter()
+    try:
+        source = sqlite3.connect(database_path)
+        target = sqlite3.connect(temp_path)
+        try:
+            # All pages in one step: in WAL mode that is a single read
+            # transaction, which writers never wait for. Copying in steps
+            # would start over after every write to the database.
+            source.backup(target)
+            # The copy is only read, as one file without -wal and -shm
+            target.execute('PRAGMA journal_mode = DELETE')
+        finally:
+            target.close()
+            source.close()
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    with _stats_lock:
+        _stats['refreshes'] += 1
+        _stats['refresh_seconds'] += time.perf_counter() - started
+    return path
+
+
+def _copy_age(path):
+    try:
+        return time.time() - os.stat(path).st_mtime
+    except FileNotFoundError:
+        return None
+
+
+def _current_copy():
+    path = report_copy_path()
+    age = _copy_age(path)
+    if age is None or age > _max_staleness:
+        # One request refreshes the copy; the others keep reading the
+        # current one instead of waiting, unless there is none yet
+        if _refresh_lock.acquire(blocking=age is None):
+            try:
+                age = _copy_age(path)
+                if age is None or age > _max_staleness:
+                    refresh_report_copy()
+            finally:
+                _refresh_lock.release()
+    return path
+
+
+def _connect(uri):
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=False, factory=InstrumentedConnection)
+    conn.row_factory = sqlite3.Row
+    for name in ('busy_timeout', 'cache_size', 'mmap_size'):
+        if name in db.PRAGMAS:
+            conn.execute(f'PRAGMA {name} = {db.PRAGMAS[name]}')
+    conn.execute('PRAGMA query_only = ON')
+    return conn
+
+
+def open_report_connection():
+    """
+    Opens a read-only connection for heavy reports and returns it with its
+    freshness: source, as_of (a Unix time) and age in seconds.
+
+    'wal' reads the live database. All statements run in one read
+    transaction, so a report sees a single point in time and writers are
+    never blocked by it. 'backup' reads the backup copy, which is made
+    again once it is older than the staleness limit.
+    """
+    if _source == 'wal':
+        conn = _connect(f'file:{quote(os.path.abspath(db.DATABASE))}?mode=ro')
+        conn.execute('BEGIN')
+        # The read transaction starts with the first read
+        conn.execute('SELECT 1 FROM data_generation').fetchone()
+        as_of = time.time()
+    else:
+        path = _current_copy()
+        # immutable: the copy never changes in place, so no locking at all
+        conn = _connect(f'file:{quote(os.path.abspath(path))}?immutable=1')
+        as_of = os.stat(path).st_mtime
+
+    with _stats_lock:
+        _stats['connections'] += 1
+    freshness = {
+        'source': _source,
+        'as_of': as_of,
+        'age': max(time.time() - as_of, 0.0),
+        'max_staleness': _max_staleness if _source == 'backup' else 0,
+    }
+    return conn, freshness
+
+
+def get_report_connection():
+    """
+    Returns the report connection for the current request, opened on first
+    use and closed on teardown (see report_freshness). Outside a request a
+    new connection is returned and the caller must close it.
+    """
+    if not has_app_context():
+        return open_report_connection()[0]
+
+    if 'report_db' not in g:
+        g.report_db, g.report_freshness = open_report_connection()
+    return g.report_db
+
+
+def report_freshness():
+    """Freshness of this request's report connection, None if it has none."""
+    return g.get('report_freshness')
+
+
+def close_report_connection(exception=None):
+    conn = g.pop('report_db', None)
+    g.pop('report_freshness', None)
+    if conn is not None:
+        conn.close()
+
+
+def get_report_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['source'] = _source
+    stats['max_staleness'] = _max_staleness
+    if _source == 'backup':
+        stats['copy_age'] = _copy_age(report_copy_path())
+    return stats
+
+
+def register_reports(app):
+    app.teardown_appcontext(close_report_connection)
@@ -1,10 +1,29 @@
 import sqlite3
 
-from flask import flash, redirect, render_template, request, session, url_for
+from flask import Response, abort, flash, jsonify, redirect, render_template, request, session, url_for
 from werkzeug.security import check_password_hash
 
-from backend.auth import login_required
-from backend.db import get_db_connection
+from backend import profiling, slow_queries
+from backend.analytics import compute_analytics, get_dashboard_stats, get_insights, iter_class_stats
+from backend.attendance import get_class_day, get_class_days, mark_class, parse_day
+from backend.auth import login_required, token_required
+from backend.cache import cached, get_cache_stats
+from backend.classes import class_query
+from backend.columnar import get_snapshot_stats, record_student_change
+from backend.config import LEADERBOARD_SIZE, PROFILE_HEADER
+from backend.db import get_db_connection, get_pool_stats
+from backend.export import CLASS_STATS_EXPORT_COLUMNS, STUDENT_EXPORT_COLUMNS, export_response
+from backend.importer import IMPORT_COLUMNS, import_students_file
+from backend.jobs import cancel_job, get_job, list_jobs, save_upload, submit_job
+from backend.metrics import render_metrics
+from backend.pagination import fetch_page, get_page_size
+from backend.rankings import get_leaderboard, get_rankings, student_ranking
+from backend.reports import get_report_connection, get_report_stats, report_freshness
+from backend.students import student_query
+from backend.subjects import sync_student_subjects
+from backend.templating import get_fragment_stats, remember_data_generation, stream_page
+from backend.validation import validate_student
+from backend.writer import get_writer_stats, submit_write
 
 
 def register_routes(app):
@@ -23,7 +42,6 @@ def register_routes(app):
 
             conn = get_db_connection()
             admin = conn.execute('SELECT * FROM admin WHERE username = ?', (username,)).fetchone()
-            conn.close()
 
             if admin and check_password_hash(admin['password_hash'], password):
                 session['logged_in'] = True
@@ -45,14 +63,19 @@ def register_routes(app):
     @login_required
     def dashboard():
         conn = get_db_connection()
-        students = conn.execute('''
-            SELECT s.*, c.name as class_name
-            FROM students s
-            JOIN classes c ON s.class_id = c.id
-        ''').fetchall()
-        classes = conn.execute('SELECT * FROM classes').fetchall()
-        conn.close()
-        return render_template('dashboard.html', students=students, classes=classes)
+        # Recomputed only after students or classes change
+        stats = cached(conn, 'dashboard', lambda: get_dashboard_stats(conn))
+        return render_template('dashboard.html', stats=stats)
+
+    @app.route('/dashboard.json')
+    @login_required
+    def dashboard_json():
+        """
+        The dashboard numbers for monitoring screens that poll them.
+        """
+        conn = get_db_connection()
+        stats = cached(conn, 'dashboard', lambda: get_dashboard_stats(conn))
+        return jsonify(stats)
 
     @app.route('/add-student', methods=['GET', 'POST'])
     @login_required
@@ -61,103 +84,159 @@ def register_routes(app):
         classes = conn.execute('SELECT * FROM classes ORDER BY name').fetchall()
 
         if request.method == 'POST':
-            name = request.form.get('name')
-            roll_no = request.form.get('roll_no')
-            class_id = request.form.get('class_id')
-            subjects = request.form.get('subjects')
-            marks = request.form.get('marks')
-            attendance = request.form.get('attendance')
-
             # Basic validation
-            if not all([name, roll_no, class_id, subjects, marks, attendance]):
-                flash('All fields are required', 'error')
+            student, error = validate_student(request.form.get('name'),
+                                              request.form.get('roll_no'),
+                                              request.form.get('class_id'),
+                                              request.form.get('subjects'),
+                                              request.form.get('marks'),
+                                              request.form.get('attendance'))
+            if error:
+                flash(error, 'error')
                 return render_template('add_student.html', classes=classes)
 
-            try:
-                marks = int(marks)
-                attendance = int(attendance)
-                class_id = int(class_id)
-
-                if marks < 0 or marks > 100:
-                    flash('Marks must be between 0 and 100', 'error')
-                    return render_template('add_student.html', classes=classes)
-
-                if attendance < 0 or attendance > 100:
-                    flash('Attendance must be between 0 and 100', 'error')
-                    return render_template('add_student.html', classes=classes)
+            def insert_student(conn):
+                cursor = conn.execute('INSERT INTO students (name, roll_no, class_id, subjects, marks, attendance) VALUES (?, ?, ?, ?, ?, ?)',
+                                      (student['name'], student['roll_no'], student['class_id'],
+                                       student['subjects'], student['marks'], student['attendance']))
+                sync_student_subjects(conn, [(cursor.lastrowid, student['subjects'])])
+                record_student_change(conn, cursor.lastrowid)
 
-                conn.execute('INSERT INTO students (name, roll_no, class_id, subjects, marks, attendance) VALUES (?, ?, ?, ?, ?, ?)',
-                            (name, roll_no, class_id, subjects, marks, attendance))
-                conn.commit()
-                conn.close()
+            try:
+                # Saved by the writer thread; a duplicate roll number comes back here
+                submit_write(insert_student)
 
                 flash('Student added successfully!', 'success')
                 return redirect(url_for('view_students'))
-            except ValueError:
-                flash('Marks and attendance must be numbers', 'error')
             except sqlite3.IntegrityError:
                 flash('Roll number already exists', 'error')
 
-        conn.close()
         return render_template('add_student.html', classes=classes)
 
+    @app.route('/import-students', methods=['GET', 'POST'])
+    @login_required
+    def import_students_page():
+        report = None
+
+        if request.method == 'POST':
+            upload = request.files.get('file')
+            if not upload or not upload.filename:
+                flash('Please choose a CSV file', 'error')
+            elif request.form.get('background'):
+                # Saved first, so the request returns right away
+                submit_job('import-students', {'upload': save_upload(upload.stream),
+                                               'dry_run': bool(request.form.get('dry_run'))},
+                           allow_uploads=True)
+                flash('Import started in the background', 'success')
+                return redirect(url_for('jobs_page'))
+            else:
+                # The upload is read row by row straight from its stream
+                conn = get_db_connection()
+                report = import_students_file(conn, upload.stream,
+                                              dry_run=bool(request.form.get('dry_run')))
+                if not report['dry_run'] and report['inserted']:
+                    flash(f"Imported {report['inserted']} student(s)", 'success')
+
+        return render_template('import_students.html', report=report, columns=IMPORT_COLUMNS)
+
     @app.route('/view-students')
     @login_required
     def view_students():
         conn = get_db_connection()
+        # Version of the cached table rows, read before the rows themselves
+        remember_data_generation(conn)
         
-        # Get query parameters for sorting and searching
-        sort_by = request.args.get('sort_by', 'roll_no')  # Default sort by roll_no
-        sort_order = request.args.get('sort_order', 'asc')  # Default ascending
-        search_term = request.args.get('search', '')  # Search by name or roll_no
-        class_filter = request.args.get('class', '')  # Filter by class
+        per_page = get_page_size(request.args.get('per_page'))
         
-        # Build the query dynamically based on sorting and filtering
-        query = '''
-            SELECT s.*, c.name as class_name
-            FROM students s
-            JOIN classes c ON s.class_id = c.id
-            WHERE 1=1
+        # Search, class filter and sort column from the query parameters
+        q = student_query(conn, request.args)
+        join, filters, params = q['join'], q['filters'], q['params']
+        sort_by, sort_column, sort_order = q['sort_by'], q['sort_column'], q['sort_order']
+        search_term, class_filter, subject_filter = q['search_term'], q['class_filter'], q['subject_filter']
+        
+        query = f'''
+            SELECT s.*, c.name as class_name, {sort_column} as sort_value
+            FROM {join}
+            WHERE 1=1 {filters}
         '''
         
-        params = []
+        # Rank and percentile of every (class, marks) pair, cached per generation
+        # and read on the report connection, like the leaderboard
+        rankings = get_rankings(get_report_connection())
+
+        show_all = request.args.get('all') == '1'
+        if show_all:
+            # Every matching row, read from the cursor while the page is sent
+            page = {
+                'rows': conn.execute(f'{query} ORDER BY {sort_column} {sort_order}, s.id {sort_order}', params),
+                'next_cursor': None,
+                'prev_cursor': None,
+            }
+        else:
+            # Only one page of rows is loaded, starting from the cursor
+            page = fetch_page(conn, query, params, sort_column, 's.id', sort_by, sort_order,
+                              after=request.args.get('after'),
+                              before=request.args.get('before'),
+                              per_page=per_page)
         
-        # Add search filter
-        if search_term:
-            query += ' AND (s.name LIKE ? OR s.roll_no LIKE ?)'
-            search_pattern = f'%{search_term}%'
-            params.extend([search_pattern, search_pattern])
+        total_count = conn.execute(f'''
+            SELECT COUNT(*)
+            FROM {join}
+            WHERE 1=1 {filters}
+        ''', params).fetchone()[0]
+        classes = conn.execute('SELECT * FROM classes ORDER BY name').fetchall()
+        subjects = conn.execute('''
+            SELECT id, name FROM subjects
+            WHERE EXISTS (SELECT 1 FROM student_subjects WHERE subject_id = subjects.id)
+            ORDER BY name
+        ''').fetchall()
         
-        # Add class filter
+        # Query parameters kept in the previous/next page links
+        page_args = {'sort_by': sort_by, 'sort_order': sort_order.lower(), 'per_page': per_page}
+        if search_term:
+            page_args['search'] = search_term
         if class_filter:
-            query += ' AND c.id = ?'
-            params.append(int(class_filter))
+            page_args['class'] = class_filter
+        if subject_filter:
+            page_args['subject'] = subject_filter
         
-        # Add sorting - Sorting Algorithm: Bubble Sort (SQL ORDER BY clause)
-        # Valid sort columns to prevent SQL injection
-        valid_sort_columns = {
-            'name': 's.name',
-            'roll_no': 's.roll_no',
-            'marks': 's.marks',
-            'attendance': 's.attendance',
-            'class': 'c.name'
-        }
-        
-        sort_column = valid_sort_columns.get(sort_by, 's.roll_no')
-        sort_order = 'ASC' if sort_order.lower() == 'asc' else 'DESC'
-        query += f' ORDER BY {sort_column} {sort_order}'
+        export_args = {k: v for k, v in page_args.items() if k != 'per_page'}
+        # The full list is streamed; a single page is small enough to render at once
+        render = stream_page if show_all else render_template
+        return render('view_students.html',
+                      students=page['rows'],
+                      rankings=rankings,
+                      show_all=show_all,
+                      classes=classes,
+                      total_count=total_count,
+                      next_cursor=page['next_cursor'],
+                      prev_cursor=page['prev_cursor'],
+                      page_args=page_args,
+                      export_args=export_args,
+                      current_sort=sort_by,
+                      current_order=sort_order,
+                      current_search=search_term,
+                      current_filter=class_filter,
+                      subjects=subjects,
+                      current_subject=subject_filter)
+
+    @app.route('/export/students.<any(csv, ndjson):fmt>')
+    @login_required
+    def export_students(fmt):
+        # Read-only report connection, so a long export never holds up writes
+        conn = get_report_connection()
         
-        students = conn.execute(query, params).fetchall()
-        classes = conn.execute('SELECT * FROM classes ORDER BY name').fetchall()
-        conn.close()
+        # Same search, class filter and sort as view_students, without pages
+        q = student_query(conn, request.args)
+        rows = conn.execute(f'''
+            SELECT s.*, c.name as class_name
+            FROM {q['join']}
+            WHERE 1=1 {q['filters']}
+            ORDER BY {q['sort_column']} {q['sort_order']}, s.id {q['sort_order']}
+        ''', q['params'])
         
-        return render_template('view_students.html', 
-                             students=students, 
-                             classes=classes,
-                             current_sort=sort_by,
-                             current_order=sort_order,
-                             current_search=search_term,
-                             current_filter=class_filter)
+        return export_response(rows, STUDENT_EXPORT_COLUMNS, fmt, 'students',
+                               gzip='gzip' in request.accept_encodings)
 
     @app.route('/edit-student/<int:id>', methods=['GET', 'POST'])
     @login_required
@@ -166,58 +245,48 @@ def register_routes(app):
         classes = conn.execute('SELECT * FROM classes ORDER BY name').fetchall()
 
         if request.method == 'POST':
-            name = request.form.get('name')
-            roll_no = request.form.get('roll_no')
-            class_id = request.form.get('class_id')
-            subjects = request.form.get('subjects')
-            marks = request.form.get('marks')
-            attendance = request.form.get('attendance')
-
-            if not all([name, roll_no, class_id, subjects, marks, attendance]):
-                flash('All fields are required', 'error')
+            student, error = validate_student(request.form.get('name'),
+                                              request.form.get('roll_no'),
+                                              request.form.get('class_id'),
+                                              request.form.get('subjects'),
+                                              request.form.get('marks'),
+                                              request.form.get('attendance'))
+            if error:
+                flash(error, 'error')
                 return redirect(url_for('edit_student', id=id))
 
-            try:
-                marks = int(marks)
-                attendance = int(attendance)
-                class_id = int(class_id)
-
-                if marks < 0 or marks > 100:
-                    flash('Marks must be between 0 and 100', 'error')
-                    return redirect(url_for('edit_student', id=id))
-
-                if attendance < 0 or attendance > 100:
-                    flash('Attendance must be between 0 and 100', 'error')
-                    return redirect(url_for('edit_student', id=id))
-
+            def update_student(conn):
                 conn.execute('UPDATE students SET name = ?, roll_no = ?, class_id = ?, subjects = ?, marks = ?, attendance = ? WHERE id = ?',
-                            (name, roll_no, class_id, subjects, marks, attendance, id))
-                conn.commit()
-                conn.close()
+                            (student['name'], student['roll_no'], student['class_id'],
+                             student['subjects'], student['marks'], student['attendance'], id))
+                sync_student_subjects(conn, [(id, student['subjects'])])
+                record_student_change(conn, id)
+
+            try:
+                submit_write(update_student)
 
                 flash('Student updated successfully!', 'success')
                 return redirect(url_for('view_students'))
-            except ValueError:
-                flash('Marks and attendance must be numbers', 'error')
             except sqlite3.IntegrityError:
                 flash('Roll number already exists', 'error')
 
         student = conn.execute('SELECT * FROM students WHERE id = ?', (id,)).fetchone()
-        conn.close()
 
         if not student:
             flash('Student not found', 'error')
             return redirect(url_for('view_students'))
 
-        return render_template('edit_student.html', student=student, classes=classes)
+        ranking = student_ranking(get_rankings(get_report_connection()), student)
+        return render_template('edit_student.html', student=student, classes=classes, ranking=ranking)
 
     @app.route('/delete-student/<int:id>')
     @login_required
     def delete_student(id):
-        conn = get_db_connection()
-        conn.execute('DELETE FROM students WHERE id = ?', (id,))
-        conn.commit()
-        conn.close()
+        def remove_student(conn):
+            conn.execute('DELETE FROM students WHERE id = ?', (id,))
+            record_student_change(conn, id)
+
+        submit_write(remove_student)
 
         flash('Student deleted successfully!', 'success')
         return redirect(url_for('view_students'))
@@ -228,49 +297,84 @@ def register_routes(app):
     def view_classes():
         conn = get_db_connection()
         
-        # Get query parameters for sorting and searching
-        sort_by = request.args.get('sort_by', 'name')  # Default sort by name
-        sort_order = request.args.get('sort_order', 'asc')  # Default ascending
-        search_term = request.args.get('search', '')  # Search by class name
+        per_page = get_page_size(request.args.get('per_page'))
         
-        # Build the query dynamically
-        query = '''
-            SELECT c.*, COUNT(s.id) as student_count
-            FROM classes c
-            LEFT JOIN students s ON c.id = s.class_id
-            WHERE 1=1
-        '''
+        # Search and sort column from the query parameters
+        q = class_query(conn, request.args)
+        query, params = q['query'], q['params']
+        sort_by, sort_column, sort_order = q['sort_by'], q['sort_column'], q['sort_order']
+        search_term = q['search_term']
         
-        params = []
+        page = fetch_page(conn, query, params, sort_column, 'id', sort_by, sort_order,
+                          after=request.args.get('after'),
+                          before=request.args.get('before'),
+                          per_page=per_page)
         
-        # Add search filter
+        page_args = {'sort_by': sort_by, 'sort_order': sort_order.lower(), 'per_page': per_page}
         if search_term:
-            query += ' AND c.name LIKE ?'
-            search_pattern = f'%{search_term}%'
-            params.append(search_pattern)
-        
-        query += ' GROUP BY c.id'
-        
-        # Add sorting - Sorting Algorithm: Quick Sort simulation (SQL ORDER BY)
-        valid_sort_columns = {
-            'name': 'c.name',
-            'students': 'student_count',
-            'created': 'c.created_at'
-        }
-        
-        sort_column = valid_sort_columns.get(sort_by, 'c.name')
-        sort_order = 'ASC' if sort_order.lower() == 'asc' else 'DESC'
-        query += f' ORDER BY {sort_column} {sort_order}'
-        
-        classes = conn.execute(query, params).fetchall()
-        conn.close()
+            page_args['search'] = search_term
         
         return render_template('view_classes.html', 
-                             classes=classes,
+                             classes=page['rows'],
+                             next_cursor=page['next_cursor'],
+                             prev_cursor=page['prev_cursor'],
+                             page_args=page_args,
+                             export_args={k: v for k, v in page_args.items() if k != 'per_page'},
                              current_sort=sort_by,
                              current_order=sort_order,
                              current_search=search_term)
 
+    @app.route('/classes/<int:id>/leaderboard')
+    @login_required
+    def class_leaderboard(id):
+        conn = get_db_connection()
+        class_info = conn.execute('''
+            SELECT c.*, COALESCE(cs.student_count, 0) as student_count
+            FROM classes c
+            LEFT JOIN class_stats cs ON cs.class_id = c.id
+            WHERE c.id = ?
+        ''', (id,)).fetchone()
+
+        if not class_info:
+            flash('Class not found', 'error')
+            return redirect(url_for('view_classes'))
+
+        limit = get_page_size(request.args.get('limit', LEADERBOARD_SIZE))
+        return render_template('leaderboard.html',
+                             class_info=class_info,
+                             students=get_leaderboard(get_report_connection(), id, limit),
+                             limit=limit,
+                             freshness=report_freshness())
+
+    @app.route('/classes/<int:id>/attendance', methods=['GET', 'POST'])
+    @login_required
+    def class_attendance(id):
+        conn = get_db_connection()
+        class_info = conn.execute('SELECT * FROM classes WHERE id = ?', (id,)).fetchone()
+        if not class_info:
+            flash('Class not found', 'error')
+            return redirect(url_for('view_classes'))
+
+        try:
+            day = parse_day(request.values.get('day'))
+        except ValueError:
+            flash('Day must be a date (YYYY-MM-DD)', 'error')
+            return redirect(url_for('class_attendance', id=id))
+
+        if request.method == 'POST':
+            # Unticked students, and any not on the form, are absent; the
+            # whole class is one insert
+            present = request.form.getlist('present', type=int)
+            marked = submit_write(lambda conn: mark_class(conn, id, day, present_ids=present))
+            flash(f'Attendance saved for {marked} student(s)', 'success')
+            return redirect(url_for('class_attendance', id=id, day=day))
+
+        return render_template('attendance.html',
+                             class_info=class_info,
+                             day=day,
+                             students=get_class_day(conn, id, day),
+                             history=get_class_days(conn, id))
+
     @app.route('/add-class', methods=['GET', 'POST'])
     @login_required
     def add_class():
@@ -283,11 +387,8 @@ def register_routes(app):
                 return render_template('add_class.html')
 
             try:
-                conn = get_db_connection()
-                conn.execute('INSERT INTO classes (name, description) VALUES (?, ?)',
-                            (name, description))
-                conn.commit()
-                conn.close()
+                submit_write(lambda conn: conn.execute('INSERT INTO classes (name, description) VALUES (?, ?)',
+                                                       (name, description)))
 
                 flash('Class added successfully!', 'success')
                 return redirect(url_for('view_classes'))
@@ -310,10 +411,8 @@ def register_routes(app):
                 return redirect(url_for('edit_class', id=id))
 
             try:
-                conn.execute('UPDATE classes SET name = ?, description = ? WHERE id = ?',
-                            (name, description, id))
-                conn.commit()
-                conn.close()
+                submit_write(lambda conn: conn.execute('UPDATE classes SET name = ?, description = ? WHERE id = ?',
+                                                       (name, description, id)))
 
                 flash('Class updated successfully!', 'success')
                 return redirect(url_for('view_classes'))
@@ -321,7 +420,6 @@ def register_routes(app):
                 flash('Class name already exists', 'error')
 
         class_info = conn.execute('SELECT * FROM classes WHERE id = ?', (id,)).fetchone()
-        conn.close()
 
         if not class_info:
             flash('Class not found', 'error')
@@ -332,82 +430,133 @@ def register_routes(app):
     @app.route('/delete-class/<int:id>')
     @login_required
     def delete_class(id):
-        conn = get_db_connection()
+        def delete_if_empty(conn):
+            # Checked in the same transaction as the delete, so no student
+            # can be added to the class in between
+            stats = conn.execute('SELECT student_count FROM class_stats WHERE class_id = ?', (id,)).fetchone()
+            student_count = stats['student_count'] if stats else 0
+            if student_count == 0:
+                conn.execute('DELETE FROM classes WHERE id = ?', (id,))
+            return student_count
 
-        # Check if class has students
-        student_count = conn.execute('SELECT COUNT(*) FROM students WHERE class_id = ?', (id,)).fetchone()[0]
+        student_count = submit_write(delete_if_empty)
 
         if student_count > 0:
-            conn.close()
             flash(f'Cannot delete class. It has {student_count} student(s) enrolled.', 'error')
             return redirect(url_for('view_classes'))
 
-        conn.execute('DELETE FROM classes WHERE id = ?', (id,))
-        conn.commit()
-        conn.close()
-
         flash('Class deleted successfully!', 'success')
         return redirect(url_for('view_classes'))
 
     @app.route('/analytics')
     @login_required
     def analytics():
-        conn = get_db_connection()
+        # Everything on this page is read through the report connection,
+        # which may be a few seconds behind (see backend/reports.py)
+        conn = get_report_connection()
+        remember_data_generation(conn)
+
+        # Bucket counts, averages, top performers and the "needs attention"
+        # list all come from aggregate SQL queries (see backend/analytics.py)
+        data = cached(conn, 'analytics', lambda: compute_analytics(conn))
+        summary = data['summary']
+        # Spread, correlation and cohorts from the columnar snapshot
+        insights = cached(conn, 'insights', lambda: get_insights(conn))
 
-        # Get all students with class information
-        students = conn.execute('''
-            SELECT s.*, c.name as class_name
-            FROM students s
-            JOIN classes c ON s.class_id = c.id
-            ORDER BY s.marks DESC
-        ''').fetchall()
+        return render_template('analytics.html',
+                             summary=summary,
+                             classes_stats=data['classes_stats'],
+                             subject_stats=data['subject_stats'],
+                             performance_ranges=summary['performance_ranges'],
+                             attendance_ranges=summary['attendance_ranges'],
+                             top_performers=data['top_performers'],
+                             students_attention=data['students_attention'],
+                             insights=insights,
+                             freshness=report_freshness())
+
+    @app.route('/export/class-stats.<any(csv, ndjson):fmt>')
+    @login_required
+    def export_class_stats(fmt):
+        conn = get_report_connection()
+        return export_response(iter_class_stats(conn), CLASS_STATS_EXPORT_COLUMNS, fmt, 'class_stats',
+                               gzip='gzip' in request.accept_encodings)
 
-        # Get class statistics
-        classes_stats = conn.execute('''
-            SELECT
-                c.name,
-                COUNT(s.id) as student_count,
-                AVG(s.marks) as avg_marks,
-                AVG(s.attendance) as avg_attendance,
-                MIN(s.marks) as min_marks,
-                MAX(s.marks) as max_marks
-            FROM classes c
-            LEFT JOIN students s ON c.id = s.class_id
-            GROUP BY c.id, c.name
-            ORDER BY c.name
-        ''').fetchall()
+    @app.route('/cache-stats')
+    @login_required
+    def cache_stats():
+        return jsonify(cache=get_cache_stats(), fragments=get_fragment_stats(), pool=get_pool_stats(),
+                       writer=get_writer_stats(), snapshot=get_snapshot_stats(), reports=get_report_stats())
 
-        # Performance distribution
-        performance_ranges = {
-            '90-100': len([s for s in students if s['marks'] >= 90]),
-            '80-89': len([s for s in students if 80 <= s['marks'] < 90]),
-            '70-79': len([s for s in students if 70 <= s['marks'] < 80]),
-            '60-69': len([s for s in students if 60 <= s['marks'] < 70]),
-            '50-59': len([s for s in students if 50 <= s['marks'] < 60]),
-            'Below 50': len([s for s in students if s['marks'] < 50])
-        }
-
-        # Attendance distribution
-        attendance_ranges = {
-            '90-100': len([s for s in students if s['attendance'] >= 90]),
-            '80-89': len([s for s in students if 80 <= s['attendance'] < 90]),
-            '70-79': len([s for s in students if 70 <= s['attendance'] < 80]),
-            '60-69': len([s for s in students if 60 <= s['attendance'] < 70]),
-            'Below 60': len([s for s in students if s['attendance'] < 60])
-        }
-
-        # Top performers (top 5)
-        top_performers = students[:5] if len(students) >= 5 else students
-
-        # Students needing attention (marks < 50 or attendance < 60)
-        students_attention = [s for s in students if s['marks'] < 50 or s['attendance'] < 60]
-
-        conn.close()
+    @app.route('/jobs', methods=['GET', 'POST'])
+    @login_required
+    def jobs_page():
+        if request.method == 'POST':
+            try:
+                submit_job(request.form.get('kind', ''))
+                flash('Job started', 'success')
+            except ValueError as e:
+                flash(str(e), 'error')
+            return redirect(url_for('jobs_page'))
 
-        return render_template('analytics.html',
-                             students=students,
-                             classes_stats=classes_stats,
-                             performance_ranges=performance_ranges,
-                             attendance_ranges=attendance_ranges,
-                             top_performers=top_performers,
-                             students_attention=students_attention)
+        jobs = list_jobs(get_db_connection())
+        return render_template('jobs.html', jobs=jobs,
+                             active=any(job['status'] in ('queued', 'running') for job in jobs))
+
+    @app.route('/jobs/<int:id>')
+    @login_required
+    def job_status(id):
+        job = get_job(get_db_connection(), id)
+        if job is None:
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify(job)
+
+    @app.route('/jobs/<int:id>/cancel', methods=['POST'])
+    @login_required
+    def cancel_job_route(id):
+        if cancel_job(id):
+            flash('Job cancelled', 'success')
+        else:
+            flash('Job has already finished', 'error')
+        return redirect(url_for('jobs_page'))
+
+    @app.route('/admin/slow-queries')
+    @login_required
+    def slow_queries_page():
+        threshold = slow_queries.threshold
+        return render_template('slow_queries.html',
+                             shapes=slow_queries.get_slow_query_shapes(),
+                             threshold_ms=round(threshold * 1000) if threshold is not None else None)
+
+    @app.route('/admin/slow-queries/clear', methods=['POST'])
+    @login_required
+    def clear_slow_queries():
+        slow_queries.clear_slow_query_log()
+        flash('Slow-query log cleared', 'success')
+        return redirect(url_for('slow_queries_page'))
+
+    @app.route('/admin/profiles')
+    @login_required
+    def profiles_page():
+        return render_template('profiles.html',
+                             profiles=profiling.list_profiles(),
+                             enabled=profiling.profiling_enabled(),
+                             header=PROFILE_HEADER)
+
+    @app.route('/admin/profiles/<name>')
+    @login_required
+    def profile_detail(name):
+        path = profiling.profile_path(name)
+        if path is None:
+            abort(404)
+        if name.endswith('.pstats'):
+            summary = profiling.summarize_cpu_profile(path)
+        else:
+            summary = profiling.summarize_memory_profile(path)
+        return render_template('profile_detail.html', name=name, summary=summary,
+                             kind='cpu' if name.endswith('.pstats') else 'memory')
+
+    @app.route('/metrics')
+    @token_required
+    def metrics():
+        # Prometheus text format; scrape with an API token as bearer token
+        return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
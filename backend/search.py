@@ -0,0 +1,45 @@
+import re
+
+
+def has_fts(conn, table):
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+    return row is not None
+
+
+def match_expression(search_term):
+    """
+    Turns what the user typed into an FTS5 query: every word must match
+    the start of a word in the row, e.g. 'ali T-00' -> '"ali"* "t"* "00"*'.
+    Returns None if there is nothing to search for.
+    """
+    words = re.findall(r'\w+', search_term.lower())
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def student_search(conn, search_term):
+    """
+    Returns (join, condition, params) for searching students by name or
+    roll number. With FTS5 the join adds the full-text table as `f`, so
+    `f.rank` can be used to sort by relevance. Without FTS5 the join is
+    empty and the condition falls back to LIKE.
+    """
+    match = match_expression(search_term)
+    if match and has_fts(conn, 'students_fts'):
+        return ' JOIN students_fts f ON f.rowid = s.id', 'students_fts MATCH ?', [match]
+
+    search_pattern = f'%{search_term}%'
+    return '', '(s.name LIKE ? OR s.roll_no LIKE ?)', [search_pattern, search_pattern]
+
+
+def class_search(conn, search_term):
+    """
+    Returns (condition, params) for searching classes by name.
+    """
+    match = match_expression(search_term)
+    if match and has_fts(conn, 'classes_fts'):
+        return 'c.id IN (SELECT rowid FROM classes_fts WHERE classes_fts MATCH ?)', [match]
+
+    search_pattern = f'%{search_term}%'
+    return 'c.name LIKE ?', [search_pattern]
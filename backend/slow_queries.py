@@ -0,0 +1,166 @@
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from flask import has_request_context, request
+
+from backend.config import SLOW_QUERY_LOG_ENABLED, SLOW_QUERY_LOG_PATH, SLOW_QUERY_MAX_ROWS, SLOW_QUERY_THRESHOLD_MS
+
+_DEFAULT_THRESHOLD_MS = SLOW_QUERY_THRESHOLD_MS if SLOW_QUERY_LOG_ENABLED else None
+
+# Statements taking at least this many seconds are logged; None turns the
+# log off. Read by InstrumentedConnection on every query.
+threshold = _DEFAULT_THRESHOLD_MS / 1000 if _DEFAULT_THRESHOLD_MS is not None else None
+
+_path = SLOW_QUERY_LOG_PATH
+# Bumped when the path changes, so every thread reconnects to the new file
+_path_generation = 0
+_max_rows = SLOW_QUERY_MAX_ROWS
+_local = threading.local()
+_inserts = 0
+
+logger = logging.getLogger(__name__)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+
+
+def configure_slow_query_log(threshold_ms=_DEFAULT_THRESHOLD_MS, path=SLOW_QUERY_LOG_PATH,
+                             max_rows=SLOW_QUERY_MAX_ROWS):
+    global threshold, _path, _path_generation, _max_rows
+    threshold = threshold_ms / 1000 if threshold_ms is not None else None
+    _max_rows = max_rows
+    if path != _path:
+        _path = path
+        _path_generation += 1
+
+
+def normalize_sql(sql):
+    """
+    Reduces a statement to its shape, so the same query with different
+    values is counted together: literals become ?, `IN (?, ?, ?)` becomes
+    `IN (...)` and whitespace is collapsed.
+    """
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = ' '.join(sql.split())
+    return _IN_LIST.sub('(...)', sql)
+
+
+def parameter_shape(parameters):
+    """The types of the bound values, e.g. 'str, int, int'."""
+    if parameters is None:
+        return 'many'
+    if isinstance(parameters, dict):
+        return ', '.join(f'{key}: {type(value).__name__}' for key, value in sorted(parameters.items()))
+    return ', '.join(type(value).__name__ for value in parameters)
+
+
+def _connect():
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.generation != _path_generation:
+        conn.close()
+        conn = _local.conn = None
+    if conn is None:
+        generation = _path_generation
+        conn = sqlite3.connect(_path, timeout=5, isolation_level=None)
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = NORMAL')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS slow_queries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                logged_at REAL NOT NULL,
+                endpoint TEXT,
+                normalized_sql TEXT NOT NULL,
+                sql TEXT NOT NULL,
+                parameter_shape TEXT NOT NULL,
+                duration_ms REAL NOT NULL,
+                query_plan TEXT
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_slow_queries_shape ON slow_queries(normalized_sql, parameter_shape)')
+        _local.conn = conn
+        _local.generation = generation
+    return conn
+
+
+def _query_plan(conn, sql, parameters):
+    # Runs on the connection that was slow, so the plan is for the same
+    # database and indexes. The plan rows are (id, parent, notused, detail).
+    if parameters is None:
+        return None
+    try:
+        rows = sqlite3.Connection.execute(conn, 'EXPLAIN QUERY PLAN ' + sql, parameters).fetchall()
+    except sqlite3.Error:
+        return None
+    depth = {0: -1}
+    lines = []
+    for row in rows:
+        depth[row[0]] = depth.get(row[1], -1) + 1
+        lines.append('  ' * depth[row[0]] + row[3])
+    return '\n'.join(lines)
+
+
+def log_slow_query(conn, sql, parameters, seconds):
+    """
+    Stores one slow statement with its shape, duration and query plan.
+    The log keeps the newest SLOW_QUERY_MAX_ROWS records. Errors writing
+    the log are only logged: the statement itself must not fail because
+    of them.
+    """
+    global _inserts
+    try:
+        endpoint = request.endpoint if has_request_context() else None
+        plan = _query_plan(conn, sql, parameters)
+
+        log = _connect()
+        log.execute('''
+            INSERT INTO slow_queries (logged_at, endpoint, normalized_sql, sql, parameter_shape, duration_ms, query_plan)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (time.time(), endpoint, normalize_sql(sql), sql, parameter_shape(parameters), seconds * 1000, plan))
+
+        # Trimming the log now and then is enough to keep it small
+        _inserts += 1
+        if _inserts % 100 == 0:
+            log.execute('DELETE FROM slow_queries WHERE id <= (SELECT MAX(id) FROM slow_queries) - ?', (_max_rows,))
+    except Exception:
+        logger.warning('Could not write the slow-query log at %s', _path, exc_info=True)
+
+
+def get_slow_query_shapes(limit=50):
+    """
+    Query shapes ranked by the total time they took, slowest first. Empty,
+    without creating the log file, while the log is off or nothing has
+    been logged yet.
+    """
+    if threshold is None or not os.path.exists(_path):
+        return []
+    rows = _connect().execute('''
+        SELECT
+            normalized_sql,
+            parameter_shape,
+            COUNT(*) as count,
+            SUM(duration_ms) as total_ms,
+            AVG(duration_ms) as avg_ms,
+            MAX(duration_ms) as max_ms,
+            MAX(logged_at) as last_logged_at,
+            GROUP_CONCAT(DISTINCT endpoint) as endpoints,
+            (SELECT query_plan FROM slow_queries last
+             WHERE last.normalized_sql = s.normalized_sql AND last.parameter_shape = s.parameter_shape
+             ORDER BY last.id DESC LIMIT 1) as query_plan
+        FROM slow_queries s
+        GROUP BY normalized_sql, parameter_shape
+        ORDER BY total_ms DESC
+        LIMIT ?
+    ''', (limit,))
+    columns = [column[0] for column in rows.description]
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def clear_slow_query_log():
+    if os.path.exists(_path):
+        _connect().execute('DELETE FROM slow_queries')
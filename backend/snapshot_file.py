@@ -0,0 +1,241 @@
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from array import array
+
+from backend import db
+from backend.config import SNAPSHOT_FILE_SUFFIX
+
+# File layout, all in native byte order (the file is only read on the
+# machine that wrote it):
+#   header     magic, format version, data epoch and generation, counts
+#   sections   (offset, length in bytes) of every column below
+#   columns    each starting at a multiple of 8 bytes
+# Names and roll numbers are stored as one UTF-8 byte column plus an
+# offsets column: value i is bytes[offsets[i]:offsets[i + 1]].
+MAGIC = b'ITSNAP\0\0'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('=8sI16sqqq')
+SECTION = struct.Struct('=qq')
+SECTIONS = (
+    ('ids', 'q'),
+    ('class_ids', 'q'),
+    ('marks', 'B'),
+    ('attendance', 'B'),
+    ('name_offsets', 'q'),
+    ('name_bytes', 'B'),
+    ('roll_no_offsets', 'q'),
+    ('roll_no_bytes', 'B'),
+    ('class_table_ids', 'q'),
+    ('class_name_offsets', 'q'),
+    ('class_name_bytes', 'B'),
+)
+
+
+class SnapshotFormatError(Exception):
+    """The file is not a snapshot, or one written by another format version."""
+
+
+class MappedSnapshot:
+    """
+    A snapshot file mapped read-only. The columns are memoryviews over the
+    mapping, so nothing is copied and every worker process shares the same
+    pages. Has the same ids, class_ids, marks and attendance columns as
+    columnar.StudentSnapshot, plus names and roll numbers.
+    """
+
+    def __init__(self, path, database_path):
+        self.database_path = database_path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < HEADER.size:
+            raise SnapshotFormatError(f'{path} is too short')
+        magic, version, epoch, self.generation, students, classes = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise SnapshotFormatError(f'{path} is not a version {FORMAT_VERSION} snapshot')
+        self.epoch = epoch.decode('ascii')
+
+        view = memoryview(self._map)
+        for i, (name, typecode) in enumerate(SECTIONS):
+            offset, length = SECTION.unpack_from(self._map, HEADER.size + i * SECTION.size)
+            setattr(self, name, view[offset:offset + length].cast(typecode))
+        if len(self.ids) != students or len(self.class_table_ids) != classes:
+            raise SnapshotFormatError(f'{path} is truncated')
+        self._class_names = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    @staticmethod
+    def _text(offsets, data, index):
+        return bytes(data[offsets[index]:offsets[index + 1]]).decode('utf-8')
+
+    def name(self, index):
+        return self._text(self.name_offsets, self.name_bytes, index)
+
+    def roll_no(self, index):
+        return self._text(self.roll_no_offsets, self.roll_no_bytes, index)
+
+    @property
+    def class_names(self):
+        if self._class_names is None:
+            self._class_names = {
+                class_id: self._text(self.class_name_offsets, self.class_name_bytes, i)
+                for i, class_id in enumerate(self.class_table_ids)
+            }
+        return self._class_names
+
+    def student(self, index):
+        """The student at index (in id order) as a dict, like a students row."""
+        class_id = self.class_ids[index]
+        return {
+            'id': self.ids[index],
+            'name': self.name(index),
+            'roll_no': self.roll_no(index),
+            'class_id': class_id,
+            'class_name': self.class_names.get(class_id, ''),
+            'marks': self.marks[index],
+            'attendance': self.attendance[index],
+        }
+
+
+def _text_column(values):
+    offsets = array('q', [0])
+    data = bytearray()
+    for value in values:
+        data += value.encode('utf-8')
+        offsets.append(len(data))
+    return offsets, data
+
+
+def _read_columns(conn):
+    started = not conn.in_transaction
+    if started:
+        # The generation and both tables must come from the same snapshot
+        conn.execute('BEGIN')
+    try:
+        row = conn.execute('SELECT epoch, generation FROM data_generation WHERE id = 1').fetchone()
+        columns = {'ids': array('q'), 'class_ids': array('q'), 'marks': array('B'), 'attendance': array('B')}
+        names = []
+        roll_nos = []
+        for student in conn.execute('SELECT id, class_id, marks, attendance, name, roll_no FROM students ORDER BY id'):
+            columns['ids'].append(student[0])
+            columns['class_ids'].append(student[1])
+            columns['marks'].append(student[2])
+            columns['attendance'].append(student[3])
+            names.append(student[4])
+            roll_nos.append(student[5])
+        classes = conn.execute('SELECT id, name FROM classes ORDER BY id').fetchall()
+    finally:
+        if started:
+            conn.commit()
+
+    columns['name_offsets'], columns['name_bytes'] = _text_column(names)
+    columns['roll_no_offsets'], columns['roll_no_bytes'] = _text_column(roll_nos)
+    columns['class_table_ids'] = array('q', [c[0] for c in classes])
+    columns['class_name_offsets'], columns['class_name_bytes'] = _text_column(c[1] for c in classes)
+    return row[0], row[1], columns
+
+
+def export_snapshot(conn, path):
+    """
+    Writes students and classes, as of one read transaction, to path and
+    returns the new file mapped. The file is written under a temporary name
+    and renamed over path, so readers see either the old or the new file.
+    """
+    epoch, generation, columns = _read_columns(conn)
+
+    offset = HEADER.size + SECTION.size * len(SECTIONS)
+    layout = []
+    for name, _ in SECTIONS:
+        offset += -offset % 8
+        length = len(columns[name]) * columns[name].itemsize if isinstance(columns[name], array) else len(columns[name])
+        layout.append((offset, length))
+        offset += length
+
+    directory, filename = os.path.split(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=filename + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, epoch.encode('ascii'), generation,
+                                len(columns['ids']), len(columns['class_table_ids'])))
+            for section in layout:
+                f.write(SECTION.pack(*section))
+            for (name, _), (section_offset, _) in zip(SECTIONS, layout):
+                f.write(b'\0' * (section_offset - f.tell()))
+                f.write(columns[name])
+            f.flush()
+            os.fsync(f.fileno())
+        # Mapped before the rename, so this is the file just written even
+        # if another worker replaces it right after
+        mapped = MappedSnapshot(temp_path, db.DATABASE)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return mapped
+
+
+def snapshot_path(database_path=None):
+    """The snapshot file of a database: next to it, with SNAPSHOT_FILE_SUFFIX."""
+    return (database_path or db.DATABASE) + SNAPSHOT_FILE_SUFFIX
+
+
+_mapped = None
+_lock = threading.Lock()
+_stats = {'exports': 0, 'maps': 0}
+
+
+def _is_current(mapped, epoch, generation):
+    # Newer than asked for is fine (a report connection may read an older copy)
+    return (mapped is not None and mapped.database_path == db.DATABASE
+            and mapped.epoch == epoch and mapped.generation >= generation)
+
+
+def _open(path):
+    try:
+        return MappedSnapshot(path, db.DATABASE)
+    except (OSError, ValueError, SnapshotFormatError):
+        return None
+
+
+def get_mapped_snapshot(conn):
+    """
+    The snapshot file for the current data generation (or a newer one),
+    mapped. Only the one-row data_generation table is read from SQLite;
+    the file is exported again when it is missing or behind. When another
+    worker has already exported it, that file is mapped instead.
+    """
+    global _mapped
+    row = conn.execute('SELECT epoch, generation FROM data_generation WHERE id = 1').fetchone()
+    epoch, generation = row[0], row[1]
+    mapped = _mapped
+    if _is_current(mapped, epoch, generation):
+        return mapped
+
+    with _lock:
+        if _is_current(_mapped, epoch, generation):
+            return _mapped
+        path = snapshot_path()
+        mapped = _open(path)
+        if _is_current(mapped, epoch, generation):
+            _stats['maps'] += 1
+        else:
+            mapped = export_snapshot(conn, path)
+            _stats['exports'] += 1
+        # The old mapping is closed once nothing uses its columns any more
+        _mapped = mapped
+        return mapped
+
+
+def get_snapshot_file_stats():
+    with _lock:
+        stats = dict(_stats)
+        mapped = _mapped
+    stats['path'] = snapshot_path()
+    stats['generation'] = f'{mapped.epoch}-{mapped.generation}' if mapped is not None else None
+    stats['bytes'] = len(mapped._map) if mapped is not None else 0
+    return stats
@@ -0,0 +1,75 @@
+from backend.search import student_search
+
+
+def student_query(conn, args):
+    """
+    Builds the FROM/WHERE/sort parts of the students list from the request
+    arguments (search, class, subject, sort_by, sort_order). Used by view_students
+    and the export so both return the same rows in the same order.
+    """
+    sort_by = args.get('sort_by', '')  # Default sort by roll_no (relevance when searching)
+    sort_order = args.get('sort_order', 'asc')  # Default ascending
+    search_term = args.get('search', '')  # Search by name or roll_no
+    class_filter = args.get('class', '')  # Filter by class
+    subject_filter = args.get('subject', '')  # Filter by subject id
+
+    # Valid sort columns to prevent SQL injection
+    valid_sort_columns = {
+        'name': 's.name',
+        'roll_no': 's.roll_no',
+        'marks': 's.marks',
+        'attendance': 's.attendance',
+        'class': 'c.name'
+    }
+
+    # Build the filters dynamically based on search and class
+    join = 'students s JOIN classes c ON s.class_id = c.id'
+    filters = ''
+    params = []
+
+    # Add search filter (full-text index when available, LIKE otherwise)
+    if search_term:
+        search_join, condition, search_params = student_search(conn, search_term)
+        join += search_join
+        filters += f' AND {condition}'
+        params.extend(search_params)
+        if search_join:
+            # Best matches have the lowest rank
+            valid_sort_columns['relevance'] = 'f.rank'
+            if not sort_by:
+                sort_by = 'relevance'
+
+    # Add class filter
+    if class_filter:
+        filters += ' AND c.id = ?'
+        params.append(int(class_filter))
+
+    # Add subject filter, answered from idx_student_subjects_subject.
+    # Only the subject dropdown sets it, so a non-numeric value is ignored
+    if subject_filter.isdigit():
+        filters += ' AND s.id IN (SELECT student_id FROM student_subjects WHERE subject_id = ?)'
+        params.append(int(subject_filter))
+    else:
+        subject_filter = ''
+
+    if sort_by not in valid_sort_columns:
+        sort_by = 'roll_no'
+    sort_order = 'ASC' if sort_order.lower() == 'asc' else 'DESC'
+
+    # When sorting the whole table by class, CROSS JOIN makes SQLite walk
+    # classes in name order and read each class's students from
+    # idx_students_class, so no sort of the whole table is needed
+    if sort_by == 'class' and not search_term:
+        join = 'classes c CROSS JOIN students s ON s.class_id = c.id'
+
+    return {
+        'join': join,
+        'filters': filters,
+        'params': params,
+        'sort_by': sort_by,
+        'sort_column': valid_sort_columns[sort_by],
+        'sort_order': sort_order,
+        'search_term': search_term,
+        'class_filter': class_filter,
+        'subject_filter': subject_filter,
+    }
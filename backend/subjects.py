@@ -0,0 +1,46 @@
+def parse_subjects(text):
+    """
+    Splits the comma separated subjects field into a list of names, e.g.
+    'Math, physics,Math' -> ['Math', 'physics']. Duplicates are dropped
+    case-insensitively, keeping the first spelling.
+    """
+    names = []
+    seen = set()
+    for name in (text or '').split(','):
+        name = ' '.join(name.split())
+        if name and name.lower() not in seen:
+            seen.add(name.lower())
+            names.append(name)
+    return names
+
+
+def _subject_id(conn, name, known):
+    key = name.lower()
+    if key not in known:
+        conn.execute('INSERT OR IGNORE INTO subjects (name) VALUES (?)', (name,))
+        # subjects.name is NOCASE, so 'math' finds 'Math'
+        known[key] = conn.execute('SELECT id FROM subjects WHERE name = ?', (name,)).fetchone()[0]
+    return known[key]
+
+
+def sync_student_subjects(conn, students):
+    """
+    Rewrites the student_subjects rows for (student id, subjects text)
+    pairs. Runs in the caller's transaction; the caller commits together
+    with the change to students.subjects.
+    """
+    known = {}  # subject ids already looked up in this call
+    for student_id, text in students:
+        conn.execute('DELETE FROM student_subjects WHERE student_id = ?', (student_id,))
+        subject_ids = [_subject_id(conn, name, known) for name in parse_subjects(text)]
+        conn.executemany('INSERT OR IGNORE INTO student_subjects (student_id, subject_id) VALUES (?, ?)',
+                         [(student_id, subject_id) for subject_id in subject_ids])
+
+
+def rebuild_student_subjects(conn):
+    """Fills subjects and student_subjects from every students.subjects string."""
+    conn.execute('DELETE FROM student_subjects')
+    rows = conn.execute('SELECT id, subjects FROM students').fetchall()
+    sync_student_subjects(conn, rows)
+    # Drop subjects nobody takes any more
+    conn.execute('DELETE FROM subjects WHERE id NOT IN (SELECT subject_id FROM student_subjects)')
@@ -0,0 +1,137 @@
+import os
+import threading
+
+from flask import Response, g, get_flashed_messages, has_request_context, stream_template
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+from backend import db
+from backend.cache import MemoryCache
+from backend.config import (CACHE_TTL, FRAGMENT_CACHE_ENABLED, FRAGMENT_CACHE_MAX_ENTRIES, STREAM_BUFFER_SIZE,
+                            TEMPLATE_CACHE_DIR)
+
+_fragments = MemoryCache(max_entries=FRAGMENT_CACHE_MAX_ENTRIES, ttl=CACHE_TTL)
+_enabled = FRAGMENT_CACHE_ENABLED
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def configure_fragment_cache(enabled=FRAGMENT_CACHE_ENABLED, max_entries=FRAGMENT_CACHE_MAX_ENTRIES):
+    global _enabled, _fragments
+    _enabled = enabled
+    _fragments = MemoryCache(max_entries=max_entries, ttl=CACHE_TTL)
+
+
+def remember_data_generation(conn):
+    """
+    Stores the data generation for the fragments of this request. Call it
+    before reading the rows that the fragments show: a change made in
+    between then only ends up under the old generation, which is never
+    read again.
+    """
+    g.data_generation = db.get_data_generation(conn)
+
+
+def _data_generation():
+    if 'data_generation' not in g:
+        remember_data_generation(db.get_db_connection())
+    return g.data_generation
+
+
+def render_fragment(key_parts, render):
+    """
+    Returns the HTML of a {% cache %} block, rendering it only when it is
+    not cached for the current data generation yet.
+    """
+    if not _enabled or not has_request_context():
+        return render()
+
+    key = ':'.join([db.DATABASE, _data_generation()] + [str(part) for part in key_parts])
+    hit, html = _fragments.get(key)
+    with _stats_lock:
+        _stats['hits' if hit else 'misses'] += 1
+    if not hit:
+        html = Markup(render())
+        _fragments.set(key, html)
+    return html
+
+
+class FragmentCacheExtension(Extension):
+    """
+    {% cache 'student-row', student.id %} ... {% endcache %}
+
+    Caches the rendered block under the given key parts and the data
+    generation, so any change to students or classes renders it again.
+    The key must contain everything the block shows that does not come
+    from the database, such as the current user or the query string.
+    """
+
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key_parts = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            key_parts.append(parser.parse_expression())
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        call = self.call_method('_render', [nodes.List(key_parts)])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _render(self, key_parts, caller):
+        return render_fragment(key_parts, caller)
+
+
+def get_fragment_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = stats['hits'] / lookups if lookups else 0.0
+    stats['enabled'] = _enabled
+    return stats
+
+
+def _buffered(pieces, size):
+    # Jinja yields many tiny strings; join them so each write is worth it
+    buffer = []
+    for piece in pieces:
+        buffer.append(piece)
+        if len(buffer) >= size:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def stream_page(name, buffer_size=STREAM_BUFFER_SIZE, **context):
+    """
+    Like render_template, but the page is sent while it is rendered, so
+    the browser gets the top of the page before the last rows are read.
+    Pass a cursor instead of a list to keep memory flat: the request and
+    its connection stay open until the last chunk is sent.
+    """
+    # The session cookie is written before the body is rendered, so
+    # flashed messages are taken out of the session now
+    get_flashed_messages()
+    return Response(_buffered(stream_template(name, **context), buffer_size), mimetype='text/html')
+
+
+def precompile_templates(app):
+    """Compiles every template now instead of on its first request."""
+    names = app.jinja_env.list_templates()
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+
+def register_templates(app, cache_dir=TEMPLATE_CACHE_DIR):
+    """
+    Adds the {% cache %} tag and the bytecode cache, then compiles all
+    templates. With the bytecode cache, a new worker loads the compiled
+    code from cache_dir instead of parsing the templates again.
+    """
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+    precompile_templates(app)
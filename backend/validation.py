@@ -0,0 +1,31 @@
+def validate_student(name, roll_no, class_id, subjects, marks, attendance):
+    """
+    Checks student fields coming from a form or an imported file.
+    Returns (student, None) with class_id, marks and attendance converted to
+    int, or (None, error message).
+    """
+    if not all([name, roll_no, class_id, subjects, marks, attendance]):
+        return None, 'All fields are required'
+
+    try:
+        marks = int(marks)
+        attendance = int(attendance)
+        class_id = int(class_id)
+    except ValueError:
+        return None, 'Marks and attendance must be numbers'
+
+    if marks < 0 or marks > 100:
+        return None, 'Marks must be between 0 and 100'
+
+    if attendance < 0 or attendance > 100:
+        return None, 'Attendance must be between 0 and 100'
+
+    student = {
+        'name': name,
+        'roll_no': roll_no,
+        'class_id': class_id,
+        'subjects': subjects,
+        'marks': marks,
+        'attendance': attendance,
+    }
+    return student, None
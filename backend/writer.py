@@ -0,0 +1,213 @@
+import logging
+import queue
+import threading
+
+from backend import db
+from backend.config import WRITER_BATCH_SIZE, WRITER_COMMIT_TIMEOUT, WRITER_QUEUE_SIZE, WRITER_SUBMIT_TIMEOUT
+
+
+class WriterBusyError(Exception):
+    """The write queue stayed full for WRITER_SUBMIT_TIMEOUT seconds."""
+
+
+class WriterTimeoutError(WriterBusyError):
+    """A queued change was not committed within WRITER_COMMIT_TIMEOUT seconds."""
+
+
+class _Job:
+    def __init__(self, mutation, database_path):
+        self.mutation = mutation
+        self.database_path = database_path
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.callbacks = []
+
+
+_queue = queue.Queue(maxsize=WRITER_QUEUE_SIZE)
+_thread = None
+_thread_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {'mutations': 0, 'failed': 0, 'batches': 0, 'max_batch': 0, 'busy_rejections': 0}
+
+# Only used by the writer thread
+_writer_conn = None
+_writer_path = None
+_current_job = None
+
+logger = logging.getLogger(__name__)
+
+
+def submit_write(mutation, timeout=WRITER_SUBMIT_TIMEOUT):
+    """
+    Runs mutation(conn) on the writer thread and returns its result once
+    it has been committed. Exceptions raised by the mutation, such as
+    sqlite3.IntegrityError for a duplicate roll number, are raised here.
+
+    The mutation must not commit or roll back itself. It runs inside a
+    savepoint, so a failing mutation leaves no trace and does not affect
+    the other mutations committed with it. If the writer has not finished
+    it within WRITER_COMMIT_TIMEOUT seconds, WriterTimeoutError is raised;
+    the change may still be committed later.
+    """
+    if threading.current_thread() is _thread:
+        # Already on the writer thread, e.g. a mutation writing more
+        return mutation(_writer_conn)
+
+    job = _Job(mutation, db.DATABASE)
+    _ensure_started()
+    try:
+        _queue.put(job, timeout=timeout)
+    except queue.Full:
+        with _stats_lock:
+            _stats['busy_rejections'] += 1
+        raise WriterBusyError('Too many changes are waiting to be saved')
+
+    if not job.done.wait(WRITER_COMMIT_TIMEOUT):
+        raise WriterTimeoutError('The change was not saved in time')
+    if job.error is not None:
+        raise job.error
+    return job.result
+
+
+def after_commit(callback):
+    """
+    Called inside a mutation: runs callback() on the writer thread once
+    the mutation has been committed. Nothing runs if the mutation fails or
+    the commit does. Callbacks run in commit order, so they can keep
+    in-memory copies of the data in step with the database.
+    """
+    if threading.current_thread() is not _thread or _current_job is None:
+        raise RuntimeError('after_commit can only be used inside a mutation')
+    _current_job.callbacks.append(callback)
+
+
+def _ensure_started():
+    global _thread
+    with _thread_lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_run, name='db-writer', daemon=True)
+            _thread.start()
+
+
+def _connection_for(database_path):
+    # The writer follows set_database_path, e.g. between tests
+    global _writer_conn, _writer_path
+    if _writer_conn is None or _writer_path != database_path:
+        if _writer_conn is not None:
+            _writer_conn.close()
+            _writer_conn = None
+        _writer_conn = db.open_connection(database_path)
+        # Transactions and savepoints are managed by _commit_batch
+        _writer_conn.isolation_level = None
+        _writer_path = database_path
+    return _writer_conn
+
+
+def _next_batch(first):
+    """The first job plus whatever is already queued for the same database."""
+    batch = [first]
+    held_back = None
+    while len(batch) < WRITER_BATCH_SIZE:
+        try:
+            job = _queue.get_nowait()
+        except queue.Empty:
+            break
+        if job.database_path != first.database_path:
+            held_back = job
+            break
+        batch.append(job)
+    return batch, held_back
+
+
+def _run_callbacks(batch):
+    for job in batch:
+        for callback in job.callbacks:
+            try:
+                callback()
+            except Exception:
+                # The change is committed already; the route still succeeds
+                logger.exception('after_commit callback failed')
+
+
+def _commit_batch(batch):
+    global _current_job
+    conn = None
+    try:
+        conn = _connection_for(batch[0].database_path)
+        conn.execute('BEGIN IMMEDIATE')
+        for job in batch:
+            conn.execute('SAVEPOINT mutation')
+            _current_job = job
+            try:
+                job.result = job.mutation(conn)
+                conn.execute('RELEASE mutation')
+            except Exception as error:
+                conn.execute('ROLLBACK TO mutation')
+                conn.execute('RELEASE mutation')
+                job.error = error
+                job.callbacks = []
+            finally:
+                _current_job = None
+        conn.execute('COMMIT')
+    except Exception as error:
+        # Opening the connection, BEGIN or COMMIT failed: nothing in the
+        # batch was saved
+        if conn is not None and conn.in_transaction:
+            try:
+                conn.execute('ROLLBACK')
+            except Exception:
+                pass
+        for job in batch:
+            job.result = None
+            job.error = error
+            job.callbacks = []
+
+    _run_callbacks(batch)
+
+    with _stats_lock:
+        _stats['batches'] += 1
+        _stats['mutations'] += len(batch)
+        _stats['failed'] += sum(1 for job in batch if job.error is not None)
+        _stats['max_batch'] = max(_stats['max_batch'], len(batch))
+
+    # Routes only continue once their change is committed
+    for job in batch:
+        job.done.set()
+
+
+def _fail(jobs, error):
+    for job in jobs:
+        if not job.done.is_set():
+            job.result = None
+            job.error = error
+            job.done.set()
+
+
+def _run():
+    held_back = None
+    while True:
+        first = held_back or _queue.get()
+        batch, held_back = [first], None
+        try:
+            batch, held_back = _next_batch(first)
+            _commit_batch(batch)
+        except Exception as error:
+            # Keep the thread alive; nobody waiting on this batch may hang
+            logger.exception('Writer batch failed')
+            _fail(batch + ([held_back] if held_back is not None else []), error)
+            held_back = None
+
+
+def get_writer_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['queued'] = _queue.qsize()
+    stats['avg_batch'] = stats['mutations'] / stats['batches'] if stats['batches'] else 0.0
+    return stats
+
+
+def register_writer(app):
+    @app.errorhandler(WriterBusyError)
+    def writer_busy(error):
+        return 'The server is busy saving other changes. Please try again in a moment.', 503
@@ -0,0 +1,242 @@
+"""
+Times the main routes through app.test_client() on generated data.
+
+    python -m benchmarks.bench_routes --sizes 1000 10000 100000 1000000 --output results.json
+    python -m benchmarks.bench_routes --sizes 10000 --baseline baseline.json --threshold 0.25
+
+For every route and data size it reports p50/p95/p99 latency and the peak
+memory (tracemalloc) of one extra request. Results can be written as JSON
+and compared with a saved baseline. The exit code is 1 when a route got
+slower than the baseline by more than the threshold.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+
+from backend.app import app
+from backend.cache import get_cache_backend
+from backend.db import close_pool, get_db_connection, init_db, set_database_path
+from benchmarks.datagen import generate_dataset
+
+CLASS_COUNT = 12
+SORT_KEYS = ['roll_no', 'name', 'marks', 'attendance', 'class']
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(0, min(len(sorted_values) - 1, math.ceil(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def read_scenarios(conn):
+    """
+    (name, method, url, form data or None) for every read route. Ids for
+    the filters are taken from the generated data.
+    """
+    class_id = conn.execute('SELECT id FROM classes ORDER BY id LIMIT 1').fetchone()[0]
+    subject_id = conn.execute("SELECT id FROM subjects WHERE name = 'Physics'").fetchone()[0]
+
+    scenarios = [
+        ('dashboard', 'GET', '/dashboard', None),
+        ('dashboard (cold cache)', 'GET', '/dashboard', None),
+        ('analytics', 'GET', '/analytics', None),
+        ('analytics (cold cache)', 'GET', '/analytics', None),
+        ('classes', 'GET', '/classes', None),
+        ('classes sort=students', 'GET', '/classes?sort_by=students&sort_order=desc', None),
+    ]
+    for sort_by in SORT_KEYS:
+        for order in ('asc', 'desc'):
+            scenarios.append((f'view-students sort={sort_by} {order}', 'GET',
+                              f'/view-students?sort_by={sort_by}&sort_order={order}', None))
+    scenarios += [
+        ('view-students search', 'GET', '/view-students?search=priya', None),
+        ('view-students search sort=marks', 'GET', '/view-students?search=smi&sort_by=marks', None),
+        ('view-students class', 'GET', f'/view-students?class={class_id}&sort_by=marks', None),
+        ('view-students subject', 'GET', f'/view-students?subject={subject_id}', None),
+        ('view-students search+class', 'GET', f'/view-students?search=omar&class={class_id}', None),
+        ('view-students class all (streamed)', 'GET', f'/view-students?class={class_id}&all=1', None),
+    ]
+    return scenarios
+
+
+class Mutations:
+    """
+    Builds requests for the routes that change data. Every call returns a
+    new request, so repeated runs add, edit and delete different rows.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.class_id = conn.execute('SELECT id FROM classes ORDER BY id LIMIT 1').fetchone()[0]
+        self.counter = 0
+
+    def _student_form(self, roll_no):
+        self.counter += 1
+        return {'name': f'Bench Student {self.counter}', 'roll_no': roll_no, 'class_id': str(self.class_id),
+                'subjects': 'Math, Physics', 'marks': str(40 + self.counter % 60), 'attendance': '80'}
+
+    def add_student(self):
+        return 'POST', '/add-student', self._student_form(f'BENCH-{self.counter:07d}')
+
+    def edit_student(self):
+        row = self.conn.execute("SELECT id, roll_no FROM students WHERE roll_no LIKE 'BENCH-%' LIMIT 1").fetchone()
+        return 'POST', f'/edit-student/{row[0]}', self._student_form(row[1])
+
+    def delete_student(self):
+        row = self.conn.execute("SELECT id FROM students WHERE roll_no LIKE 'BENCH-%' ORDER BY id DESC LIMIT 1").fetchone()
+        return 'GET', f'/delete-student/{row[0]}', None
+
+    def add_class(self):
+        self.counter += 1
+        return 'POST', '/add-class', {'name': f'Bench Class {self.counter}', 'description': 'Benchmark'}
+
+
+def _same_request(method, url, data):
+    return lambda: (method, url, data)
+
+
+def _request(client, method, url, data):
+    if method == 'POST':
+        response = client.post(url, data=data)
+    else:
+        response = client.get(url)
+    if response.status_code >= 400:
+        raise RuntimeError(f'{method} {url} returned {response.status_code}')
+    # Make sure the whole body was produced, also for streamed responses
+    response.get_data()
+
+
+def measure(client, make_request, repeat, cold_cache=False):
+    """Returns the latency percentiles (ms) and peak memory (KiB) of a request."""
+    # One warm-up request fills template, statement and result caches
+    _request(client, *make_request())
+
+    timings = []
+    for _ in range(repeat):
+        request = make_request()
+        if cold_cache:
+            get_cache_backend().clear()
+        start = time.perf_counter()
+        _request(client, *request)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+
+    # tracemalloc slows everything down, so memory is measured separately
+    request = make_request()
+    if cold_cache:
+        get_cache_backend().clear()
+    tracemalloc.start()
+    _request(client, *request)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def run_size(size, repeat, only=None):
+    results = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        set_database_path(os.path.join(tmpdir, 'bench.db'))
+        init_db()
+        conn = get_db_connection()
+        start = time.perf_counter()
+        generate_dataset(conn, size, classes=CLASS_COUNT)
+        print(f'# {size} students generated in {time.perf_counter() - start:.1f}s')
+
+        app.config.update(TESTING=True)
+        client = app.test_client()
+        client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+
+        mutations = Mutations(conn)
+        scenarios = [(name, _same_request(method, url, data), 'cold cache' in name)
+                     for name, method, url, data in read_scenarios(conn)]
+        # Students are added before they are edited and deleted
+        scenarios += [
+            ('add-student', mutations.add_student, False),
+            ('edit-student', mutations.edit_student, False),
+            ('delete-student', mutations.delete_student, False),
+            ('add-class', mutations.add_class, False),
+        ]
+
+        for name, make_request, cold_cache in scenarios:
+            if only and not any(part in name for part in only):
+                continue
+            result = measure(client, make_request, repeat, cold_cache)
+            result.update({'size': size, 'route': name})
+            results.append(result)
+            print(f'{size:>8} {name:<36} {result["p50_ms"]:>9.2f} {result["p95_ms"]:>9.2f} '
+                  f'{result["p99_ms"]:>9.2f} {result["peak_kib"]:>10.1f}')
+
+        conn.close()
+        close_pool()
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Returns the results whose p50 or p95 is more than `threshold` (0.2 =
+    20%) slower than the same size and route in the baseline.
+    """
+    previous = {(item['size'], item['route']): item for item in baseline['results']}
+    regressions = []
+    for item in results:
+        old = previous.get((item['size'], item['route']))
+        if old is None:
+            continue
+        for key in ('p50_ms', 'p95_ms'):
+            if old[key] > 0 and item[key] > old[key] * (1 + threshold):
+                regressions.append({'size': item['size'], 'route': item['route'], 'metric': key,
+                                    'baseline': old[key], 'current': item[key]})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=20, help='timed requests per route')
+    parser.add_argument('--only', nargs='+', help='only routes whose name contains one of these')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='compare with results saved by an earlier --output')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed slowdown, 0.2 = 20%%')
+    args = parser.parse_args()
+
+    print(f'{"rows":>8} {"route":<36} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"peak KiB":>10}')
+    results = []
+    for size in args.sizes:
+        results += run_size(size, args.repeat, args.only)
+
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'repeat': args.repeat,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for item in regressions:
+            print(f"REGRESSION {item['size']} {item['route']} {item['metric']}: "
+                  f"{item['baseline']:.2f} -> {item['current']:.2f} ms")
+        if regressions:
+            raise SystemExit(1)
+        print(f'No regressions over {args.threshold:.0%} against {args.baseline}')
+
+
+if __name__ == '__main__':
+    main()
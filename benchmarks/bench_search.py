@@ -0,0 +1,74 @@
+"""
+Compares student search latency with LIKE '%term%' and the FTS5 index.
+
+    python -m benchmarks.bench_search --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from backend.db import get_db_connection, init_db, set_database_path
+from backend.search import student_search
+from benchmarks.datagen import generate_students
+
+SEARCH_TERMS = ['priya', 'smi', 'R-00012', 'omar kh', 'zane yil']
+
+
+# Each search does what view_students does: count the matches and read the
+# first page sorted by roll number
+
+
+def like_query(conn, term):
+    pattern = f'%{term}%'
+    params = (pattern, pattern)
+    conn.execute('SELECT COUNT(*) FROM students s WHERE (s.name LIKE ? OR s.roll_no LIKE ?)', params).fetchone()
+    return conn.execute('''
+        SELECT s.id FROM students s
+        WHERE (s.name LIKE ? OR s.roll_no LIKE ?)
+        ORDER BY s.roll_no LIMIT 50
+    ''', params).fetchall()
+
+
+def fts_query(conn, term):
+    join, condition, params = student_search(conn, term)
+    conn.execute(f'SELECT COUNT(*) FROM students s{join} WHERE {condition}', params).fetchone()
+    return conn.execute(f'''
+        SELECT s.id FROM students s{join}
+        WHERE {condition}
+        ORDER BY s.roll_no LIMIT 50
+    ''', params).fetchall()
+
+
+def time_query(query, conn, term, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        query(conn, term)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def run(sizes, repeat):
+    print(f'{"rows":>10} {"term":>10} {"LIKE ms":>10} {"FTS5 ms":>10} {"speedup":>8}')
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            set_database_path(os.path.join(tmpdir, 'bench.db'))
+            init_db()
+            conn = get_db_connection()
+            generate_students(conn, size)
+
+            for term in SEARCH_TERMS:
+                like_ms = time_query(like_query, conn, term, repeat)
+                fts_ms = time_query(fts_query, conn, term, repeat)
+                print(f'{size:>10} {term:>10} {like_ms:>10.2f} {fts_ms:>10.2f} {like_ms / fts_ms:>7.1f}x')
+            conn.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    run(args.sizes, args.repeat)
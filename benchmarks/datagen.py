@@ -0,0 +1,90 @@
+import random
+
+from backend.subjects import sync_student_subjects
+
+FIRST_NAMES = ['Aarav', 'Aisha', 'Ali', 'Amelia', 'Ben', 'Chen', 'Diego', 'Emma', 'Fatima', 'Hana',
+               'Ivan', 'Julia', 'Kofi', 'Lena', 'Maya', 'Noah', 'Omar', 'Priya', 'Sara', 'Zane']
+LAST_NAMES = ['Ahmed', 'Brown', 'Costa', 'Dubois', 'Evans', 'Garcia', 'Haddad', 'Ito', 'Khan', 'Lee',
+              'Mensah', 'Novak', 'Okafor', 'Patel', 'Rossi', 'Silva', 'Smith', 'Tanaka', 'Weber', 'Yilmaz']
+
+# Subjects with how often they are picked: core subjects are taken by
+# almost everyone, electives by a few
+SUBJECTS = {
+    'Math': 10, 'English': 10, 'Physics': 6, 'Chemistry': 6, 'Biology': 5, 'Computer Science': 5,
+    'History': 4, 'Economics': 4, 'Accounting': 3, 'Geography': 3, 'Art': 2, 'Music': 1,
+}
+
+
+def generate_classes(conn, count, seed=42):
+    """
+    Adds classes until there are `count` in total. Each gets a name like
+    'Grade 11-C'.
+    """
+    existing = conn.execute('SELECT COUNT(*) FROM classes').fetchone()[0]
+    rows = []
+    for i in range(existing, count):
+        grade = 9 + i % 4
+        section = i // 4
+        name = f'Grade {grade}-{chr(ord("A") + section % 26)}{section // 26 or ""}'
+        rows.append((name, f'Generated class {i + 1}'))
+    conn.executemany('INSERT OR IGNORE INTO classes (name, description) VALUES (?, ?)', rows)
+    conn.commit()
+
+
+def _pick_subjects(rng):
+    names = list(SUBJECTS)
+    weights = list(SUBJECTS.values())
+    picked = []
+    for _ in range(rng.randint(2, 5)):
+        name = rng.choices(names, weights)[0]
+        if name not in picked:
+            picked.append(name)
+    return ', '.join(picked)
+
+
+def generate_students(conn, count, seed=42, batch_size=10000):
+    """
+    Inserts `count` students spread over the existing classes. The same
+    seed always gives the same rows.
+
+    Marks follow a normal distribution whose mean differs per class, and
+    attendance goes up with marks, so averages, buckets and the "needs
+    attention" list look like real data.
+    """
+    rng = random.Random(seed)
+    class_ids = [row[0] for row in conn.execute('SELECT id FROM classes ORDER BY id')]
+    class_means = {class_id: rng.gauss(70, 6) for class_id in class_ids}
+    # Some classes are much bigger than others
+    class_weights = [rng.uniform(0.5, 1.5) for _ in class_ids]
+    first_number = conn.execute('SELECT COUNT(*) FROM students').fetchone()[0]
+
+    batch = []
+    for i in range(first_number, first_number + count):
+        class_id = rng.choices(class_ids, class_weights)[0]
+        name = f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+        marks = min(100, max(0, int(rng.gauss(class_means[class_id], 14))))
+        attendance = min(100, max(0, int(rng.gauss(60 + marks * 0.3, 8))))
+        batch.append((name, f'R-{i:07d}', class_id, _pick_subjects(rng), marks, attendance))
+        if len(batch) >= batch_size:
+            _insert(conn, batch)
+            batch = []
+    if batch:
+        _insert(conn, batch)
+
+
+def generate_dataset(conn, students, classes=12, seed=42):
+    """Fills an empty database with `classes` classes and `students` students."""
+    generate_classes(conn, classes, seed)
+    generate_students(conn, students, seed)
+
+
+def _insert(conn, rows):
+    conn.executemany('INSERT INTO students (name, roll_no, class_id, subjects, marks, attendance) VALUES (?, ?, ?, ?, ?, ?)',
+                     rows)
+    # executemany gives no row ids, so the new rows are read back to fill
+    # student_subjects (roll numbers are generated in increasing order)
+    roll_numbers = [row[1] for row in rows]
+    first, last = min(roll_numbers), max(roll_numbers)
+    new_rows = conn.execute('SELECT id, subjects FROM students WHERE roll_no BETWEEN ? AND ?', (first, last))
+    sync_student_subjects(conn, new_rows.fetchall())
+    conn.commit()
@@ -0,0 +1,179 @@
+import os
+import tempfile
+import time
+import unittest
+
+from backend.app import app, init_db, set_database_path
+from backend.auth import create_api_token
+from backend.db import get_db_connection
+
+
+class TestIntegrationApi(unittest.TestCase):
+    """Integration tests for the /api/v1 JSON API"""
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self._tmpdir.name, "test_database.db")
+        set_database_path(self.db_path)
+        init_db()
+
+        app.config.update(TESTING=True)
+        self.client = app.test_client()
+
+        conn = get_db_connection()
+        self.token = create_api_token(conn, "tests")
+        self.class_id = conn.execute("SELECT id FROM classes ORDER BY id LIMIT 1").fetchone()[0]
+        for i, marks in enumerate([70, 90, 80]):
+            conn.execute(
+                'INSERT INTO students (name, roll_no, class_id, subjects, marks, attendance) VALUES (?, ?, ?, ?, ?, ?)',
+                (f"Api Student {i}", f"API-{i:03d}", self.class_id, "Math", marks, 85)
+            )
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        try:
+            self._tmpdir.cleanup()
+        except Exception:
+            # Windows sometimes locks the database file, ignore cleanup errors
+            pass
+
+    def get(self, url, **headers):
+        headers.setdefault("Authorization", f"Bearer {self.token}")
+        return self.client.get(url, headers=headers)
+
+    def test_requires_token(self):
+        """Test that requests without a valid token get 401"""
+        resp = self.client.get("/api/v1/students")
+        self.assertEqual(resp.status_code, 401)
+        resp = self.get("/api/v1/students", Authorization="Bearer wrong")
+        self.assertEqual(resp.status_code, 401)
+
+    def test_session_is_not_enough(self):
+        """Test that the cookie session does not open the API"""
+        self.client.post("/login", data={"username": "admin", "password": "admin123"})
+        resp = self.client.get("/api/v1/students")
+        self.assertEqual(resp.status_code, 401)
+
+    def test_students_sort_and_fields(self):
+        """Test sorting, field selection and the total count"""
+        resp = self.get("/api/v1/students?sort_by=marks&sort_order=desc&fields=roll_no,marks")
+        self.assertEqual(resp.status_code, 200)
+        body = resp.get_json()
+        self.assertEqual(body["total"], 3)
+        self.assertEqual(body["data"][0], {"roll_no": "API-001", "marks": 90})
+
+    def test_students_pagination(self):
+        """Test following next_cursor through all students"""
+        body = self.get("/api/v1/students?per_page=2").get_json()
+        self.assertEqual(len(body["data"]), 2)
+        self.assertIsNotNone(body["next_cursor"])
+
+        body = self.get(f"/api/v1/students?per_page=2&after={body['next_cursor']}").get_json()
+        self.assertEqual([s["roll_no"] for s in body["data"]], ["API-002"])
+        self.assertIsNone(body["next_cursor"])
+
+    def test_unknown_field(self):
+        """Test that an unknown field is a 400 error"""
+        resp = self.get("/api/v1/students?fields=name,password")
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("password", resp.get_json()["error"])
+
+    def test_student_not_found(self):
+        """Test 404 for a missing student"""
+        resp = self.get("/api/v1/students/9999")
+        self.assertEqual(resp.status_code, 404)
+
+    def test_classes(self):
+        """Test the classes list with student counts"""
+        body = self.get("/api/v1/classes?sort_by=students&sort_order=desc").get_json()
+        self.assertEqual(body["data"][0]["id"], self.class_id)
+        self.assertEqual(body["data"][0]["student_count"], 3)
+
+    def test_class_leaderboard(self):
+        """Test the top students of a class with their ranks"""
+        body = self.get(f"/api/v1/classes/{self.class_id}/leaderboard?limit=2").get_json()
+        self.assertEqual([row["roll_no"] for row in body["data"]], ["API-001", "API-002"])
+        self.assertEqual([row["class_rank"] for row in body["data"]], [1, 2])
+
+        resp = self.get("/api/v1/classes/99999/leaderboard")
+        self.assertEqual(resp.status_code, 404)
+
+    def test_analytics(self):
+        """Test the analytics summary"""
+        body = self.get("/api/v1/analytics").get_json()
+        self.assertEqual(body["summary"]["total"], 3)
+        self.assertEqual(body["top_performers"][0]["roll_no"], "API-001")
+
+    def test_etag_not_modified(self):
+        """Test that an unchanged resource returns 304 and a change returns new data"""
+        resp = self.get("/api/v1/students")
+        etag = resp.headers["ETag"]
+        self.assertFalse(etag.startswith("W/"))
+
+        resp = self.get("/api/v1/students", **{"If-None-Match": etag})
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp.data, b"")
+
+        conn = get_db_connection()
+        conn.execute("UPDATE students SET marks = 10 WHERE roll_no = 'API-000'")
+        conn.commit()
+        conn.close()
+
+        resp = self.get("/api/v1/students", **{"If-None-Match": etag})
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp.headers["ETag"], etag)
+
+    def test_etag_depends_on_query(self):
+        """Test that different parameters give different ETags"""
+        first = self.get("/api/v1/students?sort_by=name").headers["ETag"]
+        second = self.get("/api/v1/students?sort_by=marks").headers["ETag"]
+        self.assertNotEqual(first, second)
+
+
+    def test_jobs(self):
+        """Test submitting an analytics job and polling it until it is done"""
+        headers = {"Authorization": f"Bearer {self.token}"}
+        resp = self.client.post("/api/v1/jobs", json={"kind": "analytics"}, headers=headers)
+        self.assertEqual(resp.status_code, 202)
+        location = resp.headers["Location"]
+
+        deadline = time.monotonic() + 10
+        while resp.get_json()["status"] not in ("done", "failed") and time.monotonic() < deadline:
+            time.sleep(0.01)
+            resp = self.get(location)
+        self.assertEqual(resp.get_json()["status"], "done")
+        self.assertEqual(resp.get_json()["result"]["summary"]["total"], 3)
+
+        resp = self.client.post(f"{location}/cancel", headers=headers)
+        self.assertEqual(resp.status_code, 409)
+        self.assertEqual(self.get("/api/v1/jobs/999").status_code, 404)
+        resp = self.client.post("/api/v1/jobs", json={"kind": "import-students"}, headers=headers)
+        self.assertEqual(resp.status_code, 400)
+
+
+    def test_record_attendance(self):
+        """Test marking a class and sending single events"""
+        headers = {"Authorization": f"Bearer {self.token}"}
+        conn = get_db_connection()
+        student_ids = [row[0] for row in conn.execute("SELECT id FROM students WHERE roll_no LIKE 'API-%' ORDER BY id")]
+        conn.close()
+
+        resp = self.client.post("/api/v1/attendance", headers=headers,
+                                json={"class_id": self.class_id, "day": "2024-09-02", "absent": [student_ids[0]]})
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(resp.get_json()["recorded"], 3)
+
+        resp = self.client.post("/api/v1/attendance", headers=headers, json={"events": [
+            {"student_id": student_ids[0], "day": "2024-09-03", "present": True},
+        ]})
+        self.assertEqual(resp.get_json()["recorded"], 1)
+
+        resp = self.client.post("/api/v1/attendance", headers=headers,
+                                json={"events": [{"student_id": student_ids[0], "day": "yesterday"}]})
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(self.client.post("/api/v1/attendance", headers=headers, json={}).status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -1,9 +1,14 @@
+import gzip
+import io
+import json
 import os
 import sqlite3
 import tempfile
+import time
 import unittest
 
 from backend.app import app, init_db, set_database_path
+from backend.reports import configure_reports
 
 
 class TestIntegrationRoutes(unittest.TestCase):
@@ -88,6 +93,67 @@ class TestIntegrationRoutes(unittest.TestCase):
         self.assertEqual(resp.status_code, 200)
         self.assertIn(b"Dashboard", resp.data)
 
+    def test_dashboard_updates_after_adding_student(self):
+        """Test that the cached dashboard is recomputed after a write"""
+        self.login()
+        self.client.get("/dashboard")
+
+        self.client.post(
+            "/add-student",
+            data={
+                "name": "Cache Test",
+                "roll_no": "CACHE-001",
+                "class_id": str(self.class_id),
+                "subjects": "Math",
+                "marks": "77",
+                "attendance": "66",
+            },
+        )
+
+        resp = self.client.get("/dashboard")
+        self.assertIn(b"77.0%", resp.data)
+        self.assertIn(b"66.0%", resp.data)
+
+    def test_dashboard_json(self):
+        """Test the JSON variant of the dashboard numbers"""
+        self.login()
+        for i, marks in enumerate([60, 90]):
+            self.client.post(
+                "/add-student",
+                data={
+                    "name": f"Json {i}",
+                    "roll_no": f"JSON-{i:03d}",
+                    "class_id": str(self.class_id),
+                    "subjects": "Math",
+                    "marks": str(marks),
+                    "attendance": "80",
+                },
+            )
+
+        resp = self.client.get("/dashboard.json")
+        self.assertEqual(resp.status_code, 200)
+        data = resp.get_json()
+        self.assertEqual(data["total_students"], 2)
+        self.assertEqual(data["avg_marks"], 75)
+        self.assertEqual(data["avg_attendance"], 80)
+        self.assertGreaterEqual(data["class_count"], 6)
+
+    def test_dashboard_json_requires_login(self):
+        """Test that the JSON dashboard is protected"""
+        resp = self.client.get("/dashboard.json", follow_redirects=False)
+        self.assertEqual(resp.status_code, 302)
+
+    def test_cache_stats(self):
+        """Test that cache and pool metrics are exposed"""
+        self.login()
+        self.client.get("/analytics")
+        self.client.get("/analytics")
+
+        resp = self.client.get("/cache-stats")
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn("hit_ratio", resp.get_json()["cache"])
+        self.assertIn("hits", resp.get_json()["pool"])
+
     # ===== Student CRUD Tests =====
     def test_add_student_happy_path(self):
         """Test successfully adding a student"""
@@ -265,6 +331,144 @@ class TestIntegrationRoutes(unittest.TestCase):
         resp = self.client.get("/view-students?search=SearchMe")
         self.assertEqual(resp.status_code, 200)
 
+    def test_view_students_search_by_prefix(self):
+        """Test that search matches word prefixes and sorts by relevance"""
+        self.login()
+
+        for name, roll_no in [("Priya Sharma", "PS-001"), ("Sharmila Rao", "SR-002"), ("Tom Reed", "TR-003")]:
+            self.client.post(
+                "/add-student",
+                data={
+                    "name": name,
+                    "roll_no": roll_no,
+                    "class_id": str(self.class_id),
+                    "subjects": "Math",
+                    "marks": "70",
+                    "attendance": "80",
+                },
+            )
+
+        resp = self.client.get("/view-students?search=sharm")
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn(b"Priya Sharma", resp.data)
+        self.assertIn(b"Sharmila Rao", resp.data)
+        self.assertNotIn(b"Tom Reed", resp.data)
+        self.assertIn(b'value="relevance" selected', resp.data)
+
+    def test_view_students_is_paginated(self):
+        """Test that view students shows one page with a next page link"""
+        self.login()
+
+        conn = sqlite3.connect(self.db_path)
+        for i in range(7):
+            conn.execute(
+                'INSERT INTO students (name, roll_no, class_id, subjects, marks, attendance) VALUES (?, ?, ?, ?, ?, ?)',
+                (f'Paged {i}', f'PAGE-{i:03d}', self.class_id, 'Math', 70, 80)
+            )
+        conn.commit()
+        conn.close()
+
+        resp = self.client.get("/view-students?per_page=5")
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn(b"PAGE-004", resp.data)
+        self.assertNotIn(b"PAGE-005", resp.data)
+        self.assertIn(b"after=", resp.data)
+
+    def test_view_students_all_is_streamed(self):
+        """Test that all=1 streams every matching student in sort order"""
+        self.login()
+
+        conn = sqlite3.connect(self.db_path)
+        for i in range(7):
+            conn.execute(
+                'INSERT INTO students (name, roll_no, class_id, subjects, marks, attendance) VALUES (?, ?, ?, ?, ?, ?)',
+                (f'Streamed {i}', f'STREAM-{i:03d}', self.class_id, 'Math', 70, 80)
+            )
+        conn.commit()
+        conn.close()
+
+        resp = self.client.get("/view-students?all=1&per_page=5&sort_by=roll_no&sort_order=desc")
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.is_streamed)
+        html = resp.get_data(as_text=True)
+        positions = [html.index(f"STREAM-{i:03d}") for i in reversed(range(7))]
+        self.assertEqual(positions, sorted(positions))
+        self.assertIn("Show pages", html)
+        self.assertNotIn("after=", html)
+
+    def test_streamed_page_flash_is_shown_once(self):
+        """Test that a flash message shown on a streamed page is removed from the session"""
+        self.login()
+        self.client.post(
+            "/add-student",
+            data={
+                "name": "Flash Student",
+                "roll_no": "FLASH-001",
+                "class_id": str(self.class_id),
+                "subjects": "Math",
+                "marks": "80",
+                "attendance": "90",
+            },
+        )
+
+        resp = self.client.get("/view-students?all=1")
+        self.assertIn(b"Student added successfully!", resp.data)
+        resp = self.client.get("/view-students?all=1")
+        self.assertNotIn(b"Student added successfully!", resp.data)
+
+    def test_rankings_are_shown(self):
+        """Test that view students and edit student show class and school ranks"""
+        self.login()
+
+        conn = sqlite3.connect(self.db_path)
+        for i, marks in enumerate([60, 95, 80]):
+            conn.execute(
+                'INSERT INTO students (name, roll_no, class_id, subjects, marks, attendance) VALUES (?, ?, ?, ?, ?, ?)',
+                (f'Ranked {i}', f'RANKED-{i}', self.class_id, 'Math', marks, 80)
+            )
+        conn.commit()
+        student_id = conn.execute("SELECT id FROM students WHERE roll_no = 'RANKED-2'").fetchone()[0]
+        conn.close()
+
+        resp = self.client.get("/view-students?sort_by=marks&sort_order=desc")
+        self.assertIn("Class #1/3 · School #1 · P100", resp.get_data(as_text=True))
+
+        resp = self.client.get(f"/edit-student/{student_id}")
+        self.assertIn(b"#2 of 3", resp.data)
+
+    def test_class_leaderboard(self):
+        """Test the class leaderboard page"""
+        self.login()
+
+        conn = sqlite3.connect(self.db_path)
+        for i, marks in enumerate([60, 95, 95, 80]):
+            conn.execute(
+                'INSERT INTO students (name, roll_no, class_id, subjects, marks, attendance) VALUES (?, ?, ?, ?, ?, ?)',
+                (f'Leader {i}', f'LEAD-{i}', self.class_id, 'Math', marks, 80 + i)
+            )
+        conn.commit()
+        conn.close()
+
+        resp = self.client.get(f"/classes/{self.class_id}/leaderboard?limit=3")
+        self.assertEqual(resp.status_code, 200)
+        html = resp.get_data(as_text=True)
+        self.assertLess(html.index("LEAD-2"), html.index("LEAD-1"))
+        self.assertLess(html.index("LEAD-1"), html.index("LEAD-3"))
+        self.assertNotIn("LEAD-0", html)
+        self.assertEqual(html.count("#1<"), 2)
+        self.assertIn("#3<", html)
+
+        resp = self.client.get("/classes/99999/leaderboard", follow_redirects=True)
+        self.assertIn(b"Class not found", resp.data)
+
+    def test_classes_are_paginated(self):
+        """Test that the classes list can be paged by student count"""
+        self.login()
+
+        resp = self.client.get("/classes?sort_by=students&sort_order=desc&per_page=2")
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn(b"after=", resp.data)
+
     def test_edit_student(self):
         """Test editing a student"""
         self.login()
@@ -344,6 +548,51 @@ class TestIntegrationRoutes(unittest.TestCase):
 
         self.assertIsNone(deleted)
 
+    def test_filter_students_by_subject(self):
+        """Test that add and edit keep the subject filter up to date"""
+        self.login()
+        for roll_no, subjects in [("SUBJ-001", "Math, Physics"), ("SUBJ-002", "Art")]:
+            self.client.post(
+                "/add-student",
+                data={
+                    "name": f"Student {roll_no}",
+                    "roll_no": roll_no,
+                    "class_id": str(self.class_id),
+                    "subjects": subjects,
+                    "marks": "75",
+                    "attendance": "80",
+                },
+            )
+
+        conn = sqlite3.connect(self.db_path)
+        physics_id = conn.execute("SELECT id FROM subjects WHERE name = 'physics'").fetchone()[0]
+        student_id = conn.execute("SELECT id FROM students WHERE roll_no = 'SUBJ-002'").fetchone()[0]
+        conn.close()
+
+        resp = self.client.get(f"/view-students?subject={physics_id}")
+        self.assertIn(b"SUBJ-001", resp.data)
+        self.assertNotIn(b"SUBJ-002", resp.data)
+
+        self.client.post(
+            f"/edit-student/{student_id}",
+            data={
+                "name": "Student SUBJ-002",
+                "roll_no": "SUBJ-002",
+                "class_id": str(self.class_id),
+                "subjects": "Art, Physics",
+                "marks": "75",
+                "attendance": "80",
+            },
+        )
+        resp = self.client.get(f"/view-students?subject={physics_id}")
+        self.assertIn(b"SUBJ-002", resp.data)
+
+        # A subject that is not an id is ignored rather than failing
+        for url in ("/view-students?subject=abc", "/export/students.csv?subject=abc"):
+            resp = self.client.get(url)
+            self.assertEqual(resp.status_code, 200)
+            self.assertIn(b"SUBJ-001", resp.data)
+
     # ===== Class CRUD Tests =====
     def test_view_classes(self):
         """Test viewing classes list"""
@@ -455,6 +704,191 @@ class TestIntegrationRoutes(unittest.TestCase):
 
         resp = self.client.get("/analytics")
         self.assertEqual(resp.status_code, 200)
+        self.assertIn(b"Statistical Insights", resp.data)
+
+    def test_analytics_shows_report_freshness(self):
+        """Test that analytics show how old the report data is"""
+        self.login()
+        resp = self.client.get("/analytics")
+        self.assertIn(b"Live report data", resp.data)
+
+        configure_reports('backup', max_staleness=3600)
+        try:
+            self.client.get("/analytics")
+            self.client.post(
+                "/add-student",
+                data={
+                    "name": "Not In Copy",
+                    "roll_no": "COPY-001",
+                    "class_id": str(self.class_id),
+                    "subjects": "Math",
+                    "marks": "10",
+                    "attendance": "10",
+                },
+            )
+            resp = self.client.get("/analytics")
+        finally:
+            configure_reports()
+        self.assertIn(b"Report data from a copy", resp.data)
+        self.assertNotIn(b"Not In Copy", resp.data)
+        self.assertIn(b"Not In Copy", self.client.get("/analytics").data)
+
+
+    def test_class_attendance(self):
+        """Test marking a class's attendance for a day"""
+        self.login()
+        conn = sqlite3.connect(self.db_path)
+        conn.executemany(
+            "INSERT INTO students (name, roll_no, class_id, subjects, marks, attendance) VALUES (?, ?, ?, ?, ?, ?)",
+            [(f"Daily {i}", f"DAY-{i}", self.class_id, "Math", 70, 80) for i in range(2)]
+        )
+        conn.commit()
+        present_id, absent_id = [row[0] for row in conn.execute("SELECT id FROM students WHERE roll_no LIKE 'DAY-%' ORDER BY id")]
+        conn.close()
+
+        resp = self.client.post(f"/classes/{self.class_id}/attendance",
+                                data={"day": "2024-09-02", "present": [str(present_id)]})
+        self.assertEqual(resp.status_code, 302)
+        self.assertIn("day=2024-09-02", resp.headers["Location"])
+
+        resp = self.client.get(f"/classes/{self.class_id}/attendance?day=2024-09-02")
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn(b"Absent", resp.data)
+        self.assertIn(b"2024-09-02", resp.data)
+
+        conn = sqlite3.connect(self.db_path)
+        marks = dict(conn.execute("SELECT student_id, present FROM attendance_days WHERE day = '2024-09-02'"))
+        conn.close()
+        self.assertEqual(marks[present_id], 1)
+        self.assertEqual(marks[absent_id], 0)
+
+        resp = self.client.get(f"/classes/{self.class_id}/attendance?day=not-a-day")
+        self.assertEqual(resp.status_code, 302)
+        resp = self.client.get("/classes/99999/attendance")
+        self.assertEqual(resp.status_code, 302)
+
+    # ===== Import Tests =====
+
+    def test_import_students_in_background(self):
+        """Test that a background import shows up on the jobs page"""
+        self.login()
+        conn = sqlite3.connect(self.db_path)
+        class_name = conn.execute("SELECT name FROM classes WHERE id = ?", (self.class_id,)).fetchone()[0]
+        conn.close()
+        data = (
+            "name,roll_no,class,subjects,marks,attendance\n"
+            f"Background One,BG-001,{class_name},Math,80,90\n"
+        ).encode("utf-8")
+        resp = self.client.post(
+            "/import-students",
+            data={"file": (io.BytesIO(data), "students.csv"), "background": "1"},
+            content_type="multipart/form-data",
+        )
+        self.assertEqual(resp.status_code, 302)
+        self.assertIn("/jobs", resp.headers["Location"])
+        self.assertIn(b"import-students", self.client.get("/jobs").data)
+
+        conn = sqlite3.connect(self.db_path)
+        job_id = conn.execute("SELECT MAX(id) FROM jobs").fetchone()[0]
+        conn.close()
+        deadline = time.monotonic() + 10
+        job = self.client.get(f"/jobs/{job_id}").get_json()
+        while job["status"] not in ("done", "failed") and time.monotonic() < deadline:
+            time.sleep(0.01)
+            job = self.client.get(f"/jobs/{job_id}").get_json()
+        self.assertEqual(job["result"]["inserted"], 1)
+
+    def test_import_students_upload(self):
+        """Test uploading a CSV file on the import page"""
+        self.login()
+        data = (
+            "name,roll_no,class,subjects,marks,attendance\n"
+            "Imported One,IMPORT-001,Grade 10-A,Math,80,90\n"
+            "Imported Two,IMPORT-002,Grade 10-A,Math,abc,90\n"
+        ).encode("utf-8")
+        resp = self.client.post(
+            "/import-students",
+            data={"file": (io.BytesIO(data), "students.csv")},
+            content_type="multipart/form-data",
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn(b"Import Result", resp.data)
+        self.assertIn(b"Marks and attendance must be numbers", resp.data)
+
+        resp = self.client.get("/view-students?search=IMPORT")
+        self.assertIn(b"Imported One", resp.data)
+        self.assertNotIn(b"Imported Two", resp.data)
+
+    def test_import_students_requires_login(self):
+        """Test that the import page requires authentication"""
+        resp = self.client.get("/import-students", follow_redirects=False)
+        self.assertEqual(resp.status_code, 302)
+
+
+    # ===== Export Tests =====
+
+    def add_export_students(self):
+        for i, marks in enumerate([70, 90, 80]):
+            self.client.post(
+                "/add-student",
+                data={
+                    "name": f"Export Student {i}",
+                    "roll_no": f"EXPORT-{i:03d}",
+                    "class_id": str(self.class_id),
+                    "subjects": "Math",
+                    "marks": str(marks),
+                    "attendance": "85",
+                },
+            )
+
+    def test_export_students_csv(self):
+        """Test that the CSV export follows the sort of the students list"""
+        self.login()
+        self.add_export_students()
+        resp = self.client.get("/export/students.csv?sort_by=marks&sort_order=desc")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.mimetype, "text/csv")
+        self.assertIn("attachment", resp.headers["Content-Disposition"])
+
+        lines = resp.get_data(as_text=True).splitlines()
+        self.assertEqual(lines[0], "id,name,roll_no,class_name,subjects,marks,attendance")
+        self.assertEqual([line.split(",")[2] for line in lines[1:]], ["EXPORT-001", "EXPORT-002", "EXPORT-000"])
+
+    def test_export_students_ndjson_with_search(self):
+        """Test NDJSON export with a search filter"""
+        self.login()
+        self.add_export_students()
+        resp = self.client.get("/export/students.ndjson?search=EXPORT-002")
+        self.assertEqual(resp.mimetype, "application/x-ndjson")
+
+        rows = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["roll_no"], "EXPORT-002")
+        self.assertEqual(rows[0]["marks"], 80)
+
+    def test_export_gzip(self):
+        """Test that the export is compressed when the client accepts gzip"""
+        self.login()
+        self.add_export_students()
+        resp = self.client.get("/export/students.csv", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(resp.headers["Content-Encoding"], "gzip")
+        text = gzip.decompress(resp.data).decode("utf-8")
+        self.assertIn("EXPORT-000", text)
+
+    def test_export_class_stats(self):
+        """Test the per-class statistics export"""
+        self.login()
+        self.add_export_students()
+        resp = self.client.get("/export/class-stats.ndjson")
+        rows = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+        counts = {row["name"]: row["student_count"] for row in rows}
+        self.assertEqual(sum(counts.values()), 3)
+        self.assertEqual(max(row["max_marks"] or 0 for row in rows), 90)
+
+    def test_export_requires_login(self):
+        """Test that exports require authentication"""
+        resp = self.client.get("/export/students.csv", follow_redirects=False)
+        self.assertEqual(resp.status_code, 302)
 
 
 if __name__ == "__main__":
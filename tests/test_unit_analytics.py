@@ -0,0 +1,101 @@
+import os
+import random
+import tempfile
+import unittest
+
+from backend.analytics import compute_analytics, get_summary
+from backend.app import init_db, set_database_path
+from backend.db import get_db_connection
+
+
+def reference_analytics(students):
+    """The per-bucket Python loops the analytics route used to run"""
+    return {
+        'performance_ranges': {
+            '90-100': len([s for s in students if s['marks'] >= 90]),
+            '80-89': len([s for s in students if 80 <= s['marks'] < 90]),
+            '70-79': len([s for s in students if 70 <= s['marks'] < 80]),
+            '60-69': len([s for s in students if 60 <= s['marks'] < 70]),
+            '50-59': len([s for s in students if 50 <= s['marks'] < 60]),
+            'Below 50': len([s for s in students if s['marks'] < 50])
+        },
+        'attendance_ranges': {
+            '90-100': len([s for s in students if s['attendance'] >= 90]),
+            '80-89': len([s for s in students if 80 <= s['attendance'] < 90]),
+            '70-79': len([s for s in students if 70 <= s['attendance'] < 80]),
+            '60-69': len([s for s in students if 60 <= s['attendance'] < 70]),
+            'Below 60': len([s for s in students if s['attendance'] < 60])
+        },
+        'top_performers': students[:5],
+        'students_attention': [s for s in students if s['marks'] < 50 or s['attendance'] < 60],
+    }
+
+
+class TestAnalytics(unittest.TestCase):
+    """Tests that SQL aggregation matches the old Python computation"""
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self._tmpdir.name, "test_database.db")
+        set_database_path(self.db_path)
+        init_db()
+
+        self.conn = get_db_connection()
+        class_ids = [row[0] for row in self.conn.execute("SELECT id FROM classes")]
+        rng = random.Random(7)
+        for i in range(300):
+            self.conn.execute(
+                'INSERT INTO students (name, roll_no, class_id, subjects, marks, attendance) VALUES (?, ?, ?, ?, ?, ?)',
+                (f'Student {i}', f'AN-{i:04d}', rng.choice(class_ids), 'Math', rng.randint(0, 100), rng.randint(0, 100))
+            )
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+        self._tmpdir.cleanup()
+
+    def test_matches_reference_computation(self):
+        """Test that every number equals the old route's numbers"""
+        students = self.conn.execute('''
+            SELECT s.*, c.name as class_name
+            FROM students s
+            JOIN classes c ON s.class_id = c.id
+            ORDER BY s.marks DESC
+        ''').fetchall()
+        expected = reference_analytics(students)
+        data = compute_analytics(self.conn)
+        summary = data['summary']
+
+        self.assertEqual(summary['total'], len(students))
+        self.assertAlmostEqual(summary['avg_marks'], sum(s['marks'] for s in students) / len(students))
+        self.assertAlmostEqual(summary['avg_attendance'], sum(s['attendance'] for s in students) / len(students))
+        self.assertEqual(summary['attention_count'], len(expected['students_attention']))
+        self.assertEqual(summary['performance_ranges'], expected['performance_ranges'])
+        self.assertEqual(summary['attendance_ranges'], expected['attendance_ranges'])
+        self.assertEqual(list(summary['performance_ranges']), list(expected['performance_ranges']))
+        self.assertEqual([s['marks'] for s in data['top_performers']],
+                         [s['marks'] for s in expected['top_performers']])
+        self.assertEqual(sorted(s['id'] for s in data['students_attention']),
+                         sorted(s['id'] for s in expected['students_attention']))
+
+    def test_custom_buckets(self):
+        """Test that bucket boundaries can be configured"""
+        buckets = [('Pass', 40, None), ('Fail', None, 39)]
+        summary = get_summary(self.conn, marks_buckets=buckets)
+        passed = self.conn.execute('SELECT COUNT(*) FROM students WHERE marks >= 40').fetchone()[0]
+
+        self.assertEqual(summary['performance_ranges'], {'Pass': passed, 'Fail': 300 - passed})
+
+    def test_empty_database(self):
+        """Test that analytics work with no students"""
+        self.conn.execute('DELETE FROM students')
+        self.conn.commit()
+        summary = get_summary(self.conn)
+
+        self.assertEqual(summary['total'], 0)
+        self.assertEqual(summary['avg_marks'], 0)
+        self.assertEqual(set(summary['performance_ranges'].values()), {0})
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,181 @@
+import os
+import random
+import tempfile
+import time
+import unittest
+
+from backend.analytics import get_summary
+from backend.app import init_db, set_database_path
+from backend.attendance import (find_attendance_drift, get_class_day, get_class_days, mark_class, parse_day,
+                                rebuild_attendance_rollups, record_events, update_student_attendance)
+from backend.db import get_data_generation, get_db_connection
+from backend.jobs import get_job, submit_job
+
+
+class TestAttendance(unittest.TestCase):
+    """Tests that the triggers keep the attendance rollups equal to a full recompute"""
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        set_database_path(os.path.join(self._tmpdir.name, "test_database.db"))
+        init_db()
+
+        self.conn = get_db_connection()
+        self.class_ids = [row[0] for row in self.conn.execute("SELECT id FROM classes ORDER BY id")]
+        self.conn.execute('DELETE FROM students')
+        for i in range(6):
+            self.conn.execute(
+                'INSERT INTO students (name, roll_no, class_id, subjects, marks, attendance) VALUES (?, ?, ?, ?, ?, ?)',
+                (f'Student {i}', f'AT-{i}', self.class_ids[i % 2], 'Math', 60, 50)
+            )
+        self.conn.commit()
+        self.students = self.class_students(self.class_ids[0])
+
+    def tearDown(self):
+        self.conn.close()
+        self._tmpdir.cleanup()
+
+    def class_students(self, class_id):
+        return [row[0] for row in self.conn.execute('SELECT id FROM students WHERE class_id = ? ORDER BY id', (class_id,))]
+
+    def totals(self, student_id):
+        return tuple(self.conn.execute('SELECT days_recorded, days_present FROM attendance_students WHERE student_id = ?',
+                                       (student_id,)).fetchone())
+
+    def test_mark_class(self):
+        """Test marking a whole class with one absentee"""
+        marked = mark_class(self.conn, self.class_ids[0], '2024-09-02', absent_ids=[self.students[0]])
+        self.conn.commit()
+
+        self.assertEqual(marked, 3)
+        self.assertEqual(self.totals(self.students[0]), (1, 0))
+        self.assertEqual(self.totals(self.students[1]), (1, 1))
+        day = get_class_days(self.conn, self.class_ids[0])[0]
+        self.assertEqual((day['day'], day['students_recorded'], day['students_present']), ('2024-09-02', 3, 2))
+        marks = {row['id']: row['present'] for row in get_class_day(self.conn, self.class_ids[0], '2024-09-02')}
+        self.assertEqual(marks[self.students[0]], 0)
+        self.assertEqual(get_class_day(self.conn, self.class_ids[0], '2024-09-03')[0]['present'], None)
+
+    def test_mark_class_with_present_ids(self):
+        """Test that students not listed as present are marked absent"""
+        mark_class(self.conn, self.class_ids[0], '2024-09-02', present_ids=[self.students[1]])
+        self.conn.commit()
+
+        marks = {row['id']: row['present'] for row in get_class_day(self.conn, self.class_ids[0], '2024-09-02')}
+        self.assertEqual(marks, {self.students[0]: 0, self.students[1]: 1, self.students[2]: 0})
+
+    def test_marking_a_day_again_corrects_it(self):
+        """Test that a second mark for the same day replaces the first"""
+        mark_class(self.conn, self.class_ids[0], '2024-09-02', absent_ids=[self.students[0]])
+        mark_class(self.conn, self.class_ids[0], '2024-09-02')
+        self.conn.commit()
+
+        self.assertEqual(self.conn.execute('SELECT COUNT(*) FROM attendance_events').fetchone()[0], 6)
+        self.assertEqual(self.totals(self.students[0]), (1, 1))
+        self.assertEqual(get_class_days(self.conn, self.class_ids[0])[0]['students_present'], 3)
+        self.assertEqual(find_attendance_drift(self.conn), [])
+
+    def test_random_events_match_rebuild(self):
+        """Test that the rollups equal a recompute from the events"""
+        rng = random.Random(25)
+        all_students = self.class_students(self.class_ids[0]) + self.class_students(self.class_ids[1])
+        days = [f'2024-09-{d:02d}' for d in range(1, 8)]
+        for _ in range(20):
+            record_events(self.conn, [(rng.choice(all_students), rng.choice(days), rng.random() < 0.8)
+                                      for _ in range(10)])
+        # A student changing class keeps their past days with the old class
+        self.conn.execute('UPDATE students SET class_id = ? WHERE id = ?', (self.class_ids[1], all_students[0]))
+        record_events(self.conn, [(all_students[0], days[0], False)])
+        self.conn.execute('DELETE FROM students WHERE id = ?', (all_students[1],))
+        self.conn.commit()
+        self.assertEqual(find_attendance_drift(self.conn), [])
+
+        # Break the rollups and rebuild them from the events
+        self.conn.execute('UPDATE attendance_students SET days_present = days_present + 1')
+        self.conn.commit()
+        self.assertNotEqual(find_attendance_drift(self.conn), [])
+        rebuild_attendance_rollups(self.conn)
+        self.conn.commit()
+        self.assertEqual(find_attendance_drift(self.conn), [])
+
+    def test_unknown_students_are_skipped(self):
+        """Test that events for a missing student are not recorded"""
+        self.assertEqual(record_events(self.conn, [(self.students[0], '2024-09-02', True), (999999, '2024-09-02', True)]), 1)
+
+    def test_events_move_the_data_generation(self):
+        """Test that cached analytics are recomputed after marking a day"""
+        before = get_data_generation(self.conn)
+        mark_class(self.conn, self.class_ids[0], '2024-09-02')
+        self.conn.commit()
+        self.assertNotEqual(get_data_generation(self.conn), before)
+
+    def test_summary_buckets_read_rollups(self):
+        """Test that students are bucketed by recorded days where they have any, else by typed-in attendance"""
+        buckets = [('low', 0, 74), ('high', 75, 100)]
+        self.assertEqual(get_summary(self.conn, attendance_buckets=buckets)['attendance_ranges'],
+                         {'low': 6, 'high': 0})
+
+        for day in ('2024-09-02', '2024-09-03', '2024-09-04', '2024-09-05'):
+            absent = [self.students[0]] if day != '2024-09-02' else []
+            mark_class(self.conn, self.class_ids[0], day, absent_ids=absent)
+        self.conn.commit()
+
+        # Recorded days for three students (25%, 100%, 100%), typed-in 50% for the others
+        self.assertEqual(get_summary(self.conn, attendance_buckets=buckets)['attendance_ranges'],
+                         {'low': 4, 'high': 2})
+
+        # Editing, recomputing or deleting a student keeps every student counted once
+        self.conn.execute('UPDATE students SET attendance = 90 WHERE id = ?', (self.students[1],))
+        update_student_attendance(self.conn)
+        self.conn.execute('DELETE FROM students WHERE id = ?', (self.students[2],))
+        self.conn.execute('DELETE FROM students WHERE id = ?', (self.class_students(self.class_ids[1])[0],))
+        self.conn.commit()
+        summary = get_summary(self.conn, attendance_buckets=buckets)
+        self.assertEqual(summary['attendance_ranges'], {'low': 3, 'high': 1})
+        self.assertEqual(sum(summary['attendance_ranges'].values()), summary['total'])
+        self.assertEqual(find_attendance_drift(self.conn), [])
+
+    def test_update_student_attendance(self):
+        """Test copying the rollup percentages into students.attendance in batches"""
+        for day, absent in (('2024-09-02', [self.students[0]]), ('2024-09-03', []), ('2024-09-04', [])):
+            mark_class(self.conn, self.class_ids[0], day, absent_ids=absent)
+        self.conn.commit()
+
+        last_id, count, changed = update_student_attendance(self.conn, 0, limit=2)
+        self.assertEqual((last_id, count, changed), (self.students[1], 2, 2))
+        self.assertEqual(update_student_attendance(self.conn, last_id, limit=2)[1:], (1, 1))
+        self.assertIsNone(update_student_attendance(self.conn, self.students[2], limit=2))
+        self.conn.commit()
+
+        attendance = dict(self.conn.execute('SELECT id, attendance FROM students'))
+        self.assertEqual(attendance[self.students[0]], 67)
+        self.assertEqual(attendance[self.students[1]], 100)
+        # Students with no recorded days keep their typed-in attendance
+        self.assertEqual(attendance[self.class_students(self.class_ids[1])[0]], 50)
+
+    def test_recompute_job(self):
+        """Test the recompute-attendance background job"""
+        mark_class(self.conn, self.class_ids[0], '2024-09-02', absent_ids=[self.students[0]])
+        self.conn.commit()
+
+        job_id = submit_job('recompute-attendance')
+        deadline = time.monotonic() + 10
+        while get_job(self.conn, job_id)['status'] not in ('done', 'failed') and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        job = get_job(self.conn, job_id)
+        self.assertEqual(job['status'], 'done')
+        self.assertEqual(job['result'], {'students': 3, 'updated': 3})
+        self.assertEqual(self.conn.execute('SELECT attendance FROM students WHERE id = ?',
+                                           (self.students[0],)).fetchone()[0], 0)
+
+    def test_parse_day(self):
+        """Test day validation"""
+        self.assertEqual(parse_day('2024-09-02'), '2024-09-02')
+        self.assertEqual(len(parse_day('')), 10)
+        with self.assertRaises(ValueError):
+            parse_day('02/09/2024')
+
+
+if __name__ == '__main__':
+    unittest.main()
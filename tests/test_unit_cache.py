@@ -0,0 +1,135 @@
+import os
+import tempfile
+import time
+import unittest
+
+from backend import cache
+from backend.app import init_db, set_database_path
+from backend.cache import DiskCache, MemoryCache, cached, configure_cache, get_cache_stats
+from backend.db import get_data_generation, get_db_connection
+
+
+class TestCacheBackends(unittest.TestCase):
+    """Tests for the memory and disk cache backends"""
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    def test_memory_cache_evicts_least_recently_used(self):
+        """Test that the oldest unused entry is dropped first"""
+        backend = MemoryCache(max_entries=2)
+        backend.set('a', 1)
+        backend.set('b', 2)
+        backend.get('a')
+        backend.set('c', 3)
+
+        self.assertEqual(backend.get('a'), (True, 1))
+        self.assertEqual(backend.get('b'), (False, None))
+        self.assertEqual(backend.get('c'), (True, 3))
+
+    def test_memory_cache_ttl(self):
+        """Test that expired entries are misses"""
+        backend = MemoryCache(ttl=0.01)
+        backend.set('a', 1)
+        time.sleep(0.02)
+        self.assertEqual(backend.get('a'), (False, None))
+
+    def test_disk_cache_is_shared(self):
+        """Test that two disk caches on the same file see each other's entries"""
+        path = os.path.join(self._tmpdir.name, 'cache.db')
+        first = DiskCache(path=path)
+        second = DiskCache(path=path)
+        first.set('analytics', {'total': 3})
+
+        self.assertEqual(second.get('analytics'), (True, {'total': 3}))
+
+    def test_disk_cache_limits_entries(self):
+        """Test that the disk cache keeps at most max_entries"""
+        backend = DiskCache(path=os.path.join(self._tmpdir.name, 'cache.db'), max_entries=3)
+        for i in range(5):
+            backend.set(f'k{i}', i)
+
+        self.assertEqual(backend.get('k0'), (False, None))
+        self.assertEqual(backend.get('k4'), (True, 4))
+
+
+class TestVersionedCache(unittest.TestCase):
+    """Tests that cached results follow the data generation"""
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        set_database_path(os.path.join(self._tmpdir.name, "test_database.db"))
+        init_db()
+        configure_cache(MemoryCache())
+        self.conn = get_db_connection()
+        self.class_id = self.conn.execute("SELECT id FROM classes ORDER BY id LIMIT 1").fetchone()[0]
+
+    def tearDown(self):
+        self.conn.close()
+        configure_cache()
+        self._tmpdir.cleanup()
+
+    def count_students(self):
+        self.calls += 1
+        return self.conn.execute('SELECT COUNT(*) FROM students').fetchone()[0]
+
+    def test_writes_bump_generation(self):
+        """Test that inserts, updates and deletes change the generation"""
+        generations = [get_data_generation(self.conn)]
+        self.conn.execute(
+            'INSERT INTO students (name, roll_no, class_id, subjects, marks, attendance) VALUES (?, ?, ?, ?, ?, ?)',
+            ('Gen', 'G-1', self.class_id, 'Math', 80, 90)
+        )
+        self.conn.commit()
+        generations.append(get_data_generation(self.conn))
+        self.conn.execute("UPDATE classes SET description = 'x' WHERE id = ?", (self.class_id,))
+        self.conn.commit()
+        generations.append(get_data_generation(self.conn))
+        self.conn.execute("DELETE FROM students")
+        self.conn.commit()
+        generations.append(get_data_generation(self.conn))
+
+        self.assertEqual(len(set(generations)), 4)
+
+    def test_cached_until_data_changes(self):
+        """Test hits while nothing changes and a recompute after a write"""
+        self.calls = 0
+        before = get_cache_stats()
+
+        self.assertEqual(cached(self.conn, 'count', self.count_students), 0)
+        self.assertEqual(cached(self.conn, 'count', self.count_students), 0)
+        self.assertEqual(self.calls, 1)
+
+        # A write from another connection (like another worker process)
+        other = get_db_connection()
+        other.execute(
+            'INSERT INTO students (name, roll_no, class_id, subjects, marks, attendance) VALUES (?, ?, ?, ?, ?, ?)',
+            ('Other', 'O-1', self.class_id, 'Math', 80, 90)
+        )
+        other.commit()
+        other.close()
+
+        self.assertEqual(cached(self.conn, 'count', self.count_students), 1)
+        self.assertEqual(self.calls, 2)
+
+        after = get_cache_stats()
+        self.assertEqual(after['hits'] - before['hits'], 1)
+        self.assertEqual(after['misses'] - before['misses'], 2)
+        self.assertGreater(after['recompute_seconds'], before['recompute_seconds'])
+
+    def test_configure_disk_backend_by_name(self):
+        """Test switching to the disk backend by name"""
+        configure_cache('disk', path=os.path.join(self._tmpdir.name, 'cache.db'))
+        self.assertIsInstance(cache.get_cache_backend(), DiskCache)
+
+        self.calls = 0
+        cached(self.conn, 'count', self.count_students)
+        cached(self.conn, 'count', self.count_students)
+        self.assertEqual(self.calls, 1)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
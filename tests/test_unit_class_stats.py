@@ -0,0 +1,104 @@
+import os
+import random
+import tempfile
+import unittest
+
+from backend.app import app, init_db, set_database_path
+from backend.class_stats import find_drift, rebuild_class_stats
+from backend.db import get_db_connection
+
+
+class TestClassStats(unittest.TestCase):
+    """Tests that the triggers keep class_stats equal to a full recompute"""
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self._tmpdir.name, "test_database.db")
+        set_database_path(self.db_path)
+        init_db()
+
+        self.conn = get_db_connection()
+        self.class_ids = [row[0] for row in self.conn.execute("SELECT id FROM classes ORDER BY id")]
+
+    def tearDown(self):
+        self.conn.close()
+        self._tmpdir.cleanup()
+
+    def add_student(self, roll_no, class_id, marks, attendance):
+        self.conn.execute(
+            'INSERT INTO students (name, roll_no, class_id, subjects, marks, attendance) VALUES (?, ?, ?, ?, ?, ?)',
+            ('Student', roll_no, class_id, 'Math', marks, attendance)
+        )
+
+    def test_insert_updates_stats(self):
+        """Test count, sums, min and max after inserts"""
+        self.add_student('CS-1', self.class_ids[0], 70, 90)
+        self.add_student('CS-2', self.class_ids[0], 50, 95)
+        self.conn.commit()
+
+        stats = self.conn.execute('SELECT * FROM class_stats WHERE class_id = ?', (self.class_ids[0],)).fetchone()
+        self.assertEqual(stats['student_count'], 2)
+        self.assertEqual(stats['sum_marks'], 120)
+        self.assertEqual(stats['min_marks'], 50)
+        self.assertEqual(stats['max_attendance'], 95)
+
+    def test_delete_recomputes_min_and_max(self):
+        """Test that removing the lowest mark moves the minimum up"""
+        self.add_student('CS-1', self.class_ids[0], 70, 90)
+        self.add_student('CS-2', self.class_ids[0], 50, 95)
+        self.conn.execute("DELETE FROM students WHERE roll_no = 'CS-2'")
+        self.conn.commit()
+
+        stats = self.conn.execute('SELECT * FROM class_stats WHERE class_id = ?', (self.class_ids[0],)).fetchone()
+        self.assertEqual(stats['student_count'], 1)
+        self.assertEqual(stats['min_marks'], 70)
+        self.assertEqual(stats['max_attendance'], 90)
+
+    def test_random_changes_never_drift(self):
+        """Test a random mix of inserts, updates, class moves and deletes"""
+        rng = random.Random(3)
+        for i in range(200):
+            self.add_student(f'R-{i}', rng.choice(self.class_ids), rng.randint(0, 100), rng.randint(0, 100))
+        ids = [row[0] for row in self.conn.execute('SELECT id FROM students')]
+        for student_id in rng.sample(ids, 80):
+            self.conn.execute('UPDATE students SET class_id = ?, marks = ?, attendance = ? WHERE id = ?',
+                              (rng.choice(self.class_ids), rng.randint(0, 100), rng.randint(0, 100), student_id))
+        for student_id in rng.sample(ids, 60):
+            self.conn.execute('DELETE FROM students WHERE id = ?', (student_id,))
+        self.conn.commit()
+
+        self.assertEqual(find_drift(self.conn), [])
+
+    def test_drift_is_reported_and_rebuilt(self):
+        """Test that manual changes show up as drift and rebuild fixes them"""
+        self.add_student('CS-1', self.class_ids[0], 70, 90)
+        self.conn.execute('UPDATE class_stats SET student_count = 5')
+        self.conn.commit()
+
+        drift = find_drift(self.conn)
+        self.assertEqual(len(drift), 1)
+        self.assertEqual(drift[0]['class_id'], self.class_ids[0])
+
+        rebuild_class_stats(self.conn)
+        self.conn.commit()
+        self.assertEqual(find_drift(self.conn), [])
+
+    def test_verify_command(self):
+        """Test the verify and rebuild CLI commands"""
+        self.add_student('CS-1', self.class_ids[0], 70, 90)
+        self.conn.execute('UPDATE class_stats SET sum_marks = 1')
+        self.conn.commit()
+
+        runner = app.test_cli_runner()
+        result = runner.invoke(args=['verify-class-stats'])
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn('1 difference', result.output)
+
+        result = runner.invoke(args=['rebuild-class-stats'])
+        self.assertEqual(result.exit_code, 0)
+        result = runner.invoke(args=['verify-class-stats'])
+        self.assertEqual(result.exit_code, 0)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,198 @@
+import os
+import random
+import statistics
+import tempfile
+import unittest
+from unittest import mock
+
+from backend import columnar
+from backend.app import init_db, set_database_path
+from backend.columnar import (at_risk_cohorts, class_spread, compute_insights, correlation, get_snapshot_stats,
+                              histogram, load_snapshot, read_snapshot, record_student_change)
+from backend.db import get_db_connection
+from backend.writer import submit_write
+
+
+def snapshot_rows(snapshot):
+    return list(zip(snapshot.ids, snapshot.class_ids, snapshot.marks, snapshot.attendance))
+
+
+class TestColumnarEngine(unittest.TestCase):
+    """Tests that the vectorized statistics match straightforward Python"""
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        set_database_path(os.path.join(self._tmpdir.name, "test_database.db"))
+        init_db()
+
+        self.conn = get_db_connection()
+        class_ids = [row[0] for row in self.conn.execute("SELECT id FROM classes")]
+        rng = random.Random(5)
+        self.students = []
+        for i in range(400):
+            class_id = rng.choice(class_ids)
+            marks = max(0, min(100, int(rng.gauss(65, 15))))
+            attendance = max(0, min(100, int(marks * 0.5 + rng.gauss(45, 10))))
+            self.students.append((class_id, marks, attendance))
+        self.conn.executemany(
+            'INSERT INTO students (name, roll_no, class_id, subjects, marks, attendance) VALUES (?, ?, ?, ?, ?, ?)',
+            [(f'Student {i}', f'COL-{i:04d}', c, 'Math', m, a) for i, (c, m, a) in enumerate(self.students)]
+        )
+        self.conn.commit()
+        self.snapshot = load_snapshot(self.conn)
+
+    def tearDown(self):
+        self.conn.close()
+        self._tmpdir.cleanup()
+
+    def test_histogram_with_uneven_bins(self):
+        """Test counts for arbitrary bin edges, with the last edge inclusive"""
+        edges = [0, 35, 50, 72.5, 100]
+        counts = histogram(self.snapshot, 'marks', edges)
+
+        expected = [0] * 4
+        for _, marks, _ in self.students:
+            for i in range(4):
+                if edges[i] <= marks < edges[i + 1] or (i == 3 and marks == 100):
+                    expected[i] += 1
+                    break
+        self.assertEqual(counts, expected)
+
+    def test_class_spread(self):
+        """Test per-class means and population standard deviations"""
+        spread = class_spread(self.snapshot)
+        for class_id, stats in spread.items():
+            marks = [m for c, m, _ in self.students if c == class_id]
+            attendance = [a for c, _, a in self.students if c == class_id]
+            self.assertEqual(stats['count'], len(marks))
+            self.assertAlmostEqual(stats['mean_marks'], statistics.fmean(marks))
+            self.assertAlmostEqual(stats['std_marks'], statistics.pstdev(marks))
+            self.assertAlmostEqual(stats['std_attendance'], statistics.pstdev(attendance))
+
+    def test_correlation(self):
+        """Test the Pearson correlation of marks and attendance"""
+        expected = statistics.correlation([m for _, m, _ in self.students], [a for _, _, a in self.students])
+        self.assertAlmostEqual(correlation(self.snapshot), expected)
+
+    def test_at_risk_cohorts(self):
+        """Test cohort counts against z-scores computed per student"""
+        cohorts = at_risk_cohorts(self.snapshot, marks_below=50, attendance_below=60, z_below=-1.0)
+
+        below_class = 0
+        for class_id, marks, _ in self.students:
+            class_marks = [m for c, m, _ in self.students if c == class_id]
+            std = statistics.pstdev(class_marks)
+            if std and (marks - statistics.fmean(class_marks)) / std < -1.0:
+                below_class += 1
+        self.assertEqual(cohorts['low_marks'], sum(1 for _, m, _ in self.students if m < 50))
+        self.assertEqual(cohorts['both'], sum(1 for _, m, a in self.students if m < 50 and a < 60))
+        self.assertEqual(cohorts['below_class'], below_class)
+
+    def test_empty_snapshot(self):
+        """Test that no students gives empty results instead of errors"""
+        self.conn.execute('DELETE FROM students')
+        self.conn.commit()
+        insights = compute_insights(load_snapshot(self.conn))
+        self.assertIsNone(insights['correlation'])
+        self.assertEqual(insights['class_spread'], {})
+        self.assertEqual(insights['cohorts']['any'], 0)
+
+    @unittest.skipIf(columnar.numpy is None, "NumPy is not installed")
+    def test_numpy_matches_array_fallback(self):
+        """Test that both engines give the same insights"""
+        with_numpy = compute_insights(self.snapshot)
+        with mock.patch.object(columnar, 'numpy', None):
+            without_numpy = compute_insights(self.snapshot)
+
+        self.assertEqual(with_numpy['marks_histogram'], without_numpy['marks_histogram'])
+        self.assertEqual(with_numpy['cohorts'], without_numpy['cohorts'])
+        self.assertAlmostEqual(with_numpy['correlation'], without_numpy['correlation'])
+        for class_id, stats in with_numpy['class_spread'].items():
+            self.assertAlmostEqual(stats['std_marks'], without_numpy['class_spread'][class_id]['std_marks'])
+
+
+class TestSnapshotPatching(unittest.TestCase):
+    """Tests that edits through the writer patch the snapshot in place"""
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        set_database_path(os.path.join(self._tmpdir.name, "test_database.db"))
+        init_db()
+
+        self.conn = get_db_connection()
+        self.class_id = self.conn.execute("SELECT id FROM classes ORDER BY id LIMIT 1").fetchone()[0]
+        for i in range(5):
+            self.conn.execute(
+                'INSERT INTO students (name, roll_no, class_id, subjects, marks, attendance) VALUES (?, ?, ?, ?, ?, ?)',
+                (f'Patch {i}', f'PATCH-{i}', self.class_id, 'Math', 50 + i, 80)
+            )
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+        self._tmpdir.cleanup()
+
+    def read(self):
+        return read_snapshot(self.conn, snapshot_rows)
+
+    def test_insert_update_delete_are_patched(self):
+        """Test that the patched snapshot equals a fresh load without reloading"""
+        self.read()
+        loads = get_snapshot_stats()['loads']
+
+        def insert(conn):
+            cursor = conn.execute(
+                'INSERT INTO students (name, roll_no, class_id, subjects, marks, attendance) VALUES (?, ?, ?, ?, ?, ?)',
+                ('New', 'PATCH-NEW', self.class_id, 'Math', 99, 98))
+            record_student_change(conn, cursor.lastrowid)
+            return cursor.lastrowid
+
+        new_id = submit_write(insert)
+
+        def update(conn):
+            conn.execute('UPDATE students SET marks = 10 WHERE id = ?', (new_id,))
+            record_student_change(conn, new_id)
+
+        submit_write(update)
+
+        first_id = self.conn.execute('SELECT MIN(id) FROM students').fetchone()[0]
+
+        def delete(conn):
+            conn.execute('DELETE FROM students WHERE id = ?', (first_id,))
+            record_student_change(conn, first_id)
+
+        submit_write(delete)
+
+        rows = self.read()
+        self.assertEqual(get_snapshot_stats()['loads'], loads)
+        self.assertEqual(rows, snapshot_rows(load_snapshot(self.conn)))
+        self.assertIn((new_id, self.class_id, 10, 98), rows)
+
+    def test_failed_mutation_is_not_patched(self):
+        """Test that a rolled back change leaves the snapshot alone"""
+        before = self.read()
+
+        def failing(conn):
+            conn.execute('UPDATE students SET marks = 0')
+            record_student_change(conn, before[0][0])
+            raise ValueError('stop')
+
+        with self.assertRaises(ValueError):
+            submit_write(failing)
+        self.assertEqual(self.read(), before)
+
+    def test_outside_change_reloads(self):
+        """Test that a change not made through the writer triggers a reload"""
+        self.read()
+        loads = get_snapshot_stats()['loads']
+
+        self.conn.execute('UPDATE students SET attendance = 1')
+        self.conn.commit()
+
+        rows = self.read()
+        self.assertEqual(get_snapshot_stats()['loads'], loads + 1)
+        self.assertTrue(all(row[3] == 1 for row in rows))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,8 +3,9 @@ import sqlite3
 import tempfile
 import unittest
 
-from backend.app import init_db, set_database_path
-from backend.db import get_db_connection
+from backend.app import app, init_db, set_database_path
+from backend import db
+from backend.db import MIGRATIONS, get_db_connection, get_pool_stats, get_schema_version, migrate
 
 
 class TestDatabaseInitialization(unittest.TestCase):
@@ -42,6 +43,175 @@ class TestDatabaseInitialization(unittest.TestCase):
         self.assertGreaterEqual(count, 6)  # We seed at least 6 default classes
 
 
+class TestConnectionPool(unittest.TestCase):
+    """Tests for the pooled per-request connections"""
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self._tmpdir.name, "test_database.db")
+        set_database_path(self.db_path)
+        init_db()
+
+    def tearDown(self):
+        db.configure_pool(size=db.DB_POOL_SIZE)
+        db.close_pool()
+        self._tmpdir.cleanup()
+
+    def test_pragmas_are_applied(self):
+        """Test that new connections use WAL and the tuned PRAGMAs"""
+        conn = get_db_connection()
+        journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        synchronous = conn.execute("PRAGMA synchronous").fetchone()[0]
+        busy_timeout = conn.execute("PRAGMA busy_timeout").fetchone()[0]
+        conn.close()
+
+        self.assertEqual(journal_mode, "wal")
+        self.assertEqual(synchronous, 1)  # NORMAL
+        self.assertEqual(busy_timeout, db.PRAGMAS["busy_timeout"])
+
+    def test_same_connection_within_request(self):
+        """Test that one request gets one connection bound to g"""
+        with app.app_context():
+            first = get_db_connection()
+            second = get_db_connection()
+            self.assertIs(first, second)
+
+    def test_connection_reused_across_requests(self):
+        """Test that the connection goes back to the pool on teardown"""
+        before = get_pool_stats()
+        with app.app_context():
+            first = get_db_connection()
+        with app.app_context():
+            second = get_db_connection()
+
+        after = get_pool_stats()
+        self.assertIs(first, second)
+        self.assertEqual(after["misses"] - before["misses"], 1)
+        self.assertEqual(after["hits"] - before["hits"], 1)
+
+    def test_pool_size_zero_disables_reuse(self):
+        """Test that a pool size of 0 closes connections on teardown"""
+        db.configure_pool(size=0)
+        with app.app_context():
+            get_db_connection()
+        self.assertEqual(get_pool_stats()["idle"], 0)
+
+    def test_closed_connection_is_not_pooled(self):
+        """Test that a connection closed by a route is discarded"""
+        with app.app_context():
+            get_db_connection().close()
+        with app.app_context():
+            conn = get_db_connection()
+            self.assertEqual(conn.execute("SELECT 1").fetchone()[0], 1)
+
+
+class TestMigrations(unittest.TestCase):
+    """Tests for versioned schema migrations and the query indexes"""
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self._tmpdir.name, "test_database.db")
+        set_database_path(self.db_path)
+        init_db()
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    def query_plan(self, conn, query, params=()):
+        rows = conn.execute("EXPLAIN QUERY PLAN " + query, params).fetchall()
+        return [row[3] for row in rows]
+
+    def test_init_db_applies_all_migrations(self):
+        """Test that user_version matches the number of migrations"""
+        conn = get_db_connection()
+        version = get_schema_version(conn)
+        conn.close()
+
+        self.assertEqual(version, len(MIGRATIONS))
+
+    def test_migrate_is_idempotent(self):
+        """Test that running migrations again changes nothing"""
+        init_db()
+        conn = get_db_connection()
+        self.assertEqual(migrate(conn), len(MIGRATIONS))
+        conn.close()
+
+    def test_old_database_is_upgraded(self):
+        """Test that a database from before migrations gets the indexes"""
+        conn = get_db_connection()
+        conn.execute("DROP INDEX idx_students_marks")
+        conn.execute("PRAGMA user_version = 0")
+        conn.commit()
+        conn.close()
+
+        init_db()
+
+        conn = get_db_connection()
+        indexes = [row[1] for row in conn.execute("PRAGMA index_list(students)")]
+        version = get_schema_version(conn)
+        conn.close()
+
+        self.assertIn("idx_students_marks", indexes)
+        self.assertEqual(version, len(MIGRATIONS))
+
+    def test_view_students_sorts_use_indexes(self):
+        """Test that every view_students sort reads rows in index order"""
+        sort_columns = {
+            's.name': 'idx_students_name',
+            's.roll_no': 'sqlite_autoindex_students_1',
+            's.marks': 'idx_students_marks',
+            's.attendance': 'idx_students_attendance',
+        }
+        conn = get_db_connection()
+        for sort_column, index_name in sort_columns.items():
+            for order in ('ASC', 'DESC'):
+                query = f'''
+                    SELECT s.*, c.name as class_name, {sort_column} as sort_value
+                    FROM students s
+                    JOIN classes c ON s.class_id = c.id
+                    WHERE 1=1 AND ({sort_column}, s.id) > (?, ?)
+                    ORDER BY {sort_column} {order}, s.id {order} LIMIT 51
+                '''
+                plan = self.query_plan(conn, query, ('a', 1))
+                with self.subTest(sort_column=sort_column, order=order):
+                    self.assertIn(index_name, plan[0])
+                    self.assertFalse(any("TEMP B-TREE" in step for step in plan))
+
+        # Sorting by class walks classes by name, then students by class_id
+        plan = self.query_plan(conn, '''
+            SELECT s.*, c.name as class_name, c.name as sort_value
+            FROM classes c CROSS JOIN students s ON s.class_id = c.id
+            WHERE 1=1
+            ORDER BY c.name ASC, s.id ASC LIMIT 51
+        ''')
+        conn.close()
+
+        self.assertIn("idx_students_class", plan[1])
+        self.assertFalse(any("TEMP B-TREE" in step for step in plan))
+
+    def test_class_queries_use_indexes(self):
+        """Test the class_id lookups in delete_class and analytics"""
+        conn = get_db_connection()
+        delete_plan = self.query_plan(conn, 'SELECT COUNT(*) FROM students WHERE class_id = ?', (1,))
+        stats_plan = self.query_plan(conn, '''
+            SELECT
+                c.name,
+                COUNT(s.id) as student_count,
+                AVG(s.marks) as avg_marks,
+                AVG(s.attendance) as avg_attendance,
+                MIN(s.marks) as min_marks,
+                MAX(s.marks) as max_marks
+            FROM classes c
+            LEFT JOIN students s ON c.id = s.class_id
+            GROUP BY c.id, c.name
+            ORDER BY c.name
+        ''')
+        conn.close()
+
+        self.assertIn("COVERING INDEX idx_students_class", delete_plan[0])
+        self.assertTrue(any("COVERING INDEX idx_students_class_marks" in step for step in stats_plan))
+
+
 class TestDatabaseOperations(unittest.TestCase):
     """Tests for CRUD operations on database"""
     
@@ -0,0 +1,39 @@
+import gzip
+import unittest
+
+from backend.export import csv_chunks, gzip_chunks, ndjson_chunks
+
+
+class TestExport(unittest.TestCase):
+    """Tests for the chunked CSV/NDJSON writers"""
+
+    def setUp(self):
+        self.rows = [{'id': i, 'name': f'Student, {i}'} for i in range(5)]
+
+    def test_csv_chunks(self):
+        """Test the header, quoting and chunk boundaries"""
+        chunks = list(csv_chunks(iter(self.rows), ['id', 'name'], chunk_rows=2))
+        self.assertEqual(len(chunks), 3)
+        lines = ''.join(chunks).splitlines()
+        self.assertEqual(lines[0], 'id,name')
+        self.assertEqual(lines[1], '0,"Student, 0"')
+        self.assertEqual(len(lines), 6)
+
+    def test_ndjson_chunks(self):
+        """Test one JSON object per line"""
+        chunks = list(ndjson_chunks(iter(self.rows), ['id'], chunk_rows=2))
+        self.assertEqual(chunks, ['{"id": 0}\n{"id": 1}\n', '{"id": 2}\n{"id": 3}\n', '{"id": 4}\n'])
+
+    def test_ndjson_empty(self):
+        """Test that no rows give an empty body"""
+        self.assertEqual(list(ndjson_chunks(iter([]), ['id'])), [])
+
+    def test_gzip_chunks(self):
+        """Test that the compressed stream decompresses to the original text"""
+        text = ''.join(csv_chunks(iter(self.rows), ['id', 'name'], chunk_rows=2))
+        data = b''.join(gzip_chunks(csv_chunks(iter(self.rows), ['id', 'name'], chunk_rows=2)))
+        self.assertEqual(gzip.decompress(data).decode('utf-8'), text)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
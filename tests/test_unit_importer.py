@@ -0,0 +1,94 @@
+import io
+import os
+import tempfile
+import unittest
+
+from backend.app import init_db, set_database_path
+from backend.db import get_db_connection
+from backend.importer import import_students, import_students_file
+
+HEADER = "name,roll_no,class,subjects,marks,attendance\n"
+
+
+class TestImporter(unittest.TestCase):
+    """Tests for the bulk CSV student import"""
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self._tmpdir.name, "test_database.db")
+        set_database_path(self.db_path)
+        init_db()
+        self.conn = get_db_connection()
+
+    def tearDown(self):
+        self.conn.close()
+        self._tmpdir.cleanup()
+
+    def count_students(self):
+        return self.conn.execute("SELECT COUNT(*) FROM students").fetchone()[0]
+
+    def test_valid_rows_are_inserted(self):
+        """Test that every valid row ends up in the students table"""
+        lines = [HEADER] + [f"Student {i},IMP-{i},Grade 10-A,Math,{50 + i},90\n" for i in range(25)]
+        report = import_students(self.conn, lines, batch_size=10)
+
+        self.assertEqual(report['rows'], 25)
+        self.assertEqual(report['inserted'], 25)
+        self.assertEqual(report['error_count'], 0)
+        self.assertEqual(self.count_students(), 25)
+
+        stats = self.conn.execute("SELECT SUM(student_count) FROM class_stats").fetchone()[0]
+        self.assertEqual(stats, 25)
+
+    def test_bad_rows_are_reported_and_skipped(self):
+        """Test validation, unknown class and duplicate errors with their line numbers"""
+        self.conn.execute(
+            "INSERT INTO students (name, roll_no, class_id, subjects, marks, attendance) "
+            "SELECT 'Existing', 'IMP-OLD', id, 'Math', 70, 80 FROM classes LIMIT 1"
+        )
+        self.conn.commit()
+
+        lines = [
+            HEADER,
+            "Good,IMP-1,Grade 10-A,Math,70,80\n",
+            "Bad Marks,IMP-2,Grade 10-A,Math,150,80\n",
+            "No Class,IMP-3,Grade 99,Math,70,80\n",
+            "Again,IMP-1,Grade 10-A,Math,70,80\n",
+            "Old,IMP-OLD,Grade 10-A,Math,70,80\n",
+        ]
+        report = import_students(self.conn, lines)
+
+        self.assertEqual(report['inserted'], 1)
+        self.assertEqual(report['error_count'], 4)
+        self.assertEqual([error['line'] for error in report['errors']], [3, 4, 5, 6])
+        self.assertEqual(report['errors'][2]['message'], 'Duplicate roll number in file')
+        self.assertEqual(report['errors'][3]['message'], 'Roll number already exists')
+        self.assertEqual(self.count_students(), 2)
+
+    def test_missing_columns(self):
+        """Test that a header without the required columns imports nothing"""
+        report = import_students(self.conn, ["name,roll_no\n", "A,1\n"])
+        self.assertEqual(report['inserted'], 0)
+        self.assertIn('Missing column', report['errors'][0]['message'])
+
+    def test_dry_run_writes_nothing(self):
+        """Test that a dry run counts valid rows without inserting them"""
+        lines = [HEADER, "Student,IMP-1,Grade 10-A,Math,70,80\n"]
+        report = import_students(self.conn, lines, dry_run=True)
+
+        self.assertEqual(report['valid'], 1)
+        self.assertEqual(report['inserted'], 0)
+        self.assertEqual(self.count_students(), 0)
+
+    def test_binary_file_with_bom(self):
+        """Test importing from a binary upload saved with a byte order mark"""
+        data = ("﻿" + HEADER + "Student,IMP-1,Grade 10-A,Math,70,80\n").encode("utf-8")
+        upload = io.BytesIO(data)
+        report = import_students_file(self.conn, upload)
+
+        self.assertEqual(report['inserted'], 1)
+        self.assertFalse(upload.closed)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,183 @@
+import io
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from backend import jobs
+from backend.app import init_db, set_database_path
+from backend.db import get_db_connection
+from backend.jobs import cancel_job, get_job, list_jobs, save_upload, submit_job, upload_dir
+
+
+class TestJobs(unittest.TestCase):
+    """Tests running, cancelling and recovering background jobs"""
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        set_database_path(os.path.join(self._tmpdir.name, "test_database.db"))
+        init_db()
+        self.conn = get_db_connection()
+        self.class_name = self.conn.execute("SELECT name FROM classes ORDER BY id LIMIT 1").fetchone()[0]
+
+    def tearDown(self):
+        self.conn.close()
+        self._tmpdir.cleanup()
+
+    def wait(self, job_id, states=('done', 'failed', 'cancelled')):
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            job = get_job(self.conn, job_id)
+            if job['status'] in states:
+                return job
+            time.sleep(0.01)
+        self.fail(f'job {job_id} is still {job["status"]}')
+
+    def test_analytics_job_stores_result(self):
+        """Test that a job goes from queued to done with its result"""
+        job_id = submit_job('analytics')
+        job = self.wait(job_id)
+
+        self.assertEqual(job['status'], 'done')
+        self.assertEqual(job['progress'], 1)
+        self.assertIn('summary', job['result'])
+        self.assertIn('insights', job['result'])
+        self.assertIsNotNone(job['started_at'])
+        self.assertTrue(list_jobs(self.conn)[0]['has_result'])
+
+    def test_failing_job(self):
+        """Test that an exception marks the job failed with its message"""
+        def boom(conn, params, progress):
+            raise RuntimeError('no luck')
+
+        with mock.patch.dict(jobs.JOB_TYPES, {'boom': (boom, False)}):
+            job = self.wait(submit_job('boom'))
+
+        self.assertEqual(job['status'], 'failed')
+        self.assertEqual(job['error'], 'no luck')
+
+    def test_cancel_running_job(self):
+        """Test that a running job stops at its next progress report"""
+        started = threading.Event()
+
+        def endless(conn, params, progress):
+            step = 0
+            while True:
+                progress(0.5, f'step {step}')
+                started.set()
+                step += 1
+                time.sleep(0.01)
+
+        with mock.patch.dict(jobs.JOB_TYPES, {'endless': (endless, False)}), \
+                mock.patch.object(jobs, 'JOB_PROGRESS_INTERVAL', 0):
+            job_id = submit_job('endless')
+            started.wait(5)
+            self.assertEqual(get_job(self.conn, job_id)['progress'], 0.5)
+            self.assertTrue(cancel_job(job_id))
+            job = self.wait(job_id)
+
+        self.assertEqual(job['status'], 'cancelled')
+        self.assertFalse(cancel_job(job_id))
+
+    def test_cancel_queued_job(self):
+        """Test that a queued job is cancelled before it starts"""
+        get_job(self.conn, 0)
+        self.conn.execute("INSERT INTO jobs (kind) VALUES ('analytics')")
+        self.conn.commit()
+        job_id = self.conn.execute('SELECT MAX(id) FROM jobs').fetchone()[0]
+
+        self.assertTrue(cancel_job(job_id))
+        self.assertEqual(get_job(self.conn, job_id)['status'], 'cancelled')
+
+    def test_restart_recovers_jobs(self):
+        """Test that a restart fails interrupted jobs and resumes queued ones"""
+        finished = subprocess.Popen([sys.executable, '-c', 'pass'])
+        finished.wait()
+        host = socket.gethostname()
+        upload = save_upload(io.BytesIO(b'name,roll_no\n'))
+        self.conn.executemany('INSERT INTO jobs (kind, params, status, owner) VALUES (?, ?, ?, ?)', [
+            ('import-students', json.dumps({'upload': upload}), 'running', f'{host}:{finished.pid}'),
+            ('analytics', '{}', 'running', f'other-host:{finished.pid}'),
+            ('analytics', '{}', 'queued', None),
+        ])
+        self.conn.commit()
+        interrupted, elsewhere, queued = [row[0] for row in self.conn.execute('SELECT id FROM jobs ORDER BY id')]
+
+        # The first use of the jobs after the "restart" recovers them
+        self.assertEqual(get_job(self.conn, interrupted)['status'], 'failed')
+        self.assertEqual(get_job(self.conn, interrupted)['error'], 'Interrupted by a restart')
+        self.assertFalse(os.path.exists(os.path.join(upload_dir(), upload)))
+        self.assertEqual(get_job(self.conn, elsewhere)['status'], 'running')
+        self.assertEqual(self.wait(queued)['status'], 'done')
+
+    def test_restart_with_reused_pid_or_new_host(self):
+        """Test that jobs of a previous run are recovered when the pid or host name do not tell"""
+        host = socket.gethostname()
+        self.conn.executemany('''
+            INSERT INTO jobs (kind, status, owner, boot_id, heartbeat_at)
+            VALUES ('analytics', 'running', ?, ?, datetime('now', ?))
+        ''', [
+            (f'{host}:{os.getpid()}', 'previousboot', '-1 seconds'),   # same pid, e.g. pid 1 in a container
+            ('replaced-container:1', 'previousboot', '-1 hours'),      # heartbeat stopped long ago
+            ('other-host:1', 'livingboot', '-1 seconds'),             # still alive elsewhere
+        ])
+        self.conn.commit()
+        reused, replaced, alive = [row[0] for row in self.conn.execute('SELECT id FROM jobs ORDER BY id')]
+
+        self.assertEqual(get_job(self.conn, reused)['status'], 'failed')
+        self.assertEqual(get_job(self.conn, replaced)['status'], 'failed')
+        self.assertEqual(get_job(self.conn, alive)['status'], 'running')
+
+    def test_heartbeat_while_running(self):
+        """Test that a running job's heartbeat is kept up to date"""
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow(conn, params, progress):
+            started.set()
+            release.wait(5)
+
+        with mock.patch.dict(jobs.JOB_TYPES, {'slow': (slow, False)}):
+            job_id = submit_job('slow')
+            started.wait(5)
+            self.conn.execute("UPDATE jobs SET heartbeat_at = '2000-01-01 00:00:00' WHERE id = ?", (job_id,))
+            self.conn.commit()
+            jobs._send_heartbeats()
+            heartbeat = self.conn.execute('SELECT heartbeat_at FROM jobs WHERE id = ?', (job_id,)).fetchone()[0]
+            release.set()
+            self.assertEqual(self.wait(job_id)['status'], 'done')
+
+        self.assertNotEqual(heartbeat, '2000-01-01 00:00:00')
+
+    def test_import_job(self):
+        """Test importing an uploaded file in the background"""
+        data = (
+            "name,roll_no,class,subjects,marks,attendance\n"
+            f"Job One,JOB-001,{self.class_name},Math,80,90\n"
+            f"Job Two,JOB-002,{self.class_name},Math,abc,90\n"
+        ).encode('utf-8')
+        upload = save_upload(io.BytesIO(data))
+        job = self.wait(submit_job('import-students', {'upload': upload}, allow_uploads=True))
+
+        self.assertEqual(job['status'], 'done')
+        self.assertEqual(job['result']['inserted'], 1)
+        self.assertEqual(job['result']['error_count'], 1)
+        self.assertFalse(os.path.exists(os.path.join(upload_dir(), upload)))
+        self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM students WHERE roll_no = 'JOB-001'").fetchone()[0], 1)
+
+    def test_upload_jobs_need_allow_uploads(self):
+        """Test that kinds reading uploaded files are only submitted with allow_uploads"""
+        with self.assertRaises(ValueError):
+            submit_job('import-students', {'upload': '../../etc/passwd'})
+        with self.assertRaises(ValueError):
+            submit_job('unknown')
+
+
+if __name__ == '__main__':
+    unittest.main()
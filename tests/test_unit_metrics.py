@@ -0,0 +1,103 @@
+import os
+import tempfile
+import unittest
+
+from flask import g
+
+from backend.app import app, init_db, set_database_path
+from backend.auth import create_api_token
+from backend.db import get_db_connection
+from backend.metrics import configure_metrics, record_query, render_metrics, reset_metrics
+
+
+class TestMetrics(unittest.TestCase):
+    """Tests for request instrumentation and the /metrics endpoint"""
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self._tmpdir.name, "test_database.db")
+        set_database_path(self.db_path)
+        init_db()
+
+        conn = get_db_connection()
+        self.token = create_api_token(conn, "prometheus")
+        conn.close()
+
+        app.config.update(TESTING=True)
+        self.client = app.test_client()
+        self.client.post("/login", data={"username": "admin", "password": "admin123"})
+        configure_metrics(True)
+        reset_metrics()
+
+    def tearDown(self):
+        configure_metrics(False)
+        reset_metrics()
+        self._tmpdir.cleanup()
+
+    def server_timing(self, response):
+        parts = {}
+        for item in response.headers["Server-Timing"].split(", "):
+            fields = item.split(";")
+            parts[fields[0]] = dict(field.split("=", 1) for field in fields[1:])
+        return parts
+
+    def test_server_timing_header(self):
+        """Test that SQL, template and total time are reported"""
+        resp = self.client.get("/view-students")
+        timing = self.server_timing(resp)
+
+        self.assertIn("queries", timing["db"]["desc"])
+        self.assertGreater(int(timing["db"]["desc"].strip('"').split()[0]), 0)
+        self.assertGreater(float(timing["tpl"]["dur"]), 0)
+        self.assertGreaterEqual(float(timing["total"]["dur"]), float(timing["db"]["dur"]))
+
+    def test_histogram_per_endpoint(self):
+        """Test that requests are counted in the endpoint's histogram"""
+        self.client.get("/dashboard")
+        self.client.get("/dashboard")
+        self.client.get("/classes")
+
+        text = render_metrics()
+        self.assertIn('intellitrack_request_duration_seconds_count{endpoint="dashboard"} 2', text)
+        self.assertIn('intellitrack_request_duration_seconds_bucket{endpoint="view_classes",le="+Inf"} 1', text)
+        self.assertIn('intellitrack_sql_queries_total{endpoint="dashboard"}', text)
+
+    def test_slowest_statement_is_kept_server_side(self):
+        """Test that the slowest statement is normalized into /metrics and left out of Server-Timing"""
+        resp = self.client.get("/view-students?search=Secret-123")
+        self.assertNotIn("SELECT", resp.headers["Server-Timing"])
+
+        with self.assertLogs("backend.metrics", level="DEBUG") as logs:
+            self.client.get("/view-students?search=Secret-123")
+        self.assertIn("slowest statement", logs.output[0])
+
+        lines = [line for line in render_metrics().splitlines()
+                 if line.startswith('intellitrack_sql_slowest_seconds{endpoint="view_students"')]
+        self.assertEqual(len(lines), 1)
+        self.assertIn('statement="', lines[0])
+
+        with app.test_request_context():
+            record_query("SELECT * FROM students WHERE roll_no = 'Secret-123'", None, 0.5)
+            record_query("SELECT 1", None, 0.1)
+            self.assertEqual(g.sql_stats["slowest_sql"], "SELECT * FROM students WHERE roll_no = ?")
+
+    def test_metrics_endpoint_requires_token(self):
+        """Test that /metrics needs an API token and returns text"""
+        self.client.get("/dashboard")
+        self.assertEqual(self.client.get("/metrics").status_code, 401)
+
+        resp = self.client.get("/metrics", headers={"Authorization": f"Bearer {self.token}"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.content_type.startswith("text/plain"))
+        self.assertIn(b"# TYPE intellitrack_request_duration_seconds histogram", resp.data)
+
+    def test_disabled(self):
+        """Test that nothing is recorded when metrics are off"""
+        configure_metrics(False)
+        resp = self.client.get("/dashboard")
+        self.assertNotIn("Server-Timing", resp.headers)
+        self.assertNotIn('endpoint="dashboard"', render_metrics())
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
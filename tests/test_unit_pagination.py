@@ -0,0 +1,127 @@
+import os
+import tempfile
+import unittest
+
+from backend.app import init_db, set_database_path
+from backend.db import get_db_connection
+from backend.pagination import decode_cursor, encode_cursor, fetch_page, get_page_size
+
+
+STUDENT_SORT_COLUMNS = {
+    'name': 's.name',
+    'roll_no': 's.roll_no',
+    'marks': 's.marks',
+    'attendance': 's.attendance',
+    'class': 'c.name',
+}
+
+
+class TestCursors(unittest.TestCase):
+    """Tests for cursor encoding"""
+
+    def test_cursor_round_trip(self):
+        """Test that a cursor decodes to the same value and id"""
+        cursor = encode_cursor('name', 'ASC', 'Zoë', 42)
+        self.assertEqual(decode_cursor(cursor, 'name', 'ASC'), ('Zoë', 42))
+
+    def test_cursor_for_other_sort_is_ignored(self):
+        """Test that a cursor made for another sort starts from page 1"""
+        cursor = encode_cursor('name', 'ASC', 'Zoë', 42)
+        self.assertIsNone(decode_cursor(cursor, 'marks', 'ASC'))
+        self.assertIsNone(decode_cursor(cursor, 'name', 'DESC'))
+
+    def test_invalid_cursor_is_ignored(self):
+        """Test that garbage cursors are ignored"""
+        self.assertIsNone(decode_cursor('not-a-cursor', 'name', 'ASC'))
+        self.assertIsNone(decode_cursor('', 'name', 'ASC'))
+
+    def test_page_size_is_clamped(self):
+        """Test that per_page stays within limits"""
+        self.assertEqual(get_page_size('abc'), get_page_size(None))
+        self.assertEqual(get_page_size('0'), 1)
+        self.assertEqual(get_page_size('100000'), get_page_size('100000000'))
+
+
+class TestKeysetPagination(unittest.TestCase):
+    """Tests that walking pages gives the same rows as one big query"""
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self._tmpdir.name, "test_database.db")
+        set_database_path(self.db_path)
+        init_db()
+
+        self.conn = get_db_connection()
+        class_ids = [row[0] for row in self.conn.execute("SELECT id FROM classes ORDER BY id LIMIT 3")]
+        # Repeating marks, attendance and names so ties must be broken by id
+        for i in range(23):
+            self.conn.execute(
+                'INSERT INTO students (name, roll_no, class_id, subjects, marks, attendance) VALUES (?, ?, ?, ?, ?, ?)',
+                (f'Student {i % 5}', f'R-{i:03d}', class_ids[i % 3], 'Math', 50 + (i % 4) * 10, 70 + (i % 3) * 5)
+            )
+        self.conn.commit()
+        self.class_id = class_ids[0]
+
+    def tearDown(self):
+        self.conn.close()
+        self._tmpdir.cleanup()
+
+    def build_query(self, sort_column, filters=''):
+        return f'''
+            SELECT s.*, c.name as class_name, {sort_column} as sort_value
+            FROM students s
+            JOIN classes c ON s.class_id = c.id
+            WHERE 1=1 {filters}
+        '''
+
+    def walk(self, sort_by, sort_order, filters='', params=()):
+        sort_column = STUDENT_SORT_COLUMNS[sort_by]
+        query = self.build_query(sort_column, filters)
+
+        forward = []
+        pages = []
+        cursor = None
+        while True:
+            page = fetch_page(self.conn, query, params, sort_column, 's.id', sort_by, sort_order,
+                              after=cursor, per_page=4)
+            pages.append(page)
+            forward.extend(row['id'] for row in page['rows'])
+            cursor = page['next_cursor']
+            if not cursor:
+                break
+
+        # Walk back from the last page using the previous-page cursors
+        backward = [row['id'] for row in pages[-1]['rows']]
+        cursor = pages[-1]['prev_cursor']
+        while cursor:
+            page = fetch_page(self.conn, query, params, sort_column, 's.id', sort_by, sort_order,
+                              before=cursor, per_page=4)
+            backward = [row['id'] for row in page['rows']] + backward
+            cursor = page['prev_cursor']
+
+        expected = [row['id'] for row in self.conn.execute(
+            query + f' ORDER BY {sort_column} {sort_order}, s.id {sort_order}', params)]
+        return forward, backward, expected
+
+    def test_every_sort_key_in_both_directions(self):
+        """Test all sort keys ascending and descending"""
+        for sort_by in STUDENT_SORT_COLUMNS:
+            for sort_order in ('ASC', 'DESC'):
+                with self.subTest(sort_by=sort_by, sort_order=sort_order):
+                    forward, backward, expected = self.walk(sort_by, sort_order)
+                    self.assertEqual(len(expected), 23)
+                    self.assertEqual(forward, expected)
+                    self.assertEqual(backward, expected)
+
+    def test_with_search_and_class_filter(self):
+        """Test paging combined with search and class filters"""
+        filters = ' AND (s.name LIKE ? OR s.roll_no LIKE ?) AND c.id = ?'
+        params = ('%Student 1%', '%Student 1%', self.class_id)
+        forward, backward, expected = self.walk('marks', 'DESC', filters, params)
+        self.assertGreater(len(expected), 0)
+        self.assertEqual(forward, expected)
+        self.assertEqual(backward, expected)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
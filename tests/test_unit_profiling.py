@@ -0,0 +1,90 @@
+import os
+import tempfile
+import unittest
+
+from backend import profiling
+from backend.app import app, init_db, set_database_path
+from backend.profiling import configure_profiling, list_profiles
+
+
+class TestProfiling(unittest.TestCase):
+    """Tests for the on-demand request profiler"""
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        set_database_path(os.path.join(self._tmpdir.name, "test_database.db"))
+        init_db()
+        self.profile_dir = os.path.join(self._tmpdir.name, "profiles")
+        configure_profiling(True, directory=self.profile_dir)
+
+        app.config.update(TESTING=True)
+        self.client = app.test_client()
+
+    def tearDown(self):
+        configure_profiling()
+        self._tmpdir.cleanup()
+
+    def login(self):
+        self.client.post("/login", data={"username": "admin", "password": "admin123"})
+
+    def test_off_by_default(self):
+        """Test that nothing is profiled unless turned on"""
+        configure_profiling(directory=self.profile_dir)
+        self.login()
+        self.client.get("/dashboard", headers={"X-Profile": "cpu"})
+        self.assertEqual(list_profiles(), [])
+
+    def test_only_admins_are_profiled(self):
+        """Test that the header is ignored without a login session"""
+        self.client.get("/login", headers={"X-Profile": "cpu"})
+        self.assertEqual(list_profiles(), [])
+
+    def test_cpu_profile(self):
+        """Test that a cpu profile is saved and summarized"""
+        self.login()
+        resp = self.client.get("/view-students", headers={"X-Profile": "cpu"})
+        self.assertEqual(resp.status_code, 200)
+
+        profiles = list_profiles()
+        self.assertEqual([(p["endpoint"], p["kind"]) for p in profiles], [("view_students", "cpu")])
+
+        resp = self.client.get("/admin/profiles")
+        self.assertIn(b"view_students", resp.data)
+        resp = self.client.get(f"/admin/profiles/{profiles[0]['name']}")
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn(b"render_template", resp.data)
+
+    def test_memory_profile(self):
+        """Test that a tracemalloc snapshot is saved and summarized"""
+        self.login()
+        self.client.get("/analytics", headers={"X-Profile": "memory"})
+
+        profiles = list_profiles()
+        self.assertEqual(profiles[0]["kind"], "memory")
+        resp = self.client.get(f"/admin/profiles/{profiles[0]['name']}")
+        self.assertIn(b"KiB", resp.data)
+
+    def test_concurrent_memory_profile_is_skipped(self):
+        """Test that a second memory profile runs unprofiled instead of failing"""
+        self.login()
+        with profiling._memory_lock:
+            resp = self.client.get("/analytics", headers={"X-Profile": "memory"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(list_profiles(), [])
+
+    def test_sample_rate(self):
+        """Test that every request is profiled with a sample rate of 1"""
+        configure_profiling(True, sample_rate=1.0, directory=self.profile_dir)
+        self.login()
+        self.client.get("/dashboard")
+        self.client.get("/classes")
+        self.assertEqual(len(list_profiles()), 2)
+
+    def test_unknown_profile_name(self):
+        """Test that only saved profile names can be opened"""
+        self.login()
+        self.assertEqual(self.client.get("/admin/profiles/..%2Fdatabase.db").status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
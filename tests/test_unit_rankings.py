@@ -0,0 +1,110 @@
+import os
+import random
+import tempfile
+import unittest
+
+from backend.app import init_db, set_database_path
+from backend.db import get_db_connection
+from backend.rankings import compute_rankings, get_leaderboard, student_ranking
+
+
+class TestRankings(unittest.TestCase):
+    """Tests that the rankings match window functions over every student"""
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self._tmpdir.name, "test_database.db")
+        set_database_path(self.db_path)
+        init_db()
+
+        self.conn = get_db_connection()
+        self.class_ids = [row[0] for row in self.conn.execute("SELECT id FROM classes")]
+        rng = random.Random(11)
+        # Few distinct marks, so there are plenty of ties
+        self.conn.executemany(
+            'INSERT INTO students (name, roll_no, class_id, subjects, marks, attendance) VALUES (?, ?, ?, ?, ?, ?)',
+            [(f'Student {i}', f'RANK-{i:04d}', rng.choice(self.class_ids), 'Math',
+              rng.choice([40, 55, 55, 70, 85, 85, 85, 99]), rng.randint(50, 100)) for i in range(300)]
+        )
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+        self._tmpdir.cleanup()
+
+    def test_matches_per_student_window_functions(self):
+        """Test rank, dense rank and percentile against RANK() over all students"""
+        rankings = compute_rankings(self.conn)
+        rows = self.conn.execute('''
+            SELECT
+                class_id, marks,
+                RANK() OVER (PARTITION BY class_id ORDER BY marks DESC) as class_rank,
+                DENSE_RANK() OVER (PARTITION BY class_id ORDER BY marks DESC) as class_dense_rank,
+                PERCENT_RANK() OVER (PARTITION BY class_id ORDER BY marks) as class_percent_rank,
+                COUNT(*) OVER (PARTITION BY class_id) as class_size,
+                RANK() OVER (ORDER BY marks DESC) as school_rank,
+                DENSE_RANK() OVER (ORDER BY marks DESC) as school_dense_rank,
+                PERCENT_RANK() OVER (ORDER BY marks) as school_percent_rank
+            FROM students
+        ''').fetchall()
+
+        for row in rows:
+            ranking = student_ranking(rankings, row)
+            self.assertEqual(ranking['class_rank'], row['class_rank'])
+            self.assertEqual(ranking['class_dense_rank'], row['class_dense_rank'])
+            self.assertEqual(ranking['class_size'], row['class_size'])
+            self.assertEqual(ranking['school_rank'], row['school_rank'])
+            self.assertEqual(ranking['school_dense_rank'], row['school_dense_rank'])
+            self.assertEqual(ranking['school_size'], 300)
+            if row['class_size'] > 1:
+                self.assertEqual(ranking['class_percentile'], round(100 * row['class_percent_rank']))
+            self.assertEqual(ranking['school_percentile'], round(100 * row['school_percent_rank']))
+
+    def test_single_student_is_top(self):
+        """Test that the only student of a class is rank 1 and 100th percentile"""
+        self.conn.execute("INSERT INTO classes (name, description) VALUES ('Solo', '')")
+        class_id = self.conn.execute("SELECT id FROM classes WHERE name = 'Solo'").fetchone()[0]
+        self.conn.execute(
+            'INSERT INTO students (name, roll_no, class_id, subjects, marks, attendance) VALUES (?, ?, ?, ?, ?, ?)',
+            ('Only One', 'SOLO-1', class_id, 'Math', 10, 90)
+        )
+        self.conn.commit()
+
+        ranking = compute_rankings(self.conn)[(class_id, 10)]
+        self.assertEqual(ranking['class_rank'], 1)
+        self.assertEqual(ranking['class_percentile'], 100)
+        self.assertEqual(ranking['school_rank'], 301)
+
+    def test_leaderboard_matches_full_ranking(self):
+        """Test that the top rows and their ranks match ranking the whole class"""
+        class_id = self.class_ids[0]
+        leaderboard = get_leaderboard(self.conn, class_id, limit=10)
+        rankings = compute_rankings(self.conn)
+
+        self.assertEqual(len(leaderboard), 10)
+        marks = [row['marks'] for row in leaderboard]
+        self.assertEqual(marks, sorted(marks, reverse=True))
+        top_marks = [row[0] for row in self.conn.execute(
+            'SELECT marks FROM students WHERE class_id = ? ORDER BY marks DESC LIMIT 10', (class_id,))]
+        self.assertEqual(marks, top_marks)
+        for row in leaderboard:
+            ranking = rankings[(class_id, row['marks'])]
+            self.assertEqual(row['class_rank'], ranking['class_rank'])
+            self.assertEqual(row['class_dense_rank'], ranking['class_dense_rank'])
+
+    def test_leaderboard_reads_the_index(self):
+        """Test that the top-k query walks idx_students_class_marks instead of sorting the class"""
+        plan = [row[3] for row in self.conn.execute('''
+            EXPLAIN QUERY PLAN
+            SELECT id, name, roll_no, marks, attendance
+            FROM students
+            WHERE class_id = ?
+            ORDER BY marks DESC, attendance DESC
+            LIMIT ?
+        ''', (self.class_ids[0], 10))]
+        self.assertTrue(any('idx_students_class_marks' in step for step in plan), plan)
+        self.assertFalse(any('TEMP B-TREE' in step for step in plan), plan)
+
+
+if __name__ == '__main__':
+    unittest.main()
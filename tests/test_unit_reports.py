@@ -0,0 +1,89 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from backend.app import init_db, set_database_path
+from backend.db import get_db_connection
+from backend.reports import configure_reports, get_report_stats, open_report_connection, report_copy_path
+
+
+class TestReportConnection(unittest.TestCase):
+    """Tests the read-only report connection on both sources"""
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        set_database_path(os.path.join(self._tmpdir.name, "test_database.db"))
+        init_db()
+        self.conn = get_db_connection()
+
+    def tearDown(self):
+        configure_reports()
+        self.conn.close()
+        self._tmpdir.cleanup()
+
+    def add_class(self, name):
+        self.conn.execute("INSERT INTO classes (name, description) VALUES (?, '')", (name,))
+        self.conn.commit()
+
+    def class_names(self, conn):
+        return [row[0] for row in conn.execute('SELECT name FROM classes')]
+
+    def test_wal_report_is_read_only(self):
+        """Test that the report connection refuses writes"""
+        report, freshness = open_report_connection()
+        with self.assertRaises(sqlite3.OperationalError):
+            report.execute("INSERT INTO classes (name, description) VALUES ('Nope', '')")
+        report.close()
+        self.assertEqual(freshness['source'], 'wal')
+        self.assertEqual(freshness['max_staleness'], 0)
+
+    def test_wal_report_does_not_block_writers(self):
+        """Test that writes commit while a report reads one point in time"""
+        report, _ = open_report_connection()
+        before = self.class_names(report)
+
+        self.add_class('Written During Report')
+
+        self.assertEqual(self.class_names(report), before)
+        self.assertIn('Written During Report', self.class_names(self.conn))
+        report.close()
+
+    def test_backup_copy_until_stale(self):
+        """Test that the copy is reused until it is older than the limit"""
+        configure_reports('backup', max_staleness=3600)
+        report, freshness = open_report_connection()
+        report.close()
+        self.assertTrue(os.path.exists(report_copy_path()))
+        self.assertEqual(freshness['max_staleness'], 3600)
+        refreshes = get_report_stats()['refreshes']
+
+        self.add_class('After Copy')
+        report, _ = open_report_connection()
+        self.assertNotIn('After Copy', self.class_names(report))
+        report.close()
+        self.assertEqual(get_report_stats()['refreshes'], refreshes)
+
+        configure_reports('backup', max_staleness=0)
+        report, _ = open_report_connection()
+        self.assertIn('After Copy', self.class_names(report))
+        report.close()
+        self.assertEqual(get_report_stats()['refreshes'], refreshes + 1)
+
+    def test_open_report_survives_refresh(self):
+        """Test that a report keeps reading its copy while a new one replaces it"""
+        configure_reports('backup', max_staleness=0)
+        report, _ = open_report_connection()
+        before = self.class_names(report)
+
+        self.add_class('Newer')
+        newer, _ = open_report_connection()
+
+        self.assertEqual(self.class_names(report), before)
+        self.assertIn('Newer', self.class_names(newer))
+        report.close()
+        newer.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import os
+import tempfile
+import unittest
+
+from backend.app import init_db, set_database_path
+from backend.db import get_db_connection
+from backend.search import class_search, has_fts, match_expression, student_search
+
+
+class TestMatchExpression(unittest.TestCase):
+    """Tests for turning search input into FTS5 queries"""
+
+    def test_words_become_prefix_terms(self):
+        """Test that every word is quoted and matched as a prefix"""
+        self.assertEqual(match_expression('Ali T-00'), '"ali"* "t"* "00"*')
+
+    def test_fts_syntax_is_not_passed_through(self):
+        """Test that quotes and operators typed by the user are dropped"""
+        self.assertEqual(match_expression('"a" OR b*'), '"a"* "or"* "b"*')
+
+    def test_empty_search(self):
+        """Test that input without words gives no FTS query"""
+        self.assertIsNone(match_expression('  -- '))
+
+
+class TestFullTextSearch(unittest.TestCase):
+    """Tests that the FTS5 index follows inserts, updates and deletes"""
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self._tmpdir.name, "test_database.db")
+        set_database_path(self.db_path)
+        init_db()
+
+        self.conn = get_db_connection()
+        self.class_id = self.conn.execute("SELECT id FROM classes ORDER BY id LIMIT 1").fetchone()[0]
+        for name, roll_no in [('Alice Smith', 'A-001'), ('Bob Alison', 'B-002'), ('Carol Jones', 'C-003')]:
+            self.conn.execute(
+                'INSERT INTO students (name, roll_no, class_id, subjects, marks, attendance) VALUES (?, ?, ?, ?, ?, ?)',
+                (name, roll_no, self.class_id, 'Math', 80, 90)
+            )
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+        self._tmpdir.cleanup()
+
+    def search(self, term):
+        join, condition, params = student_search(self.conn, term)
+        rows = self.conn.execute(f'''
+            SELECT s.name FROM students s{join}
+            WHERE {condition}
+            ORDER BY s.name
+        ''', params).fetchall()
+        return [row['name'] for row in rows]
+
+    def test_fts_tables_exist(self):
+        """Test that the migration created the full-text tables"""
+        self.assertTrue(has_fts(self.conn, 'students_fts'))
+        self.assertTrue(has_fts(self.conn, 'classes_fts'))
+
+    def test_prefix_search(self):
+        """Test prefix matching on names and roll numbers"""
+        self.assertEqual(self.search('ali'), ['Alice Smith', 'Bob Alison'])
+        self.assertEqual(self.search('b-00'), ['Bob Alison'])
+        self.assertEqual(self.search('smi al'), ['Alice Smith'])
+
+    def test_update_and_delete_keep_index_in_sync(self):
+        """Test that the triggers update the index"""
+        self.conn.execute("UPDATE students SET name = 'Alicia Brown' WHERE roll_no = 'A-001'")
+        self.conn.execute("DELETE FROM students WHERE roll_no = 'B-002'")
+        self.conn.commit()
+
+        self.assertEqual(self.search('smith'), [])
+        self.assertEqual(self.search('ali'), ['Alicia Brown'])
+
+    def test_class_search(self):
+        """Test class search through the full-text index"""
+        condition, params = class_search(self.conn, 'grade 11')
+        rows = self.conn.execute(f'SELECT c.name FROM classes c WHERE {condition}', params).fetchall()
+        names = sorted(row['name'] for row in rows)
+        self.assertEqual(names, ['Grade 11-Commerce', 'Grade 11-Science'])
+
+    def test_like_fallback_without_fts(self):
+        """Test that search still works when there is no FTS5 table"""
+        for trigger in ('students_fts_insert', 'students_fts_update', 'students_fts_delete'):
+            self.conn.execute(f'DROP TRIGGER {trigger}')
+        self.conn.execute('DROP TABLE students_fts')
+        self.conn.commit()
+
+        join, condition, params = student_search(self.conn, 'lis')
+        self.assertEqual(join, '')
+        self.assertIn('LIKE', condition)
+        self.assertEqual(self.search('lis'), ['Bob Alison'])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
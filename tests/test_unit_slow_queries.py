@@ -0,0 +1,129 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from backend import slow_queries
+from backend.app import app, init_db, set_database_path
+from backend.db import get_db_connection
+from backend.slow_queries import (configure_slow_query_log, get_slow_query_shapes, normalize_sql,
+                                  parameter_shape)
+
+
+class TestNormalize(unittest.TestCase):
+    """Tests for grouping statements by shape"""
+
+    def test_literals_and_whitespace(self):
+        """Test that values and layout do not change the shape"""
+        self.assertEqual(normalize_sql("SELECT *\n  FROM students WHERE marks > 50 AND name = 'O''Neil'"),
+                         "SELECT * FROM students WHERE marks > ? AND name = ?")
+
+    def test_in_lists(self):
+        """Test that IN lists of any length have the same shape"""
+        self.assertEqual(normalize_sql('SELECT 1 FROM t WHERE id IN (?, ?, ?)'),
+                         normalize_sql('SELECT 1 FROM t WHERE id IN (?,?)'))
+
+    def test_identifiers_with_digits(self):
+        """Test that numbers inside names are kept"""
+        self.assertIn('idx_students_1', normalize_sql('SELECT 1 FROM idx_students_1'))
+
+    def test_parameter_shape(self):
+        """Test the types of the bound values"""
+        self.assertEqual(parameter_shape(('a', 1, 2.5, None)), 'str, int, float, NoneType')
+        self.assertEqual(parameter_shape(None), 'many')
+
+
+class TestSlowQueryLog(unittest.TestCase):
+    """Tests that slow statements are logged with their query plan"""
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        set_database_path(os.path.join(self._tmpdir.name, "test_database.db"))
+        init_db()
+        # Every statement counts as slow
+        configure_slow_query_log(0, path=os.path.join(self._tmpdir.name, "slow.db"))
+
+    def tearDown(self):
+        configure_slow_query_log()
+        self._tmpdir.cleanup()
+
+    def test_statement_is_logged_with_plan(self):
+        """Test the normalized SQL, parameter shape and EXPLAIN QUERY PLAN"""
+        conn = get_db_connection()
+        for marks in (10, 20, 30):
+            conn.execute('SELECT * FROM students WHERE marks > ? ORDER BY name', (marks,)).fetchall()
+        conn.close()
+
+        shapes = {shape['normalized_sql']: shape for shape in get_slow_query_shapes(limit=100)}
+        shape = shapes['SELECT * FROM students WHERE marks > ? ORDER BY name']
+        self.assertEqual(shape['count'], 3)
+        self.assertEqual(shape['parameter_shape'], 'int')
+        self.assertIn('students', shape['query_plan'])
+
+    def test_threshold(self):
+        """Test that fast statements are not logged"""
+        configure_slow_query_log(10000, path=slow_queries._path)
+        conn = get_db_connection()
+        conn.execute('SELECT COUNT(*) FROM classes').fetchone()
+        conn.close()
+        self.assertEqual(get_slow_query_shapes(), [])
+
+    def test_log_errors_do_not_fail_queries(self):
+        """Test that a log file that cannot be opened only logs a warning"""
+        configure_slow_query_log(0, path=os.path.join(self._tmpdir.name, "missing", "slow.db"))
+        conn = get_db_connection()
+        with self.assertLogs('backend.slow_queries', level='WARNING'):
+            self.assertEqual(conn.execute('SELECT 1').fetchone()[0], 1)
+        conn.close()
+
+    def test_path_change_reaches_other_threads(self):
+        """Test that a long-lived thread, like the writer, switches to the new file"""
+        logged_once = threading.Event()
+        moved = threading.Event()
+
+        def worker():
+            conn = get_db_connection()
+            conn.execute('SELECT COUNT(*) FROM classes').fetchone()
+            logged_once.set()
+            moved.wait(5)
+            conn.execute('SELECT COUNT(*) FROM students').fetchone()
+            conn.close()
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        logged_once.wait(5)
+        configure_slow_query_log(0, path=os.path.join(self._tmpdir.name, "moved.db"))
+        moved.set()
+        thread.join()
+
+        shapes = {shape['normalized_sql'] for shape in get_slow_query_shapes(limit=100)}
+        self.assertIn('SELECT COUNT(*) FROM students', shapes)
+        self.assertNotIn('SELECT COUNT(*) FROM classes', shapes)
+
+    def test_disabled_log_is_not_created(self):
+        """Test that reading a log that is off or not written yet creates no file"""
+        path = os.path.join(self._tmpdir.name, "unused.db")
+        configure_slow_query_log(None, path=path)
+        self.assertEqual(get_slow_query_shapes(), [])
+        configure_slow_query_log(10000, path=path)
+        self.assertEqual(get_slow_query_shapes(), [])
+        self.assertFalse(os.path.exists(path))
+
+    def test_admin_page(self):
+        """Test that the admin page lists shapes with the route that ran them"""
+        app.config.update(TESTING=True)
+        client = app.test_client()
+        client.post("/login", data={"username": "admin", "password": "admin123"})
+        client.get("/view-students?sort_by=class&search=abc")
+
+        resp = client.get("/admin/slow-queries")
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn(b"view_students", resp.data)
+        self.assertIn(b"Query plan", resp.data)
+
+        client.post("/admin/slow-queries/clear")
+        self.assertEqual(get_slow_query_shapes(), [])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
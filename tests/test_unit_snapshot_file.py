@@ -0,0 +1,117 @@
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+from backend import snapshot_file
+from backend.analytics import compute_analytics, get_dashboard_stats, get_insights
+from backend.app import init_db, set_database_path
+from backend.columnar import configure_snapshot
+from backend.db import get_db_connection
+from backend.snapshot_file import (FORMAT_VERSION, HEADER, MAGIC, export_snapshot, get_mapped_snapshot,
+                                   get_snapshot_file_stats, snapshot_path)
+
+
+class TestSnapshotFile(unittest.TestCase):
+    """Tests exporting, mapping and rebuilding the snapshot file"""
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self._tmpdir.name, "test_database.db")
+        set_database_path(self.db_path)
+        init_db()
+
+        self.conn = get_db_connection()
+        class_ids = [row[0] for row in self.conn.execute("SELECT id FROM classes")]
+        rng = random.Random(3)
+        self.conn.executemany(
+            'INSERT INTO students (name, roll_no, class_id, subjects, marks, attendance) VALUES (?, ?, ?, ?, ?, ?)',
+            [(f'Stüdent {i} {"é" * (i % 4)}', f'SNAP-{i:04d}', rng.choice(class_ids), 'Math',
+              rng.randint(0, 100), rng.randint(0, 100)) for i in range(250)]
+        )
+        self.conn.commit()
+
+    def tearDown(self):
+        configure_snapshot()
+        self.conn.close()
+        self._tmpdir.cleanup()
+
+    def test_columns_match_tables(self):
+        """Test every column, name and roll number against the tables"""
+        snapshot = export_snapshot(self.conn, snapshot_path())
+        students = self.conn.execute(
+            'SELECT id, class_id, marks, attendance, name, roll_no FROM students ORDER BY id').fetchall()
+
+        self.assertEqual(len(snapshot), 250)
+        for i, row in enumerate(students):
+            self.assertEqual((snapshot.ids[i], snapshot.class_ids[i], snapshot.marks[i], snapshot.attendance[i],
+                              snapshot.name(i), snapshot.roll_no(i)), tuple(row))
+        self.assertEqual(snapshot.class_names,
+                         {row[0]: row[1] for row in self.conn.execute('SELECT id, name FROM classes')})
+        self.assertTrue(os.path.exists(snapshot_path()))
+        self.assertEqual(os.listdir(self._tmpdir.name).count('test_database.db.snapshot'), 1)
+
+    def test_rebuilt_when_data_changes(self):
+        """Test that a change exports a new file while the old mapping stays readable"""
+        old = get_mapped_snapshot(self.conn)
+        self.assertIs(get_mapped_snapshot(self.conn), old)
+
+        self.conn.execute('UPDATE students SET marks = 0 WHERE id = ?', (old.ids[0],))
+        self.conn.commit()
+        exports = get_snapshot_file_stats()['exports']
+        new = get_mapped_snapshot(self.conn)
+
+        self.assertIsNot(new, old)
+        self.assertEqual(new.generation, old.generation + 1)
+        self.assertEqual(new.marks[0], 0)
+        self.assertEqual(get_snapshot_file_stats()['exports'], exports + 1)
+        # The replaced file is still mapped by the old snapshot
+        self.assertEqual(old.name(0), new.name(0))
+
+    def test_other_worker_maps_existing_file(self):
+        """Test that a process without a mapping reuses the current file"""
+        first = get_mapped_snapshot(self.conn)
+        stats = get_snapshot_file_stats()
+
+        with mock.patch.object(snapshot_file, '_mapped', None):
+            second = get_mapped_snapshot(self.conn)
+
+        self.assertIsNot(second, first)
+        self.assertEqual(list(second.ids), list(first.ids))
+        self.assertEqual(get_snapshot_file_stats()['exports'], stats['exports'])
+        self.assertEqual(get_snapshot_file_stats()['maps'], stats['maps'] + 1)
+
+    def test_other_format_version_is_replaced(self):
+        """Test that a file from another format version is exported again"""
+        with open(snapshot_path(), 'wb') as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION + 1, b'0' * 16, 0, 0, 0))
+
+        snapshot = get_mapped_snapshot(self.conn)
+        self.assertEqual(len(snapshot), 250)
+
+    def test_file_backend_matches_sql(self):
+        """Test that the dashboard and analytics give the same results from the file"""
+        dashboard = get_dashboard_stats(self.conn)
+        analytics = compute_analytics(self.conn)
+        insights = get_insights(self.conn)
+
+        configure_snapshot('file')
+        file_dashboard = get_dashboard_stats(self.conn)
+        file_analytics = compute_analytics(self.conn)
+
+        self.assertEqual(file_dashboard['total_students'], dashboard['total_students'])
+        self.assertEqual(file_dashboard['class_count'], dashboard['class_count'])
+        self.assertAlmostEqual(file_dashboard['avg_marks'], dashboard['avg_marks'])
+        self.assertAlmostEqual(file_dashboard['avg_attendance'], dashboard['avg_attendance'])
+        self.assertEqual([s['marks'] for s in file_analytics['top_performers']],
+                         [s['marks'] for s in analytics['top_performers']])
+        self.assertEqual(sorted(s['id'] for s in file_analytics['students_attention']),
+                         sorted(s['id'] for s in analytics['students_attention']))
+        marks = [s['marks'] for s in file_analytics['students_attention']]
+        self.assertEqual(marks, sorted(marks, reverse=True))
+        self.assertEqual(get_insights(self.conn), insights)
+
+
+if __name__ == '__main__':
+    unittest.main()
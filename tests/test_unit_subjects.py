@@ -0,0 +1,124 @@
+import os
+import tempfile
+import unittest
+
+from backend.analytics import get_subject_stats
+from backend.app import init_db, set_database_path
+from backend.db import MIGRATIONS, get_db_connection
+from backend.students import student_query
+from backend.subjects import parse_subjects, sync_student_subjects
+
+
+class TestParseSubjects(unittest.TestCase):
+    """Tests for splitting the subjects field"""
+
+    def test_split_and_trim(self):
+        """Test commas, spaces and empty parts"""
+        self.assertEqual(parse_subjects(' Math,  Physics ,, Computer   Science '),
+                         ['Math', 'Physics', 'Computer Science'])
+
+    def test_duplicates_ignore_case(self):
+        """Test that the first spelling of a repeated subject is kept"""
+        self.assertEqual(parse_subjects('Math, math, MATH, Art'), ['Math', 'Art'])
+
+    def test_empty(self):
+        """Test that no subjects give an empty list"""
+        self.assertEqual(parse_subjects(''), [])
+        self.assertEqual(parse_subjects(None), [])
+
+
+class TestStudentSubjects(unittest.TestCase):
+    """Tests for the subjects and student_subjects tables"""
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self._tmpdir.name, "test_database.db")
+        set_database_path(self.db_path)
+        init_db()
+
+        self.conn = get_db_connection()
+        self.class_id = self.conn.execute("SELECT id FROM classes ORDER BY id LIMIT 1").fetchone()[0]
+
+    def tearDown(self):
+        self.conn.close()
+        self._tmpdir.cleanup()
+
+    def add_student(self, roll_no, subjects, marks=80):
+        cursor = self.conn.execute(
+            'INSERT INTO students (name, roll_no, class_id, subjects, marks, attendance) VALUES (?, ?, ?, ?, ?, ?)',
+            ('Student', roll_no, self.class_id, subjects, marks, 90)
+        )
+        return cursor.lastrowid
+
+    def students_taking(self, name):
+        rows = self.conn.execute('''
+            SELECT s.roll_no FROM students s
+            JOIN student_subjects ss ON ss.student_id = s.id
+            JOIN subjects sub ON sub.id = ss.subject_id
+            WHERE sub.name = ?
+            ORDER BY s.roll_no
+        ''', (name,)).fetchall()
+        return [row[0] for row in rows]
+
+    def test_migration_parses_existing_strings(self):
+        """Test that upgrading a database fills the tables from students.subjects"""
+        self.add_student('S-1', 'Math, Physics')
+        self.add_student('S-2', 'physics')
+        self.conn.execute("DROP TABLE student_subjects")
+        self.conn.execute("DROP TABLE subjects")
+        # Back to the version before the subjects migration
+        version = [migration.__name__ for migration in MIGRATIONS].index('_add_subjects')
+        self.conn.execute(f"PRAGMA user_version = {version}")
+        self.conn.commit()
+        self.conn.close()
+
+        init_db()
+        self.conn = get_db_connection()
+        self.assertEqual(self.students_taking('Physics'), ['S-1', 'S-2'])
+        self.assertEqual(self.students_taking('math'), ['S-1'])
+
+    def test_sync_replaces_subjects(self):
+        """Test that editing the subjects string rewrites the link rows"""
+        student_id = self.add_student('S-1', 'Math')
+        sync_student_subjects(self.conn, [(student_id, 'Math')])
+        sync_student_subjects(self.conn, [(student_id, 'Art, Music')])
+        self.conn.commit()
+
+        self.assertEqual(self.students_taking('Math'), [])
+        self.assertEqual(self.students_taking('Music'), ['S-1'])
+
+    def test_delete_student_removes_links(self):
+        """Test that the delete trigger cleans up student_subjects"""
+        student_id = self.add_student('S-1', 'Math')
+        sync_student_subjects(self.conn, [(student_id, 'Math')])
+        self.conn.execute('DELETE FROM students WHERE id = ?', (student_id,))
+        self.conn.commit()
+
+        count = self.conn.execute('SELECT COUNT(*) FROM student_subjects').fetchone()[0]
+        self.assertEqual(count, 0)
+
+    def test_subject_filter_uses_index(self):
+        """Test that the view_students subject filter reads the subject index"""
+        q = student_query(self.conn, {'subject': '1'})
+        plan = self.conn.execute(f'''
+            EXPLAIN QUERY PLAN
+            SELECT s.id FROM {q['join']} WHERE 1=1 {q['filters']}
+        ''', q['params']).fetchall()
+        details = ' '.join(row[3] for row in plan)
+        self.assertIn('idx_student_subjects_subject', details)
+
+    def test_subject_stats(self):
+        """Test per-subject counts and averages"""
+        rows = [('S-1', 'Math, Physics', 60), ('S-2', 'Math', 80), ('S-3', 'Art', 90)]
+        sync_student_subjects(self.conn, [(self.add_student(*row), row[1]) for row in rows])
+        self.conn.commit()
+
+        stats = {row['name']: row for row in get_subject_stats(self.conn)}
+        self.assertEqual(stats['Math']['student_count'], 2)
+        self.assertEqual(stats['Math']['avg_marks'], 70)
+        self.assertEqual(stats['Physics']['max_marks'], 60)
+        self.assertEqual(get_subject_stats(self.conn)[0]['name'], 'Math')
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
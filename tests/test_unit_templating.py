@@ -0,0 +1,97 @@
+import os
+import tempfile
+import unittest
+
+from flask import Flask, render_template_string
+
+from backend.app import app, init_db, set_database_path
+from backend.config import TEMPLATES_DIR
+from backend.templating import configure_fragment_cache, get_fragment_stats, register_templates
+from backend.writer import submit_write
+
+TEMPLATE = "{% cache 'greeting', name %}Hello {{ name }} {{ suffix }}{% endcache %}"
+
+
+class TestFragmentCache(unittest.TestCase):
+    """Tests for the {% cache %} template tag"""
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        set_database_path(os.path.join(self._tmpdir.name, "test_database.db"))
+        init_db()
+        configure_fragment_cache(True)
+
+    def tearDown(self):
+        configure_fragment_cache()
+        self._tmpdir.cleanup()
+
+    def render(self, **context):
+        with app.test_request_context('/'):
+            return render_template_string(TEMPLATE, **context)
+
+    def test_block_is_reused_for_the_same_key(self):
+        """Test that the second render returns the cached HTML"""
+        before = get_fragment_stats()
+        self.assertEqual(self.render(name='Asha', suffix='1'), 'Hello Asha 1')
+        self.assertEqual(self.render(name='Asha', suffix='2'), 'Hello Asha 1')
+
+        after = get_fragment_stats()
+        self.assertEqual(after['misses'] - before['misses'], 1)
+        self.assertEqual(after['hits'] - before['hits'], 1)
+
+    def test_key_parts_are_separate_entries(self):
+        """Test that a different key renders the block again"""
+        self.render(name='Asha', suffix='1')
+        self.assertEqual(self.render(name='Ravi', suffix='2'), 'Hello Ravi 2')
+
+    def test_data_change_renders_again(self):
+        """Test that a change to the data invalidates cached blocks"""
+        self.render(name='Asha', suffix='1')
+        submit_write(lambda conn: conn.execute("INSERT INTO classes (name, description) VALUES ('New', '')"))
+        self.assertEqual(self.render(name='Asha', suffix='2'), 'Hello Asha 2')
+
+    def test_output_is_not_escaped_twice(self):
+        """Test that cached HTML is marked safe"""
+        self.assertEqual(self.render(name='<b>', suffix=''), 'Hello &lt;b&gt; ')
+        self.assertEqual(self.render(name='<b>', suffix=''), 'Hello &lt;b&gt; ')
+
+    def test_disabled_cache_always_renders(self):
+        """Test that nothing is cached when the fragment cache is off"""
+        configure_fragment_cache(False)
+        self.render(name='Asha', suffix='1')
+        self.assertEqual(self.render(name='Asha', suffix='2'), 'Hello Asha 2')
+
+
+class TestTemplatePrecompile(unittest.TestCase):
+    """Tests for the persistent bytecode cache"""
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    def test_templates_are_compiled_into_the_cache_directory(self):
+        """Test that every template is compiled at startup and written to disk"""
+        new_app = Flask(__name__, template_folder=TEMPLATES_DIR)
+        register_templates(new_app, cache_dir=self._tmpdir.name)
+
+        template_count = len(new_app.jinja_env.list_templates())
+        self.assertEqual(len(os.listdir(self._tmpdir.name)), template_count)
+        self.assertGreaterEqual(len(new_app.jinja_env.cache), template_count)
+
+    def test_second_worker_loads_from_the_cache(self):
+        """Test that a new app with the same directory does not compile again"""
+        register_templates(Flask(__name__, template_folder=TEMPLATES_DIR), cache_dir=self._tmpdir.name)
+
+        second = Flask(__name__, template_folder=TEMPLATES_DIR)
+        compiled = []
+        compile_templates = second.jinja_env.compile
+        second.jinja_env.compile = lambda *args, **kwargs: compiled.append(args) or compile_templates(*args, **kwargs)
+        register_templates(second, cache_dir=self._tmpdir.name)
+
+        self.assertEqual(compiled, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,228 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from backend import writer
+from backend.app import init_db, set_database_path
+from backend.db import get_db_connection
+from backend.writer import WriterBusyError, WriterTimeoutError, get_writer_stats, submit_write
+
+
+def insert_class(name):
+    return lambda conn: conn.execute('INSERT INTO classes (name, description) VALUES (?, ?)', (name, '')).lastrowid
+
+
+class TestWriter(unittest.TestCase):
+    """Tests for the single writer thread"""
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self._tmpdir.name, "test_database.db")
+        set_database_path(self.db_path)
+        init_db()
+        self.conn = get_db_connection()
+        # init_db adds sample classes
+        self.conn.execute('DELETE FROM classes')
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+        self._tmpdir.cleanup()
+
+    def class_names(self):
+        return [row[0] for row in self.conn.execute('SELECT name FROM classes ORDER BY name')]
+
+    def test_result_is_returned_after_commit(self):
+        """Test that the mutation's result comes back and is visible to other connections"""
+        class_id = submit_write(insert_class('Grade 9-A'))
+
+        row = self.conn.execute('SELECT name FROM classes WHERE id = ?', (class_id,)).fetchone()
+        self.assertEqual(row[0], 'Grade 9-A')
+
+    def test_concurrent_writes_all_succeed(self):
+        """Test that writes from many threads are all saved without busy errors"""
+        errors = []
+
+        def worker(n):
+            try:
+                for i in range(10):
+                    submit_write(insert_class(f'Class {n}-{i}'))
+            except Exception as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(self.class_names()), 80)
+
+    def test_queued_mutations_share_a_transaction(self):
+        """Test that mutations queued behind a slow one are committed together"""
+        before = get_writer_stats()
+        started = threading.Event()
+
+        def slow(conn):
+            started.set()
+            time.sleep(0.2)
+            return insert_class('Slow')(conn)
+
+        threads = [threading.Thread(target=submit_write, args=(slow,))]
+        threads[0].start()
+        started.wait()
+        for i in range(5):
+            threads.append(threading.Thread(target=submit_write, args=(insert_class(f'Queued {i}'),)))
+            threads[-1].start()
+        for thread in threads:
+            thread.join()
+
+        after = get_writer_stats()
+        self.assertEqual(after['mutations'] - before['mutations'], 6)
+        self.assertLess(after['batches'] - before['batches'], 6)
+        self.assertEqual(len(self.class_names()), 6)
+
+    def test_integrity_error_reaches_submitter_only(self):
+        """Test that a failing mutation raises in its caller and the rest of the batch is kept"""
+        submit_write(insert_class('Grade 9-A'))
+        started = threading.Event()
+        results = {}
+
+        def slow(conn):
+            started.set()
+            time.sleep(0.2)
+            return insert_class('Grade 9-B')(conn)
+
+        def run(key, mutation):
+            try:
+                results[key] = submit_write(mutation)
+            except sqlite3.IntegrityError as error:
+                results[key] = error
+
+        threads = [threading.Thread(target=run, args=('slow', slow))]
+        threads[0].start()
+        started.wait()
+        threads.append(threading.Thread(target=run, args=('duplicate', insert_class('Grade 9-A'))))
+        threads.append(threading.Thread(target=run, args=('new', insert_class('Grade 9-C'))))
+        for thread in threads[1:]:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertIsInstance(results['duplicate'], sqlite3.IntegrityError)
+        self.assertIsInstance(results['new'], int)
+        self.assertEqual(self.class_names(), ['Grade 9-A', 'Grade 9-B', 'Grade 9-C'])
+
+    def test_failed_mutation_is_rolled_back(self):
+        """Test that a mutation raising halfway leaves none of its changes"""
+        def half(conn):
+            conn.execute("INSERT INTO classes (name, description) VALUES ('Half', '')")
+            raise ValueError('stop')
+
+        with self.assertRaises(ValueError):
+            submit_write(half)
+        self.assertEqual(self.class_names(), [])
+
+    def test_after_commit_runs_for_committed_mutations_only(self):
+        """Test that callbacks of a failed mutation are dropped"""
+        calls = []
+
+        def register(name, fail=False):
+            def mutation(conn):
+                conn.execute("INSERT INTO classes (name, description) VALUES (?, '')", (name,))
+                writer.after_commit(lambda: calls.append(name))
+                if fail:
+                    raise ValueError('stop')
+            return mutation
+
+        submit_write(register('Kept'))
+        with self.assertRaises(ValueError):
+            submit_write(register('Dropped', fail=True))
+
+        self.assertEqual(calls, ['Kept'])
+        with self.assertRaises(RuntimeError):
+            writer.after_commit(lambda: None)
+
+    def test_full_queue_raises_busy(self):
+        """Test that submitting to a full queue fails after the timeout"""
+        started = threading.Event()
+        release = threading.Event()
+
+        def blocking(conn):
+            started.set()
+            release.wait()
+
+        with mock.patch.object(writer._queue, 'maxsize', 1):
+            first = threading.Thread(target=submit_write, args=(blocking,))
+            first.start()
+            started.wait()
+            # Fills the queue while the writer is busy with the first job
+            second = threading.Thread(target=submit_write, args=(insert_class('Waiting'),))
+            second.start()
+            while writer._queue.qsize() == 0:
+                time.sleep(0.01)
+
+            with self.assertRaises(WriterBusyError):
+                submit_write(insert_class('Rejected'), timeout=0.05)
+
+            release.set()
+            first.join()
+            second.join()
+
+        self.assertEqual(self.class_names(), ['Waiting'])
+
+    def test_follows_database_path(self):
+        """Test that the writer switches to a new database path"""
+        submit_write(insert_class('First'))
+
+        other_path = os.path.join(self._tmpdir.name, "other.db")
+        set_database_path(other_path)
+        init_db()
+        submit_write(insert_class('Second'))
+
+        other = sqlite3.connect(other_path)
+        self.assertIn('Second', [row[0] for row in other.execute('SELECT name FROM classes')])
+        other.close()
+        self.assertEqual(self.class_names(), ['First'])
+
+
+    def test_connection_failure_fails_the_batch(self):
+        """Test that a database that cannot be opened fails the change instead of hanging"""
+        set_database_path(os.path.join(self._tmpdir.name, "missing", "test_database.db"))
+        try:
+            with self.assertRaises(sqlite3.OperationalError):
+                submit_write(insert_class('Nowhere'))
+        finally:
+            set_database_path(self.db_path)
+        self.assertIsNotNone(submit_write(insert_class('After')))
+        self.assertEqual(self.class_names(), ['After'])
+
+    def test_writer_survives_unexpected_errors(self):
+        """Test that an error outside a mutation fails the batch and keeps the thread"""
+        submit_write(lambda conn: None)
+        thread = writer._thread
+        with mock.patch.object(writer, '_commit_batch', side_effect=RuntimeError('broken')):
+            with self.assertRaises(RuntimeError):
+                submit_write(insert_class('Lost'))
+        self.assertIsNotNone(submit_write(insert_class('Kept')))
+        self.assertIs(writer._thread, thread)
+        self.assertEqual(self.class_names(), ['Kept'])
+
+    def test_commit_timeout(self):
+        """Test that a submitter stops waiting after WRITER_COMMIT_TIMEOUT"""
+        release = threading.Event()
+        with mock.patch.object(writer, 'WRITER_COMMIT_TIMEOUT', 0.05):
+            with self.assertRaises(WriterTimeoutError):
+                submit_write(lambda conn: release.wait(5))
+        release.set()
+        submit_write(insert_class('Later'))
+        self.assertEqual(self.class_names(), ['Later'])
+
+
+if __name__ == '__main__':
+    unittest.main()